@@ -0,0 +1,32 @@
+"""
+Inspection core of the AI Footwear Quality Control Inspector.
+
+Importable without Streamlit, so the same analysis, reporting and job queue
+back both the Streamlit app (app.py) and the HTTP API (python -m qc_inspector.api).
+Names are re-exported lazily: importing the package (or a light module such as
+cost) does not pull in openai, PIL or numpy until something actually uses them.
+"""
+import importlib
+
+_EXPORTS = {
+    "analyze_shoe_image": ".analysis",
+    "analyze_shoe_image_adaptive": ".analysis",
+    "encode_image": ".analysis",
+    "inspect_angle": ".analysis",
+    "OPENAI_BASE_URL": ".client",
+    "create_openai_client": ".client",
+    "InspectionJobQueue": ".jobs",
+    "JobStore": ".jobs",
+    "build_export_report": ".report",
+    "generate_html_report": ".report",
+    "generate_qc_report": ".report",
+    "generate_styled_text_report": ".report",
+}
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,713 @@
+"""Per-angle vision analysis: prompt, model calls, adaptive tiling and model cascade"""
+import base64
+import io
+import json
+import logging
+import os
+import time
+from functools import partial
+from string import Template
+
+from .backends import (
+    BACKEND, mark_unsupported, model_options, rejects_response_format, response_format_ladder, response_format_param
+)
+from .codes import build_compact_output_format, expand_compact_analysis
+from .hedging import BackendUnavailable, guarded_call
+
+logger = logging.getLogger(__name__)
+
+# Standard viewing angles, in upload order
+ANGLE_NAMES = [
+    "Front View", "Back View", "Left Side View",
+    "Right Side View", "Top View", "Sole View"
+]
+
+# Model cascade defaults (cheap screening model first, strong model only when needed); see backends.py
+SCREENING_MODEL = BACKEND["screening_model"]
+STRONG_MODEL = BACKEND["strong_model"]
+
+# Uploads up to this size that need no pixel changes are sent as the original bytes
+PASSTHROUGH_MAX_BYTES = int(os.environ.get("QC_PASSTHROUGH_MAX_BYTES", str(10 * 1024 * 1024)))
+EXIF_ORIENTATION = 0x0112
+
+def open_image(data):
+    """PIL image of uploaded bytes (header only until used) that keeps the bytes for encode_image"""
+    from PIL import Image
+    image = Image.open(io.BytesIO(data))
+    image.source_bytes = data  # Not carried over by copy/crop/convert, which make new images
+    return image
+
+def passthrough_buffer(image, max_side=None):
+    """
+    Memoryview of the original bytes of an image from open_image, or None when it has to be
+    re-encoded: not an RGB JPEG, larger than max_side or PASSTHROUGH_MAX_BYTES, or rotated
+    by EXIF (the re-encode drops that tag). Only header fields are read, never the pixels.
+    """
+    source = getattr(image, "source_bytes", None)
+    if source is None or image.format != "JPEG" or image.mode != "RGB":
+        return None
+    if max_side and max(image.size) > max_side:
+        return None
+    if len(source) > PASSTHROUGH_MAX_BYTES or image.getexif().get(EXIF_ORIENTATION, 1) != 1:
+        return None
+    return memoryview(source)
+
+# Function to encode image
+def encode_image(image, max_side=None, stats=None):
+    """
+    Convert PIL image to base64 string for OpenAI API, optionally downscaled.
+    Compliant JPEG uploads skip the decode/re-encode (see passthrough_buffer).
+    stats, if given, receives {"path": "passthrough" | "reencode", "bytes": n, "encode_ms": t}.
+    """
+    started = time.perf_counter()
+    buffer = passthrough_buffer(image, max_side)
+    if buffer is not None:
+        path, size = "passthrough", buffer.nbytes
+        encoded = base64.b64encode(buffer).decode()
+    else:
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        if max_side and max(image.size) > max_side:
+            image = image.copy()
+            image.thumbnail((max_side, max_side))
+        output = io.BytesIO()
+        image.save(output, format="JPEG")
+        path, size = "reencode", output.tell()
+        encoded = base64.b64encode(output.getbuffer()).decode()
+    if stats is not None:
+        stats.update(path=path, bytes=size, encode_ms=round((time.perf_counter() - started) * 1000, 1))
+    return encoded
+
+# Send one prompt + image to the vision model and return the raw text reply
+def call_vision_model(client, prompt, base64_image, detail="auto", max_tokens=800, model=STRONG_MODEL, usage=None,
+                      schema=None):  # 800 leaves room for detailed responses
+    """
+    Per-model options from the backend config cap max_tokens and override detail. With a
+    JSON schema, the best response_format the server accepts is used (see backends.py).
+    Each request is hedged and runs under the backend's circuit breaker (see hedging.py); usage
+    counts every request the backend bills, hedged duplicates and requests past the deadline too.
+    """
+    options = model_options(model)
+    if options["max_tokens"]:
+        max_tokens = min(max_tokens, options["max_tokens"])
+    detail = options["detail"] or detail
+    base_url = str(getattr(client, "base_url", ""))
+    
+    def on_attempt(response):
+        if usage is not None and response.usage is not None:
+            record_usage(usage, model, response.usage.prompt_tokens, response.usage.completion_tokens)
+
+    def on_abandon(winner):
+        # Still running, so billed unseen: the same request as the winner, or the planner's upper bound
+        if usage is None:
+            return
+        if winner is not None and winner.usage is not None:
+            record_usage(usage, model, winner.usage.prompt_tokens, winner.usage.completion_tokens)
+        else:
+            record_usage(usage, model, *_estimated_tokens(prompt, base64_image, detail, max_tokens, model))
+
+    ladder = response_format_ladder(base_url, model, schema)
+    for step, response_format in enumerate(ladder):
+        extra = {}
+        if response_format_param(response_format, schema):
+            extra["response_format"] = response_format_param(response_format, schema)
+        try:
+            response = guarded_call(base_url, model, partial(_create_completion, client, prompt, base64_image, detail,
+                                                             max_tokens, model, extra),
+                                    on_attempt=on_attempt, on_abandon=on_abandon)
+            break
+        except Exception as e:
+            # A 400 about the structured format means the server lacks it: try the next, plainer one
+            if step == len(ladder) - 1 or not rejects_response_format(e):
+                raise
+            mark_unsupported(base_url, model, response_format, e)
+    return response.choices[0].message.content
+
+def _estimated_tokens(prompt, base64_image, detail, max_tokens, model):
+    """(prompt tokens, completion tokens) of a request as cost.py plans it, for requests never seen to finish"""
+    from PIL import Image
+    from .cost import image_tokens, text_tokens
+    width, height = Image.open(io.BytesIO(base64.b64decode(base64_image))).size
+    return text_tokens(prompt) + image_tokens(width, height, detail, model), max_tokens
+
+def _create_completion(client, prompt, base64_image, detail, max_tokens, model, extra, timeout):
+    if timeout is not None:
+        extra = dict(extra, timeout=timeout)  # Per request, so an abandoned one ends near the deadline
+    return client.chat.completions.create(
+        model=model,  # the backend's strong model unless a cascade tier asks for another vision model
+        messages=[
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": prompt},
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": f"data:image/jpeg;base64,{base64_image}",
+                            "detail": detail
+                        }
+                    }
+                ]
+            }
+        ],
+        max_tokens=max_tokens,
+        temperature=0.1,  # Low temperature for consistent, factual analysis
+        **extra
+    )
+
+# Accumulate token usage per model: {model: {"prompt_tokens": n, "completion_tokens": n, "calls": n}}
+def record_usage(usage, model, prompt_tokens, completion_tokens):
+    totals = usage.setdefault(model, {"prompt_tokens": 0, "completion_tokens": 0, "calls": 0})
+    totals["prompt_tokens"] += prompt_tokens or 0
+    totals["completion_tokens"] += completion_tokens or 0
+    totals["calls"] += 1
+
+def merge_usage(usage, other):
+    for model, tokens in other.items():
+        totals = usage.setdefault(model, {"prompt_tokens": 0, "completion_tokens": 0, "calls": 0})
+        for field in totals:
+            totals[field] += tokens[field]
+
+# Pull the JSON object out of a model reply (None if there is none)
+def extract_json(result_text):
+    start_idx = result_text.find('{')
+    end_idx = result_text.rfind('}') + 1
+    if start_idx != -1 and end_idx > start_idx:
+        return json.loads(result_text[start_idx:end_idx])
+    return None
+
+# JSON schemas of the replies, for backends with structured output (strict: every key required)
+def _strict_object(properties):
+    return {"type": "object", "properties": properties, "required": list(properties), "additionalProperties": False}
+
+_STRINGS = {"type": "array", "items": {"type": "string"}}
+_SUSPECT_REGIONS = {"type": "array", "items": _strict_object({
+    "box": {"type": "array", "items": {"type": "number"}},
+    "reason": {"type": "string"}
+})}
+_DEFECT_BOXES = {"type": "array", "items": _strict_object({
+    "severity": {"type": "string", "enum": ["critical", "major", "minor"]},
+    "box": {"type": "array", "items": {"type": "number"}},
+    "label": {"type": "string"}
+})}
+REGION_SCHEMA = _strict_object({
+    "critical_defects": _STRINGS, "major_defects": _STRINGS, "minor_defects": _STRINGS, "notes": {"type": "string"}
+})
+
+def analysis_schema(compact=False, suspect_regions=False, defect_boxes=False):
+    """Schema of an angle analysis reply (prose or compact coded, optionally with suspect regions and defect boxes)"""
+    if compact:
+        properties = {
+            "d": {"type": "array", "items": {"type": "array", "items": {"type": "string"}}},
+            "c": {"type": "string", "enum": ["G", "F", "P"]},
+            "k": {"type": "string", "enum": ["H", "M", "L"]},
+            "n": {"type": "string"}
+        }
+    else:
+        properties = {
+            "angle": {"type": "string"},
+            "critical_defects": _STRINGS,
+            "major_defects": _STRINGS,
+            "minor_defects": _STRINGS,
+            "overall_condition": {"type": "string", "enum": ["Good", "Fair", "Poor"]},
+            "confidence": {"type": "string", "enum": ["High", "Medium", "Low"]},
+            "inspection_notes": {"type": "string"}
+        }
+    if suspect_regions:
+        properties["suspect_regions"] = _SUSPECT_REGIONS
+    if defect_boxes:
+        properties["defect_boxes"] = _DEFECT_BOXES
+    return _strict_object(properties)
+
+COMPACT_MAX_TOKENS = 300      # Completion budget of a compact coded answer (prose needs 800)
+DEFECT_BOX_TOKENS = 150       # Extra completion budget for the defect boxes of one view
+
+DEFECT_BOX_REQUEST = """
+
+DEFECT LOCATIONS:
+In addition to the fields above, include a "defect_boxes" key with one entry per reported defect, locating it on the image:
+"defect_boxes": [{"severity": "critical/major/minor", "box": [x_min, y_min, x_max, y_max], "label": "2-4 word defect name"}]
+Box coordinates are fractions of the image width and height between 0 and 1, drawn tightly around the defect. Return an empty list if there are no defects.
+"""
+
+def clean_defect_boxes(raw):
+    """Defect boxes of a reply with valid severities and boxes clamped to the image (others dropped)"""
+    boxes = []
+    for entry in raw if isinstance(raw, list) else []:
+        if not isinstance(entry, dict) or entry.get("severity") not in ("critical", "major", "minor"):
+            continue
+        try:
+            x0, y0, x1, y1 = (min(1.0, max(0.0, float(v))) for v in entry.get("box"))
+        except (TypeError, ValueError):
+            continue
+        if x1 > x0 and y1 > y0:
+            boxes.append({"severity": entry["severity"], "box": [x0, y0, x1, y1],
+                          "label": str(entry.get("label") or "")})
+    return boxes
+
+# COMPREHENSIVE PROFESSIONAL QC INSPECTOR PROMPT
+def build_inspection_prompt(angle_name, style_number="", color="", po_number="", compact=False):
+    if compact:
+        output_format = build_compact_output_format(angle_name)
+        directive = "Report every visible defect as a code; keep notes terse."
+    else:
+        output_format = f"""OUTPUT REQUIREMENTS:
+Provide your professional assessment in this EXACT JSON format:
+
+{{
+    "angle": "{angle_name}",
+    "critical_defects": ["Be specific: location + defect type + severity"],
+    "major_defects": ["Include exact location and detailed description"], 
+    "minor_defects": ["Precise location and nature of defect"],
+    "overall_condition": "Good/Fair/Poor",
+    "confidence": "High/Medium/Low",
+    "inspection_notes": "Professional summary with any concerns about image quality or recommendations"
+}}"""
+        directive = "Focus on this specific angle provide detailed, actionable feedback that would help improve manufacturing processes."
+    return f"""
+PROFESSIONAL FOOTWEAR QUALITY CONTROL INSPECTION - EXPERT ANALYSIS
+
+INSPECTOR PROFILE:
+You are a highly experienced footwear quality control inspector with 15+ years in athletic and fashion footwear manufacturing. You have worked with major brands and understand international quality standards. You are known for your meticulous attention to detail and strict adherence to AQL standards.
+
+CURRENT INSPECTION ASSIGNMENT:
+- Order: PO#{po_number}
+- Product: {style_number} footwear 
+- Color: {color}
+- View Angle: {angle_name}
+- Quality Standard: AQL 2.5 (Manufacturing Grade A)
+- Inspection Type: Pre-shipment final inspection
+- Client Requirement: Zero tolerance for critical defects
+
+MANUFACTURING CONTEXT:
+This is a final quality inspection before shipment to retail customers. Any defect that reaches the end customer could result in returns, complaints, and brand reputation damage. You must inspect with the understanding that this product will be sold at retail and worn by consumers who expect high quality.
+
+DETAILED DEFECT CLASSIFICATION SYSTEM:
+
+🚨 CRITICAL DEFECTS (ZERO TOLERANCE - Immediate Rejection):
+**1. Structural Integrity Issues:**
+- Complete or partial **outsole debonding** or separation
+- Major **heel defects**: broken, warped, or causing instability/tilt
+- **Boot barrel deformation** (elastic band deformation) affecting structural integrity
+- **The inside exploded** (major lining failure)
+- **The upper is damaged** (tears, holes larger than 1mm)
+- Broken or cracked structural components
+- **Heel kick** (severe front and back kick deformation)
+
+**2. Safety Hazards:**
+- Sharp edges or protruding elements
+- **Rubber wire** creating safety risks
+- Loose hardware that could cause injury
+- Chemical odors or visible contamination
+- Unstable heel attachment causing tilt or instability
+
+
+
+⚠️ MAJOR DEFECTS (Require Rework - Customer Visible Issues):
+**1. Adhesive & Bonding Problems:**
+- **Overflowing glue** (visible excess adhesive)
+- **The outsole lacks glue** (poor bonding preparation)
+- **The outsole combination is not tight** (separation gaps >1mm)
+- **The middle skin is glued** improperly
+- **The skin is glued** with visible defects
+- Poor bonding between upper/midsole/outsole components
+
+**2. Alignment & Shape Defects:**
+- **The rear trim strip is skewed**
+- **Skewed lines** (edges, spacing misalignment)
+- **The toe of the shoe is crooked**
+- **Toe defects**: misaligned toe box or irregular cap length
+- **The length of the toe cap** inconsistency
+- **The back package is high and low** (uneven heel counter)
+- Components misaligned or twisted relative to shoe centerline
+- **Heel counter defects**: shape/height inconsistent or deformed
+
+**3. Material Deformation:**
+- **Mesothelial wrinkles** (significant upper creasing)
+- **Wrinkled upper** affecting appearance
+- **Inner wrinkles** (lining deformation)
+- **The waist is not smooth** (poor lasting)
+- **Indentation on the upper** (shape defects)
+- Midfoot/shank area irregularities affecting profile
+
+**4. Color and Appearance:**
+- **Chromatic aberration** (noticeable color differences)
+- Color variation between shoe parts (>2 shade difference)
+- Color bleeding or staining between materials
+- Uneven dyeing or color patches
+
+**5. Construction Defects:**
+- **Upper thread** defects (loose, broken, or improper stitching)
+- Poor toe lasting (wrinkles, bubbles, asymmetry)
+- Visible gaps between sole and upper (>1mm)
+- Misaligned or crooked stitching lines
+- Puckering or gathering in upper materials
+
+**6. Hardware and Components:**
+- Damaged, bent, or non-functional eyelets
+- Broken or damaged lace hooks/D-rings
+- Velcro not adhering properly
+- Buckle damage or malfunction
+
+**7. Lining and Interior:**
+- Lining tears, wrinkles, or separation
+- Sock liner/insole misprinting or damage
+- Tongue positioning issues (too far left/right)
+
+**8. Sole and Bottom:**
+- Outsole molding defects or incomplete patterns
+- Midsole compression or deformation
+- Heel cap damage or misalignment
+- Tread pattern inconsistencies
+
+
+
+ℹ️ MINOR DEFECTS (Acceptable within AQL limits):
+**1. Surface & Cleanliness Issues:**
+- **Cleanliness** defects (surface dirt, dust - cleanable)
+- Minor scuff marks (<3mm)
+- Small adhesive residue spots
+- Temporary marking pen marks
+- **Transparency marks** (minor see-through effects)
+
+**2. Finishing Details:**
+- Thread ends not trimmed (<3mm length)
+- Minor stitching irregularities (straight lines)
+- Small material texture variations
+- Minor logo/branding imperfections
+- **Toe corners** with slight irregularities
+
+**3. Cosmetic Issues:**
+
+- Minor sole texture variations
+- Slight asymmetry in non-structural elements
+- Minor trim imperfections
+
+ANGLE-SPECIFIC INSPECTION FOCUS:
+
+**FRONT VIEW INSPECTION:**
+- Toe cap symmetry and shape consistency
+- Lace eyelet alignment and spacing
+- Tongue centering and positioning
+- Color matching between panels
+- Overall toe box shape and lasting quality
+- Front stitching line straightness
+- Logo placement and quality
+
+**BACK VIEW INSPECTION:**
+- Heel counter shape and symmetry
+- Back seam alignment and straightness
+- Heel tab positioning and attachment
+- Ankle collar height consistency
+- Back logo/branding placement
+- Counter stitching quality
+- Heel to sole attachment integrity
+
+**LEFT/RIGHT SIDE INSPECTION:**
+- Profile shape consistency and symmetry
+- Sole to upper bonding quality
+- Waist definition and shaping
+- Arch support visibility and positioning
+- Side panel alignment and stitching
+- Heel pitch and alignment
+- Overall silhouette conformity
+
+**TOP VIEW INSPECTION:**
+- Tongue positioning and symmetry
+- Lace eyelet spacing and alignment
+- Upper panel symmetry (left vs right)
+- Color consistency across all visible areas
+- Stitching line parallelism
+- Logo and branding alignment
+
+**SOLE VIEW INSPECTION:**
+- Outsole pattern completeness and clarity
+- Heel attachment and alignment
+- Forefoot flex groove positioning
+- Tread depth consistency
+- Midsole compression and uniformity
+- Any embedded foreign objects
+- Sole marking and size confirmation
+
+INSPECTION METHODOLOGY:
+1. **Systematic Visual Scan:** Examine the shoe systematically from one end to the other
+2. **Lighting Assessment:** Consider if image lighting affects defect visibility
+3. **Symmetry Check:** Compare left vs right sides for consistency
+4. **Scale Assessment:** Evaluate defect size relative to shoe size
+5. **Functionality Impact:** Consider if defect affects shoe performance or durability
+6. **Customer Perception:** Would an average consumer notice and be concerned?
+
+QUALITY ASSESSMENT CRITERIA:
+- **Good:** No visible defects or only very minor cosmetic issues
+- **Fair:** Minor defects present but within acceptable limits
+- **Poor:** Major defects present or excessive minor defects
+
+CONFIDENCE LEVEL GUIDELINES:
+- **High:** Clear, well-lit image with obvious defects or clearly clean areas
+- **Medium:** Adequate image quality with some uncertainty due to angle/lighting
+- **Low:** Poor image quality, shadows, or unclear areas affecting assessment
+
+{output_format}
+
+PROFESSIONAL STANDARDS:
+- Apply the same scrutiny you would for premium retail footwear
+- Remember that consumers will examine these shoes closely in stores
+- Consider that defects may become more pronounced with wear
+- Prioritize customer satisfaction and brand reputation
+- When in doubt about borderline cases, classify as the higher severity level
+
+INSPECTION DIRECTIVE:
+Conduct a thorough, professional quality control inspection of this {angle_name} view. Apply your expertise to identify all visible defects with precision and professional judgment. Your assessment will determine if this product meets manufacturing quality standards for retail distribution.
+
+{directive}
+    """
+
+# Professional QC Analysis function
+def analyze_shoe_image(client, image, angle_name, style_number="", color="", po_number="",
+                       detail="auto", max_side=None, extra_instructions="", model=STRONG_MODEL, usage=None,
+                       compact=False, schema=None, prompt_template=None, defect_boxes=False):
+    """
+    Analyze shoe image using OpenAI GPT-4 Vision API with professional QC expertise
+    compact=True asks for defect codes (see codes.py) and expands them into the usual analysis locally.
+    schema is the reply's JSON schema for structured-output backends (default: analysis_schema(compact)).
+    prompt_template replaces build_inspection_prompt (prompt evaluation, see evaluate.py); it may use
+    $angle_name, $style_number, $color and $po_number.
+    defect_boxes also asks for a normalized box per defect (analysis["defect_boxes"], see heatmap.py).
+    """
+    encoding = {}
+    base64_image = encode_image(image, max_side=max_side, stats=encoding)
+    if prompt_template:
+        prompt = Template(prompt_template).safe_substitute(angle_name=angle_name, style_number=style_number,
+                                                           color=color, po_number=po_number)
+    else:
+        prompt = build_inspection_prompt(angle_name, style_number, color, po_number, compact)
+    prompt += extra_instructions + (DEFECT_BOX_REQUEST if defect_boxes else "")
+    max_tokens = (COMPACT_MAX_TOKENS if compact else 800) + (DEFECT_BOX_TOKENS if defect_boxes else 0)
+    
+    try:
+        result_text = call_vision_model(client, prompt, base64_image, detail=detail, max_tokens=max_tokens,
+                                        model=model, usage=usage,
+                                        schema=schema or analysis_schema(compact, defect_boxes=defect_boxes))
+        
+        # Parse the JSON response
+        analysis = extract_json(result_text)
+        
+        if analysis is not None:
+            analysis = expand_compact_analysis(analysis, angle_name) if compact else analysis
+            if defect_boxes:
+                analysis["defect_boxes"] = clean_defect_boxes(analysis.get("defect_boxes"))
+            analysis["encoding"] = encoding
+            return analysis
+        else:
+            # Fallback if JSON parsing fails
+            return {
+                "angle": angle_name,
+                "critical_defects": [],
+                "major_defects": [],
+                "minor_defects": [],
+                "overall_condition": "Fair",
+                "confidence": "Low",
+                "inspection_notes": "API response parsing failed - raw response logged",
+                "encoding": encoding
+            }
+            
+    except json.JSONDecodeError as e:
+        logger.error("JSON parsing error for %s: %s", angle_name, e)
+        return None
+    except BackendUnavailable:
+        raise  # The job queue holds the view until the backend recovers
+    except Exception as e:
+        logger.error("Error analyzing %s: %s", angle_name, e)
+        return None
+
+# Adaptive tiling settings (low-res overview, then high-res crops of suspect regions)
+OVERVIEW_MAX_SIDE = 768      # Overview pass is downscaled and sent at low detail
+MAX_SUSPECT_REGIONS = 4      # Upper bound on close-up crops per angle
+REGION_PADDING = 0.08        # Extra context around each suspect box (fraction of box size)
+MIN_REGION_SIDE = 256        # Smallest crop sent at high detail (original pixels)
+
+REGION_REQUEST = """
+
+ADAPTIVE TILING - SUSPECT REGIONS:
+This overview image is downscaled, so fine defects (stitching faults, gaps around 1mm, untrimmed thread ends) may not be resolvable. In addition to the fields above, include a "suspect_regions" key listing up to {max_regions} areas that deserve a close-up look at full resolution:
+"suspect_regions": [{{"box": [x_min, y_min, x_max, y_max], "reason": "what might be wrong there"}}]
+Box coordinates are fractions of the image width and height between 0 and 1. Return an empty list if nothing needs a closer look.
+"""
+
+def build_region_prompt(angle_name, reason, style_number="", color="", po_number=""):
+    """Short prompt for a full-resolution close-up crop of one suspect region"""
+    return f"""
+FOOTWEAR QC - CLOSE-UP REGION INSPECTION
+
+You are a footwear quality control inspector (AQL 2.5, pre-shipment final inspection) examining a full-resolution close-up crop taken from the {angle_name} of PO#{po_number}, style {style_number}, color {color}.
+The overview pass flagged this region for: {reason}
+
+Inspect this crop for fine defects: stitching faults (loose, broken, skipped or crooked stitches, upper thread defects), gaps between sole and upper, overflowing glue or glue residue, untrimmed thread ends, small tears or holes, wrinkles, scuffs, marks and color deviations.
+
+Severity rules:
+- Critical: structural failure or safety hazard (debonding, tears/holes >1mm, broken components, sharp edges)
+- Major: customer-visible workmanship defects (overflowing glue, gaps >1mm, crooked or loose stitching, wrinkles, chromatic aberration)
+- Minor: cosmetic issues within AQL limits (thread ends <3mm, small scuffs <3mm, cleanable dirt, small adhesive spots)
+When in doubt, classify as the higher severity level. Only report what is actually visible in this crop.
+
+Respond in this EXACT JSON format:
+{{
+    "critical_defects": ["location + defect type + severity"],
+    "major_defects": ["location + defect type + description"],
+    "minor_defects": ["location + nature of defect"],
+    "notes": "One sentence on what the close-up confirmed or ruled out"
+}}
+    """
+
+# Convert a normalized suspect box into a padded pixel crop box
+def region_to_pixels(box, image_size):
+    try:
+        x0, y0, x1, y1 = (min(max(float(v), 0.0), 1.0) for v in box)
+    except (TypeError, ValueError):
+        return None
+    if x1 <= x0 or y1 <= y0:
+        return None
+    
+    width, height = image_size
+    pad_x = (x1 - x0) * REGION_PADDING
+    pad_y = (y1 - y0) * REGION_PADDING
+    left, right = (x0 - pad_x) * width, (x1 + pad_x) * width
+    top, bottom = (y0 - pad_y) * height, (y1 + pad_y) * height
+    
+    # Grow tiny boxes around their centre so the crop keeps some context
+    min_w, min_h = min(MIN_REGION_SIDE, width), min(MIN_REGION_SIDE, height)
+    if right - left < min_w:
+        centre = (left + right) / 2
+        left, right = centre - min_w / 2, centre + min_w / 2
+    if bottom - top < min_h:
+        centre = (top + bottom) / 2
+        top, bottom = centre - min_h / 2, centre + min_h / 2
+    
+    # Shift back inside the image
+    shift_x = max(0, -left) - max(0, right - width)
+    shift_y = max(0, -top) - max(0, bottom - height)
+    return (
+        int(max(0, left + shift_x)), int(max(0, top + shift_y)),
+        int(min(width, right + shift_x)), int(min(height, bottom + shift_y))
+    )
+
+def analyze_region(client, crop, angle_name, reason, style_number="", color="", po_number="", model=STRONG_MODEL,
+                   usage=None):
+    """Analyze one full-resolution crop at high detail"""
+    prompt = build_region_prompt(angle_name, reason, style_number, color, po_number)
+    try:
+        result_text = call_vision_model(client, prompt, encode_image(crop), detail="high", max_tokens=400,
+                                        model=model, usage=usage, schema=REGION_SCHEMA)
+        return extract_json(result_text)
+    except BackendUnavailable:
+        raise
+    except Exception as e:
+        # A failed close-up should not discard the overview analysis
+        logger.warning("Close-up analysis failed for %s (%s): %s", angle_name, reason, e)
+        return None
+
+# Fold close-up findings back into the angle analysis
+def merge_region_findings(analysis, findings, reason):
+    for key in ("critical_defects", "major_defects", "minor_defects"):
+        merged = list(analysis.get(key) or [])
+        merged.extend(d for d in findings.get(key) or [] if isinstance(d, str))
+        analysis[key] = list(dict.fromkeys(merged))
+    
+    if analysis["critical_defects"] or analysis["major_defects"]:
+        analysis["overall_condition"] = "Poor"
+    elif analysis["minor_defects"] and analysis.get("overall_condition") == "Good":
+        analysis["overall_condition"] = "Fair"
+    
+    if findings.get("notes"):
+        notes = analysis.get("inspection_notes", "")
+        analysis["inspection_notes"] = f"{notes} Close-up ({reason}): {findings['notes']}".strip()
+
+# Two-pass adaptive tiling analysis
+def analyze_shoe_image_adaptive(client, image, angle_name, style_number="", color="", po_number="",
+                                model=STRONG_MODEL, usage=None, compact=False, prompt_template=None,
+                                defect_boxes=False):
+    """
+    Low-detail overview of the whole view, then high-detail crops of the suspect regions only
+    """
+    analysis = analyze_shoe_image(
+        client, image, angle_name, style_number, color, po_number,
+        detail="low",
+        max_side=OVERVIEW_MAX_SIDE,
+        extra_instructions=REGION_REQUEST.format(max_regions=MAX_SUSPECT_REGIONS),
+        model=model,
+        usage=usage,
+        compact=compact,
+        schema=analysis_schema(compact, suspect_regions=True, defect_boxes=defect_boxes),
+        prompt_template=prompt_template,
+        defect_boxes=defect_boxes
+    )
+    if not analysis:
+        return analysis
+    
+    suspect_regions = analysis.pop("suspect_regions", None) or []
+    inspected_regions = []
+    
+    for region in suspect_regions[:MAX_SUSPECT_REGIONS]:
+        if not isinstance(region, dict):
+            continue
+        crop_box = region_to_pixels(region.get("box"), image.size)
+        if crop_box is None:
+            continue
+        
+        reason = region.get("reason") or "suspected defect"
+        findings = analyze_region(client, image.crop(crop_box), angle_name, reason, style_number, color, po_number,
+                                  model, usage)
+        if findings:
+            merge_region_findings(analysis, findings, reason)
+        inspected_regions.append({"box": list(crop_box), "reason": reason, "analyzed": findings is not None})
+    
+    analysis["tiling"] = {"mode": "adaptive", "regions": inspected_regions}
+    return analysis
+
+# Why a screening result has to be confirmed by the strong model (None = screen is final)
+def escalation_reason(analysis):
+    if not analysis:
+        return "screening call failed"
+    if analysis.get("critical_defects"):
+        return "critical defects found"
+    if analysis.get("major_defects"):
+        return "major defects found"
+    if analysis.get("confidence") == "Low":
+        # Also covers unparseable replies, whose fallback analysis is Low confidence
+        return "low confidence"
+    return None
+
+def inspect_angle(client, image, angle_name, style_number="", color="", po_number="",
+                  adaptive=False, cascade=None, detail="auto", max_side=None, usage=None, compact=False,
+                  model=STRONG_MODEL, prompt_template=None, defect_boxes=False):
+    """
+    Run one angle through the selected inspection mode, optionally behind a model cascade.
+    cascade is None or {"screening_model": ..., "strong_model": ...}; without it, model is used.
+    detail and max_side apply to the standard mode (adaptive tiling fixes its own).
+    compact asks for the coded answer format (close-up crops keep their short prose format).
+    defect_boxes asks for a normalized box per defect of the view (close-up findings get none).
+    Token usage of every call is accumulated into usage, if given.
+    """
+    def analyze(model):
+        if adaptive:
+            return analyze_shoe_image_adaptive(client, image, angle_name, style_number, color, po_number,
+                                               model=model, usage=usage, compact=compact,
+                                               prompt_template=prompt_template, defect_boxes=defect_boxes)
+        return analyze_shoe_image(client, image, angle_name, style_number, color, po_number,
+                                  detail=detail, max_side=max_side, model=model, usage=usage, compact=compact,
+                                  prompt_template=prompt_template, defect_boxes=defect_boxes)
+    
+    if not cascade:
+        return analyze(model)
+    
+    analysis = analyze(cascade["screening_model"])
+    reason = escalation_reason(analysis)
+    decided_by, model = "screening", cascade["screening_model"]
+    
+    if reason:
+        analysis = analyze(cascade["strong_model"])
+        decided_by, model = "strong", cascade["strong_model"]
+    
+    if analysis:
+        analysis["cascade"] = {"decided_by": decided_by, "model": model, "escalation_reason": reason}
+    return analysis
@@ -0,0 +1,275 @@
+"""
+Stateless HTTP inspection API.
+
+    python -m qc_inspector.api --port 8600
+
+Endpoints:
+    POST /inspections                  submit images (multipart "images", in angle order) -> 202 + job id
+                                       (tray=true: each image is a multi-shoe tray photo, see tray.py)
+                                       (reinspect=true: re-inspection after rework, see reinspect.py)
+                                       (symmetry=true: local left/right side view comparison, see symmetry.py)
+    GET  /inspections/<job_id>         job status and progress
+    GET  /inspections/<job_id>/report  final report (?format=json|html|text)
+    GET  /images/<sha256>              archived view image (?original=true for the upload, if kept)
+    GET  /search?q=heel+kick           defects and notes of past inspections, best match first, with snippets
+                                       (customer, po_number, style_number, color, angle, severity, since,
+                                        until, limit; group=po for one row per PO, see search.py)
+    GET  /healthz                      liveness probe, with vision backend circuit state (see hedging.py)
+
+Workers keep no state of their own beyond the jobs they are running: status and
+reports live in the JobStore (QC_JOBS_DIR), so several workers sharing that
+directory can sit behind a load balancer and answer for each other's jobs.
+The API key comes from OPENAI_API_KEY on the server (or the backend config, see backends.py).
+The server listens on 127.0.0.1 unless --address says otherwise; with QC_API_TOKEN set, every
+endpoint but /healthz requires "Authorization: Bearer <token>", so set it before exposing it.
+Image decoding, submits, searches and report rendering run on a thread pool, off the IOLoop.
+"""
+import argparse
+import functools
+import hmac
+import json
+import logging
+import os
+from datetime import datetime
+
+import tornado.ioloop
+import tornado.web
+from PIL import UnidentifiedImageError
+
+from .analysis import ANGLE_NAMES, SCREENING_MODEL, STRONG_MODEL
+from .backends import backend_api_key
+from .client import OPENAI_BASE_URL, create_openai_client
+from .cost import BudgetExceeded
+from .heatmap import heatmap_figures
+from .hedging import guard_status
+from .jobs import InspectionJobQueue
+from .report import build_export_report, generate_html_report, generate_styled_text_report
+from .search import FILTERS as SEARCH_FILTERS, SEARCH_LIMIT, InvalidQuery
+from .tray import split_trays
+
+ORDER_FIELDS = ("po_number", "style_number", "color", "customer", "inspector")
+MAX_UPLOAD_BYTES = 200 * 1024 * 1024
+MAX_SEARCH_LIMIT = 1000
+API_TOKEN = os.environ.get("QC_API_TOKEN")   # Bearer token every endpoint but /healthz requires, when set
+
+@functools.lru_cache(maxsize=16)
+def get_openai_client(api_key, base_url=None):
+    return create_openai_client(api_key, base_url)
+
+class ApiHandler(tornado.web.RequestHandler):
+    def initialize(self, queue):
+        self.queue = queue
+
+    def prepare(self):
+        token = self.settings.get("api_token")
+        if token and not hmac.compare_digest(self.request.headers.get("Authorization", ""), f"Bearer {token}"):
+            raise tornado.web.HTTPError(401, reason="Missing or wrong API token")
+
+    @staticmethod
+    def run_blocking(func, *args, **kwargs):
+        """Run CPU- or lock-heavy work on the IOLoop's thread pool, so other requests are still served"""
+        return tornado.ioloop.IOLoop.current().run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+    def write_json(self, payload, status=200):
+        self.set_status(status)
+        self.set_header("Content-Type", "application/json")
+        self.finish(json.dumps(payload, default=str))
+
+    def write_error(self, status_code, **kwargs):
+        self.write_json({"error": self._reason}, status=status_code)
+
+    def get_job(self, job_id):
+        job = self.queue.status(job_id)
+        if job is None:
+            raise tornado.web.HTTPError(404, reason=f"Unknown job {job_id}")
+        return job
+
+class HealthHandler(ApiHandler):
+    def prepare(self):
+        pass    # Liveness probes carry no token
+
+    def get(self):
+        # Circuit breaker and hedging stats per vision backend; a degraded backend queues work, it is not unhealthy
+        self.write_json({"status": "ok", "backends": guard_status()})
+
+class SubmitHandler(ApiHandler):
+    async def post(self):
+        api_key = backend_api_key()
+        if not api_key:
+            raise tornado.web.HTTPError(503, reason="No API key for the vision backend is configured on this worker")
+
+        uploads = self.request.files.get("images", [])
+        tray = self.get_body_argument("tray", "false").lower() in ("1", "true", "yes")
+        if not uploads or (len(uploads) < 2 and not tray):
+            raise tornado.web.HTTPError(400, reason="Upload at least 2 images from different angles (or a tray photo)")
+
+        # Angles default to upload order, like the Streamlit uploader
+        angles = self.get_body_arguments("angles") or []
+        angle_names = [
+            angles[idx] if idx < len(angles) else
+            ANGLE_NAMES[idx] if idx < len(ANGLE_NAMES) else f"Additional View {idx+1}"
+            for idx in range(len(uploads))
+        ]
+        order_info = {field: self.get_body_argument(field, "") for field in ORDER_FIELDS}
+        order_info["inspector"] = order_info["inspector"] or "AI Inspector"
+        order_info["inspection_date"] = self.get_body_argument("inspection_date", datetime.now().strftime("%Y-%m-%d"))
+
+        cascade = None
+        if self.get_body_argument("cascade", "false").lower() in ("1", "true", "yes"):
+            cascade = {
+                "screening_model": self.get_body_argument("screening_model", SCREENING_MODEL),
+                "strong_model": self.get_body_argument("strong_model", STRONG_MODEL)
+            }
+        options = {
+            "inspection_mode": self.get_body_argument("inspection_mode", "Standard"),
+            "cascade": cascade,
+            "golden_samples": self.get_body_argument("golden_samples", "false").lower() in ("1", "true", "yes"),
+            "compact_output": self.get_body_argument("compact_output", "false").lower() in ("1", "true", "yes"),
+            "defect_boxes": self.get_body_argument("defect_boxes", "false").lower() in ("1", "true", "yes"),
+            "symmetry_check": self.get_body_argument("symmetry", "false").lower() in ("1", "true", "yes")
+        }
+
+        images = [upload["body"] for upload in uploads]
+        reinspect = self.get_body_argument("reinspect", "false").lower() in ("1", "true", "yes")
+        # Fair share is per camera station (or client address)
+        station = self.get_body_argument("station", None) or self.request.remote_ip
+        job_id = await self.run_blocking(self.submit, get_openai_client(api_key, OPENAI_BASE_URL), station, images,
+                                         angle_names, order_info, options, tray, reinspect)
+        self.set_header("Location", f"/inspections/{job_id}")
+        self.write_json({"job_id": job_id, "status": "queued", "status_url": f"/inspections/{job_id}"}, status=202)
+
+    def submit(self, client, station, images, angle_names, order_info, options, tray, reinspect):
+        """Tray splitting, re-inspection lookup and the queue submit (decodes and hashes every image)"""
+        if tray:
+            try:
+                images, angle_names = split_trays(images, angle_names)
+            except (UnidentifiedImageError, ValueError) as e:
+                raise tornado.web.HTTPError(400, reason=self.upload_error(e))
+
+        # Re-inspection after rework: linked to the last finished inspection of the PO, style and color
+        if reinspect:
+            previous = self.queue.previous_inspection(order_info)
+            if previous is None:
+                raise tornado.web.HTTPError(409, reason="No finished inspection of this PO, style and color to re-inspect")
+            options["reinspect_of"] = previous["job_id"]
+
+        try:
+            return self.queue.submit(f"api:{station}", client, images, angle_names, order_info, options)
+        except BudgetExceeded as e:
+            raise tornado.web.HTTPError(402, reason=str(e))
+        except (UnidentifiedImageError, ValueError) as e:
+            raise tornado.web.HTTPError(400, reason=self.upload_error(e))
+
+    @staticmethod
+    def upload_error(error):
+        """400 reason for uploads the image code refused (PIL's own message names a BytesIO object)"""
+        if isinstance(error, UnidentifiedImageError):
+            return "Every upload must be a JPEG or PNG image"
+        return str(error)
+
+class StatusHandler(ApiHandler):
+    def get(self, job_id):
+        job = self.get_job(job_id)
+        self.write_json({
+            "job_id": job["job_id"],
+            "status": job["status"],
+            "completed": job["completed"],
+            "total": job["total"],
+            "submitted_at": job["submitted_at"],
+            "finished_at": job["finished_at"],
+            "result": job["final_report"]["result"] if job["final_report"] else None,
+            "images": [f"/images/{digest}" for digest in job.get("image_digests") or []],
+            "report_url": f"/inspections/{job_id}/report" if job["status"] == "done" else None
+        })
+
+class SearchHandler(ApiHandler):
+    async def get(self):
+        query = self.get_query_argument("q", "")
+        if not query.strip():
+            raise tornado.web.HTTPError(400, reason="Give a search query in q")
+        filters = {column: self.get_query_argument(column, None) for column in SEARCH_FILTERS}
+        since, until = self.get_query_argument("since", None), self.get_query_argument("until", None)
+        try:
+            limit = int(self.get_query_argument("limit", str(SEARCH_LIMIT)))
+        except ValueError:
+            raise tornado.web.HTTPError(400, reason="limit must be a number")
+        if limit < 1:
+            raise tornado.web.HTTPError(400, reason="limit must be at least 1")
+        limit = min(limit, MAX_SEARCH_LIMIT)
+        try:
+            if self.get_query_argument("group", "") == "po":
+                pos = await self.run_blocking(self.queue.search.search_pos, query, since, until, limit, **filters)
+                self.write_json({"query": query, "pos": pos})
+            else:
+                hits = await self.run_blocking(self.queue.search.search, query, since, until, limit, **filters)
+                self.write_json({"query": query, "hits": hits})
+        except InvalidQuery as e:
+            raise tornado.web.HTTPError(400, reason=str(e))
+
+class ImageHandler(ApiHandler):
+    async def get(self, digest):
+        original = self.get_query_argument("original", "false").lower() in ("1", "true", "yes")
+        data = await self.run_blocking(self.queue.archive.get, digest, original=original)
+        if data is None:
+            raise tornado.web.HTTPError(404, reason=f"Image {digest} is not in the archive")
+        if not original:
+            self.set_header("Content-Type", "image/webp" if data[8:12] == b"WEBP" else "image/jpeg")
+        self.set_header("Cache-Control", "public, max-age=31536000, immutable")  # Content-addressed
+        self.finish(data)
+
+class ReportHandler(ApiHandler):
+    async def get(self, job_id):
+        report_format = self.get_query_argument("format", "json")
+        if report_format not in ("json", "html", "text"):
+            raise tornado.web.HTTPError(400, reason="format must be json, html or text")
+        job = await self.run_blocking(self.get_job, job_id)
+        if job["status"] != "done":
+            raise tornado.web.HTTPError(409, reason=f"Job {job_id} is {job['status']}")
+
+        report = await self.run_blocking(self.build_report, job, report_format)
+        if report_format == "json":
+            self.write_json(report)
+        else:
+            self.set_header("Content-Type", f"text/{'html' if report_format == 'html' else 'plain'}; charset=UTF-8")
+            self.finish(report)
+
+    def build_report(self, job, report_format):
+        """The export report (json), or the rendered html (with the style's heatmaps) or text report"""
+        order_info = job["order_info"]
+        export_report = build_export_report(order_info, job["final_report"], job["analyses"])
+        if report_format == "html":
+            heatmaps = heatmap_figures(self.queue.heatmaps, self.queue.golden, order_info["style_number"],
+                                       order_info["color"], job["angle_names"])
+            return generate_html_report(export_report, order_info["po_number"], order_info["style_number"], heatmaps)
+        if report_format == "text":
+            return generate_styled_text_report(export_report, order_info["po_number"], order_info["style_number"])
+        return export_report
+
+def make_app(queue=None, api_token=API_TOKEN):
+    queue = queue or InspectionJobQueue()
+    return tornado.web.Application([
+        (r"/healthz", HealthHandler, {"queue": queue}),
+        (r"/inspections", SubmitHandler, {"queue": queue}),
+        (r"/inspections/(\w+)", StatusHandler, {"queue": queue}),
+        (r"/inspections/(\w+)/report", ReportHandler, {"queue": queue}),
+        (r"/images/([0-9a-f]{64})", ImageHandler, {"queue": queue}),
+        (r"/search", SearchHandler, {"queue": queue}),
+    ], api_token=api_token)
+
+def main():
+    parser = argparse.ArgumentParser(description="Footwear QC inspection HTTP API")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("QC_API_PORT", "8600")))
+    parser.add_argument("--address", default=os.environ.get("QC_API_ADDRESS", "127.0.0.1"),
+                        help="Listen address (0.0.0.0 for every interface; set QC_API_TOKEN first)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    if not API_TOKEN and args.address not in ("127.0.0.1", "localhost", "::1"):
+        logging.getLogger(__name__).warning("Listening on %s without QC_API_TOKEN: anyone who can reach it spends "
+                                            "this server's API key", args.address)
+    make_app().listen(args.port, address=args.address, max_body_size=MAX_UPLOAD_BYTES)
+    logging.getLogger(__name__).info("Inspection API listening on %s:%d", args.address, args.port)
+    tornado.ioloop.IOLoop.current().start()
+
+if __name__ == "__main__":
+    main()
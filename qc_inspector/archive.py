@@ -0,0 +1,182 @@
+"""
+Content-addressed archive of the photos behind every verdict.
+
+    python -m qc_inspector.archive compact [--grace-hours 24] [--dry-run]
+
+Every inspected image is stored once under the SHA-256 of its original bytes, so
+re-inspections and duplicate uploads share a blob:
+
+    <root>/<sha[:2]>/<sha>.webp   archival rendition (upright, long side <= ARCHIVE_MAX_SIDE;
+                                  a tuned JPEG when Pillow has no WebP support)
+    <root>/<sha[:2]>/<sha>.orig   the original upload, only with QC_ARCHIVE_ORIGINALS=1
+
+Stored inspections reference their images by digest (job["image_digests"]). Compaction
+marks every digest referenced from the job store and expires the other blobs once they
+are older than the grace period, which covers inspections that are still being submitted.
+Storing a blob that already exists only refreshes its timestamp.
+"""
+import argparse
+import hashlib
+import io
+import logging
+import os
+import threading
+import time
+import uuid
+
+from PIL import Image, ImageOps, features
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = os.environ.get("QC_ARCHIVE_DIR", ".qc_archive")
+KEEP_ORIGINALS = os.environ.get("QC_ARCHIVE_ORIGINALS", "0").lower() in ("1", "true", "yes")
+ARCHIVE_MAX_SIDE = 3072      # Enough to re-examine stitching; phone photos are often 4000+ px
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82            # Fallback rendition without WebP support (4:2:0, optimized Huffman tables)
+ORPHAN_GRACE_HOURS = 24.0    # Unreferenced blobs younger than this are kept
+COMPACT_EVERY_HOURS = 6.0    # Interval of the background compaction in long-running processes
+RENDITION_EXT = "webp" if features.check("webp") else "jpg"
+
+def image_digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+def archival_rendition(data):
+    """(bytes, extension) of the compact archival copy of an uploaded image"""
+    image = ImageOps.exif_transpose(Image.open(io.BytesIO(data))).convert("RGB")
+    image.thumbnail((ARCHIVE_MAX_SIDE, ARCHIVE_MAX_SIDE))
+    buffer = io.BytesIO()
+    if RENDITION_EXT == "webp":
+        image.save(buffer, format="WEBP", quality=WEBP_QUALITY, method=4)
+    else:
+        image.save(buffer, format="JPEG", quality=JPEG_QUALITY, optimize=True, subsampling=2)
+    return buffer.getvalue(), RENDITION_EXT
+
+class ImageArchive:
+    """Blobs on disk keyed by SHA-256 of the original bytes (see the module docstring for the layout)"""
+
+    def __init__(self, root=ARCHIVE_DIR, keep_originals=KEEP_ORIGINALS):
+        self.root = root
+        self.keep_originals = keep_originals
+
+    def _path(self, digest, ext):
+        return os.path.join(self.root, digest[:2], f"{digest}.{ext}")
+
+    def _rendition_path(self, digest):
+        """Path of a stored rendition (either extension), or None"""
+        for ext in ("webp", "jpg"):
+            path = self._path(digest, ext)
+            if os.path.exists(path):
+                return path
+        return None
+
+    @staticmethod
+    def _write(path, data):
+        # Write-then-rename so concurrent readers and writers of the same blob never see a partial file
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex[:6]}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def put(self, data, digest=None):
+        """Archive an uploaded image (raw bytes) and return its digest; existing blobs are only touched"""
+        digest = digest or image_digest(data)
+        path = self._rendition_path(digest)
+        if path:
+            os.utime(path)
+        else:
+            rendition, ext = archival_rendition(data)
+            self._write(self._path(digest, ext), rendition)
+        if self.keep_originals:
+            original = self._path(digest, "orig")
+            if os.path.exists(original):
+                os.utime(original)
+            else:
+                self._write(original, data)
+        return digest
+
+    def get(self, digest, original=False):
+        """Bytes of the archival rendition (or the original, if kept), or None if not archived"""
+        if not all(ch in "0123456789abcdef" for ch in digest) or len(digest) != 64:
+            return None
+        path = self._path(digest, "orig") if original else self._rendition_path(digest)
+        try:
+            with open(path or "", "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def iter_blobs(self):
+        """(digest, path, mtime) of every stored file"""
+        if not os.path.isdir(self.root):
+            return
+        for shard in os.listdir(self.root):
+            shard_dir = os.path.join(self.root, shard)
+            if len(shard) != 2 or not os.path.isdir(shard_dir):
+                continue
+            for name in os.listdir(shard_dir):
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(shard_dir, name)
+                try:
+                    yield name.split(".", 1)[0], path, os.path.getmtime(path)
+                except OSError:
+                    continue
+
+    def compact(self, referenced, grace_hours=ORPHAN_GRACE_HOURS, dry_run=False):
+        """Expire blobs whose digest is not in referenced and that are older than the grace period"""
+        cutoff = time.time() - grace_hours * 3600
+        stats = {"kept": 0, "expired": 0, "freed_bytes": 0}
+        for digest, path, mtime in list(self.iter_blobs()):
+            if digest in referenced or mtime > cutoff:
+                stats["kept"] += 1
+                continue
+            try:
+                size = os.path.getsize(path)
+                if not dry_run:
+                    os.remove(path)
+            except OSError:
+                continue
+            stats["expired"] += 1
+            stats["freed_bytes"] += size
+        return stats
+
+def referenced_digests(store):
+    """Digests of the images referenced by every inspection in a JobStore"""
+    return {digest for job in store.iter_jobs() for digest in job.get("image_digests") or [] if digest}
+
+def compact_archive(archive, store, grace_hours=ORPHAN_GRACE_HOURS, dry_run=False):
+    stats = archive.compact(referenced_digests(store), grace_hours, dry_run)
+    logger.info("Image archive compaction%s: %d blobs kept, %d expired (%.1f MB)", " (dry run)" if dry_run else "",
+                stats["kept"], stats["expired"], stats["freed_bytes"] / 1e6)
+    return stats
+
+def start_compaction(archive, store, every_hours=COMPACT_EVERY_HOURS):
+    """Compact the archive periodically in a daemon thread"""
+    def run():
+        while True:
+            time.sleep(every_hours * 3600)
+            try:
+                compact_archive(archive, store)
+            except OSError:
+                logger.exception("Image archive compaction failed")
+    thread = threading.Thread(target=run, name="qc-archive-compaction", daemon=True)
+    thread.start()
+    return thread
+
+def main():
+    from .jobs import JobStore
+
+    parser = argparse.ArgumentParser(description="Content-addressed image archive maintenance")
+    commands = parser.add_subparsers(dest="command", required=True)
+    compact = commands.add_parser("compact", help="Expire blobs no stored inspection references")
+    compact.add_argument("--grace-hours", type=float, default=ORPHAN_GRACE_HOURS)
+    compact.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    stats = compact_archive(ImageArchive(), JobStore(), args.grace_hours, args.dry_run)
+    print(f"{stats['kept']} blobs kept, {stats['expired']} expired, {stats['freed_bytes'] / 1e6:.1f} MB freed")
+
+if __name__ == "__main__":
+    main()
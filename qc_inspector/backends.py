@@ -0,0 +1,113 @@
+"""
+OpenAI-compatible vision backend: api.openai.com, or an on-prem server next to the line.
+
+    QC_BACKEND_CONFIG=line3-backend.json streamlit run app.py
+
+line3-backend.json:
+    {
+        "base_url": "http://qc-vision.line3.local:8000/v1",
+        "api_key_env": "LINE3_VISION_KEY",
+        "strong_model": "qwen2.5-vl-7b-instruct",
+        "screening_model": "qwen2.5-vl-3b-instruct",
+        "models": {
+            "qwen2.5-vl-7b-instruct": {"max_tokens": 600, "detail": "high", "response_format": "auto",
+                                       "price": [0, 0], "image_tokens": [0, 0]}
+        }
+    }
+
+Per-model options (all optional):
+    max_tokens       upper bound on completion tokens per call
+    detail           image detail sent instead of the planned one ("low", "high" or "auto")
+    response_format  "json_schema", "json_object" or "none" (prompted JSON only, the default);
+                     "auto" probes json_schema -> json_object -> none and remembers what the server rejected
+    price            USD per 1M (input, output) tokens, for the cost estimator
+    image_tokens     (base tokens, tokens per 512px tile), for the cost estimator
+
+Without a config file the app talks to api.openai.com (or OPENAI_BASE_URL) with
+gpt-4o and gpt-4o-mini, exactly as before.
+"""
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+BACKEND_CONFIG_PATH = os.environ.get("QC_BACKEND_CONFIG")
+RESPONSE_FORMATS = ("json_schema", "json_object", "none")   # Best first; "none" always works
+
+DEFAULT_BACKEND = {
+    "base_url": None,
+    "api_key": None,
+    "api_key_env": "OPENAI_API_KEY",
+    "strong_model": "gpt-4o",
+    "screening_model": "gpt-4o-mini",
+    "models": {},
+}
+DEFAULT_MODEL_OPTIONS = {
+    "max_tokens": None,
+    "detail": None,
+    "response_format": "none",
+    "price": None,
+    "image_tokens": None,
+}
+
+def load_backend(path=BACKEND_CONFIG_PATH):
+    """Backend settings from a JSON config file, on top of the OpenAI defaults"""
+    backend = dict(DEFAULT_BACKEND)
+    if path:
+        with open(path) as f:
+            backend.update(json.load(f))
+    for model, options in backend["models"].items():
+        unknown = set(options) - set(DEFAULT_MODEL_OPTIONS)
+        if unknown:
+            raise ValueError(f"Unknown options {sorted(unknown)} for model {model} in {path}")
+        if options.get("response_format", "none") not in RESPONSE_FORMATS + ("auto",):
+            raise ValueError(f"Invalid response_format {options['response_format']!r} for model {model} in {path}")
+    return backend
+
+BACKEND = load_backend()
+
+def model_options(model):
+    """Request options of a model: configured values over DEFAULT_MODEL_OPTIONS"""
+    return {**DEFAULT_MODEL_OPTIONS, **BACKEND["models"].get(model, {})}
+
+def backend_api_key():
+    """Server-side API key of the backend (config value, else its environment variable), or None"""
+    return BACKEND["api_key"] or os.environ.get(BACKEND["api_key_env"] or "OPENAI_API_KEY")
+
+# Response formats a server rejected, per (base URL, model); learned at run time
+_unsupported = {}
+_unsupported_lock = threading.Lock()
+
+def response_format_ladder(base_url, model, schema=None):
+    """Response formats to try for a call, best first, skipping those the server already rejected"""
+    configured = model_options(model)["response_format"]
+    if schema is None or configured == "none":
+        return ["none"]
+    start = RESPONSE_FORMATS.index("json_schema" if configured == "auto" else configured)
+    with _unsupported_lock:
+        rejected = _unsupported.get((base_url, model), set())
+        return [f for f in RESPONSE_FORMATS[start:] if f not in rejected]
+
+def rejects_response_format(error):
+    """True if error is a 400 that names the structured-output request field, not some other bad input"""
+    if getattr(error, "status_code", None) != 400:
+        return False
+    body = getattr(error, "body", None)
+    text = f"{error} {json.dumps(body, default=str) if body is not None else ''}".lower()
+    return any(term in text for term in ("response_format", "json_schema", "json_object"))
+
+def mark_unsupported(base_url, model, response_format, error):
+    with _unsupported_lock:
+        _unsupported.setdefault((base_url, model), set()).add(response_format)
+    logger.warning("%s at %s rejected response_format=%s, falling back: %s",
+                   model, base_url or "api.openai.com", response_format, error)
+
+def response_format_param(response_format, schema, name="qc_analysis"):
+    """The response_format request field for a ladder step (None for plain prompted JSON)"""
+    if response_format == "json_schema":
+        return {"type": "json_schema", "json_schema": {"name": name, "schema": schema, "strict": True}}
+    if response_format == "json_object":
+        return {"type": "json_object"}
+    return None
@@ -0,0 +1,40 @@
+"""OpenAI client construction shared by the Streamlit app and the HTTP API"""
+import os
+
+import httpx
+
+from .backends import BACKEND
+from .transport import make_transport
+
+# OpenAI connection settings (an on-prem OpenAI-compatible server when QC_BACKEND_CONFIG names one)
+OPENAI_BASE_URL = os.environ.get("OPENAI_BASE_URL") or BACKEND["base_url"]
+OPENAI_TIMEOUT = httpx.Timeout(
+    90.0,          # read/write: a vision reply normally arrives well within this
+    connect=10.0,  # fail fast when the API host is unreachable
+    pool=30.0      # wait for a free pooled connection when all are busy
+)
+OPENAI_POOL_LIMITS = httpx.Limits(
+    max_connections=32,            # shared by every session and inspection worker
+    max_keepalive_connections=16,
+    keepalive_expiry=120.0         # reuse TLS connections across inspections
+)
+
+def create_openai_client(api_key, base_url=None):
+    """
+    OpenAI client with a tuned connection pool and explicit timeouts (cache one per key and base URL).
+    QC_TRANSPORT_MODE=record/replay puts the cassette transport underneath (see transport.py).
+    """
+    import openai  # Deferred: a large import that only client construction needs
+
+    http_client = httpx.Client(
+        limits=OPENAI_POOL_LIMITS,
+        timeout=OPENAI_TIMEOUT,
+        transport=make_transport(OPENAI_POOL_LIMITS)
+    )
+    return openai.OpenAI(
+        api_key=api_key,
+        base_url=base_url,
+        http_client=http_client,
+        timeout=OPENAI_TIMEOUT,
+        max_retries=2
+    )
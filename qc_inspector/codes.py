@@ -0,0 +1,168 @@
+"""
+Compact coded output: defect codes, location enum and local expansion.
+
+In compact mode the model answers with defect codes from the taxonomy below instead
+of prose, e.g. {"d": [["maj", "GLO", "FOX", "heel side"]], "c": "P", "k": "H", "n": "..."},
+which needs a fraction of the completion tokens. expand_compact_analysis turns that
+back into the standard analysis dict (human-readable defect strings), so the QC
+report, the exports and the renderers see no difference.
+"""
+
+# Defect taxonomy of the inspection prompt: code -> (description, default severity)
+DEFECT_CODES = {
+    # Critical: structural integrity and safety
+    "OSD": ("Outsole debonding or separation", "critical"),
+    "HLB": ("Heel broken, warped or causing instability/tilt", "critical"),
+    "BBD": ("Boot barrel (elastic band) deformation", "critical"),
+    "LNX": ("The inside exploded (major lining failure)", "critical"),
+    "UPD": ("The upper is damaged (tear or hole larger than 1mm)", "critical"),
+    "BRK": ("Broken or cracked structural component", "critical"),
+    "HKK": ("Heel kick (severe front and back kick deformation)", "critical"),
+    "SHP": ("Sharp edge or protruding element", "critical"),
+    "RWR": ("Rubber wire creating a safety risk", "critical"),
+    "LHW": ("Loose hardware that could cause injury", "critical"),
+    "CHM": ("Visible contamination or chemical residue", "critical"),
+    # Major: adhesive and bonding
+    "GLO": ("Overflowing glue (visible excess adhesive)", "major"),
+    "GLL": ("The outsole lacks glue (poor bonding preparation)", "major"),
+    "GAP": ("The outsole combination is not tight (gap over 1mm)", "major"),
+    "MSG": ("The middle skin is glued improperly", "major"),
+    "SKG": ("The skin is glued with visible defects", "major"),
+    "BND": ("Poor bonding between upper, midsole and outsole", "major"),
+    # Major: alignment and shape
+    "RTS": ("The rear trim strip is skewed", "major"),
+    "SKL": ("Skewed lines (edges or spacing misaligned)", "major"),
+    "TCR": ("The toe of the shoe is crooked", "major"),
+    "TCL": ("Toe cap length inconsistent or toe box misaligned", "major"),
+    "BPH": ("The back package is high and low (uneven heel counter)", "major"),
+    "MIS": ("Component misaligned or twisted relative to the centerline", "major"),
+    "HCD": ("Heel counter shape or height inconsistent or deformed", "major"),
+    # Major: material deformation
+    "WRU": ("Wrinkled upper (significant creasing)", "major"),
+    "WRI": ("Inner wrinkles (lining deformation)", "major"),
+    "WST": ("The waist is not smooth (poor lasting)", "major"),
+    "IND": ("Indentation on the upper", "major"),
+    "MFI": ("Midfoot/shank irregularity affecting the profile", "major"),
+    # Major: colour and appearance
+    "CAB": ("Chromatic aberration (noticeable colour difference)", "major"),
+    "CLV": ("Colour variation between shoe parts", "major"),
+    "CBL": ("Colour bleeding or staining between materials", "major"),
+    "DYE": ("Uneven dyeing or colour patches", "major"),
+    # Major: construction
+    "UTH": ("Upper thread defect (loose, broken or improper stitching)", "major"),
+    "LST": ("Poor toe lasting (wrinkles, bubbles, asymmetry)", "major"),
+    "STC": ("Misaligned or crooked stitching line", "major"),
+    "PKR": ("Puckering or gathering in upper material", "major"),
+    # Major: hardware, lining, sole
+    "EYE": ("Damaged, bent or non-functional eyelet", "major"),
+    "HOK": ("Broken or damaged lace hook/D-ring", "major"),
+    "VEL": ("Velcro not adhering properly", "major"),
+    "BKL": ("Buckle damage or malfunction", "major"),
+    "LNG": ("Lining tear, wrinkle or separation", "major"),
+    "INS": ("Sock liner/insole misprint or damage", "major"),
+    "TNG": ("Tongue positioned off-centre", "major"),
+    "OMD": ("Outsole molding defect or incomplete pattern", "major"),
+    "MSC": ("Midsole compression or deformation", "major"),
+    "HCP": ("Heel cap damage or misalignment", "major"),
+    "TRD": ("Tread pattern inconsistency", "major"),
+    # Minor: surface, finishing, cosmetic
+    "DRT": ("Surface dirt or dust (cleanable)", "minor"),
+    "SCF": ("Minor scuff mark (under 3mm)", "minor"),
+    "ADR": ("Small adhesive residue spot", "minor"),
+    "PEN": ("Temporary marking pen mark", "minor"),
+    "TRN": ("Transparency mark", "minor"),
+    "THE": ("Thread end not trimmed (under 3mm)", "minor"),
+    "STI": ("Minor stitching irregularity", "minor"),
+    "TEX": ("Small material texture variation", "minor"),
+    "LOG": ("Minor logo/branding imperfection", "minor"),
+    "TCN": ("Toe corner slightly irregular", "minor"),
+    "SOT": ("Minor sole texture variation", "minor"),
+    "ASY": ("Slight asymmetry in a non-structural element", "minor"),
+    "TRM": ("Minor trim imperfection", "minor"),
+    "OTH": ("Other defect", None),
+}
+
+# Where on the shoe: code -> human location
+LOCATIONS = {
+    "TOE": "Toe box",
+    "TCP": "Toe cap",
+    "VMP": "Vamp",
+    "TNG": "Tongue",
+    "LAC": "Laces/eyelets",
+    "COL": "Collar",
+    "QML": "Medial quarter",
+    "QLT": "Lateral quarter",
+    "WST": "Waist",
+    "HEL": "Heel",
+    "HCT": "Heel counter",
+    "BSM": "Back seam",
+    "FOX": "Foxing/sole edge",
+    "MID": "Midsole",
+    "OUT": "Outsole",
+    "INS": "Insole",
+    "LIN": "Lining",
+    "LOG": "Logo",
+    "ALL": "Overall",
+}
+
+SEVERITIES = {"cri": "critical", "maj": "major", "min": "minor"}   # by prefix: crit, maj, minor...
+CONDITIONS = {"G": "Good", "F": "Fair", "P": "Poor"}
+CONFIDENCES = {"H": "High", "M": "Medium", "L": "Low"}
+
+def build_compact_output_format(angle_name):
+    """Output section of the inspection prompt for compact coded answers"""
+    codes = "\n".join(f"{code}={description}" for code, (description, _) in DEFECT_CODES.items())
+    locations = " ".join(f"{code}={name}" for code, name in LOCATIONS.items())
+    return f"""OUTPUT REQUIREMENTS (COMPACT CODED FORMAT):
+Answer with defect codes only, no prose descriptions. Reply with exactly one JSON object for the {angle_name}:
+
+{{"d": [["severity", "CODE", "LOC", "note"]], "c": "G/F/P", "k": "H/M/L", "n": "summary"}}
+
+- d: one entry per defect; [] if the view is clean
+- severity: crit, maj or min (apply the classification system above)
+- CODE: defect code from the list below; OTH only if nothing fits, with the defect in the note
+- LOC: location code from the list below
+- note: at most 6 words (side, size or position), or ""
+- c: overall condition Good/Fair/Poor; k: confidence High/Medium/Low
+- n: at most 15 words on image quality or concerns
+
+DEFECT CODES:
+{codes}
+
+LOCATION CODES:
+{locations}"""
+
+def expand_defect(code, location, note=""):
+    """Human-readable defect string for a coded defect, e.g. "Foxing/sole edge: Overflowing glue (...) - heel side" """
+    description = DEFECT_CODES.get(code, (None, None))[0] or f"Defect {code}"
+    text = f"{LOCATIONS.get(location, location or 'Unspecified location')}: {description}"
+    return f"{text} - {note}" if note else text
+
+def expand_compact_analysis(raw, angle_name):
+    """Standard angle analysis from a compact coded reply (unknown codes are kept, never dropped)"""
+    analysis = {
+        "angle": angle_name,
+        "critical_defects": [],
+        "major_defects": [],
+        "minor_defects": [],
+        "overall_condition": CONDITIONS.get(str(raw.get("c", "")).upper()[:1], "Fair"),
+        "confidence": CONFIDENCES.get(str(raw.get("k", "")).upper()[:1], "Low"),
+        "inspection_notes": str(raw.get("n") or ""),
+        "coded_defects": []
+    }
+    for entry in raw.get("d") or []:
+        if not isinstance(entry, (list, tuple)) or len(entry) < 2:
+            continue
+        severity, code, location, note = (list(entry) + ["", ""])[:4]
+        code = str(code).upper()
+        location = str(location or "").upper()
+        # A missing or unknown severity falls back to the code's class (major for OTH)
+        severity = SEVERITIES.get(str(severity).lower()[:3]) or DEFECT_CODES.get(code, (None, None))[1] or "major"
+        analysis[f"{severity}_defects"].append(expand_defect(code, location, str(note or "")))
+        analysis["coded_defects"].append({"severity": severity, "code": code, "location": location,
+                                          "note": str(note or "")})
+    # Passed through for adaptive tiling and defect heatmaps
+    for key in ("suspect_regions", "defect_boxes"):
+        if key in raw:
+            analysis[key] = raw[key]
+    return analysis
@@ -0,0 +1,227 @@
+"""Pre-flight token and cost estimates, and the per-PO / per-day budget governor"""
+import json
+import math
+import os
+import threading
+import uuid
+
+from .backends import BACKEND, model_options
+from .locking import file_lock
+from .analysis import (
+    COMPACT_MAX_TOKENS, DEFECT_BOX_REQUEST, DEFECT_BOX_TOKENS, MAX_SUSPECT_REGIONS, OVERVIEW_MAX_SIDE,
+    REGION_REQUEST, STRONG_MODEL, build_inspection_prompt, build_region_prompt
+)
+
+# USD per 1M tokens (input, output). Update when OpenAI pricing changes.
+MODEL_PRICES = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+}
+# Image token accounting per model: (base tokens, tokens per 512px tile)
+IMAGE_TOKEN_RATES = {
+    "gpt-4o": (85, 170),
+    "gpt-4o-mini": (2833, 5667),
+}
+# Configured backend models (e.g. free on-prem models at price [0, 0])
+for _model, _options in BACKEND["models"].items():
+    if _options.get("price") is not None:
+        MODEL_PRICES[_model] = tuple(_options["price"])
+    if _options.get("image_tokens") is not None:
+        IMAGE_TOKEN_RATES[_model] = tuple(_options["image_tokens"])
+# Models without rates are planned at gpt-4o rates, which over- rather than under-estimates
+FALLBACK_MODEL = "gpt-4o"
+
+CHARS_PER_TOKEN = 3.5        # Conservative for the English prompts, without a tokenizer dependency
+STANDARD_MAX_TOKENS = 800    # Completion budget of a full angle analysis
+REGION_MAX_TOKENS = 400      # Completion budget of one close-up crop
+
+# Budget governor ladder: (detail, max_side) from best quality to cheapest
+GOVERNOR_LADDER = [("auto", None), ("auto", 1024), ("auto", 512), ("low", 512)]
+
+SPEND_LEDGER_PATH = os.environ.get("QC_SPEND_LEDGER", ".qc_spend.json")
+BUDGET_PER_PO = float(os.environ.get("QC_BUDGET_PER_PO", "0"))    # USD, 0 = unlimited
+BUDGET_PER_DAY = float(os.environ.get("QC_BUDGET_PER_DAY", "0"))  # USD, 0 = unlimited
+
+class BudgetExceeded(Exception):
+    """Raised when even the cheapest inspection plan does not fit the remaining budget"""
+
+    def __init__(self, plan):
+        self.plan = plan
+        super().__init__(f"Estimated ${plan['cost']:.3f} exceeds the remaining budget of ${plan['remaining']:.3f}")
+
+def image_tokens(width, height, detail="auto", model=STRONG_MODEL):
+    """Vision input tokens for an image of this size as the API bills it"""
+    base, per_tile = IMAGE_TOKEN_RATES.get(model) or IMAGE_TOKEN_RATES[FALLBACK_MODEL]
+    if detail == "low":
+        return base
+    # high/auto: fit in 2048x2048, then the shortest side down to 768, then count 512px tiles
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    return base + per_tile * math.ceil(width / 512) * math.ceil(height / 512)
+
+def text_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def downscaled_size(size, max_side):
+    """Image size after encode_image's optional downscale"""
+    width, height = size
+    if not max_side or max(width, height) <= max_side:
+        return width, height
+    scale = max_side / max(width, height)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+def call_cost(model, prompt_tokens, completion_tokens):
+    input_price, output_price = MODEL_PRICES.get(model) or MODEL_PRICES[FALLBACK_MODEL]
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+def usage_cost(usage):
+    """Actual cost of a usage record as built by analysis.record_usage"""
+    return sum(call_cost(model, t["prompt_tokens"], t["completion_tokens"]) for model, t in usage.items())
+
+def estimate_angle_calls(image_size, angle_name, order_info, inspection_mode="Standard", cascade=None,
+                         detail="auto", max_side=None, compact=False, defect_boxes=False):
+    """
+    Upper-bound list of (model, prompt_tokens, completion_tokens) for one angle:
+    completions are counted at max_tokens, a cascade at both tiers, adaptive tiling at every crop.
+    """
+    style_number, color, po_number = order_info["style_number"], order_info["color"], order_info["po_number"]
+    prompt = build_inspection_prompt(angle_name, style_number, color, po_number, compact)
+    max_tokens = COMPACT_MAX_TOKENS if compact else STANDARD_MAX_TOKENS
+    if defect_boxes:
+        prompt += DEFECT_BOX_REQUEST
+        max_tokens += DEFECT_BOX_TOKENS
+    models = [cascade["screening_model"], cascade["strong_model"]] if cascade else [STRONG_MODEL]
+
+    calls = []
+    for model in models:
+        # Backend per-model options cap completions and override the detail level, as in call_vision_model
+        options = model_options(model)
+        cap = options["max_tokens"] or max_tokens
+        if inspection_mode == "Adaptive tiling":
+            width, height = downscaled_size(image_size, OVERVIEW_MAX_SIDE)
+            overview_prompt = prompt + REGION_REQUEST.format(max_regions=MAX_SUSPECT_REGIONS)
+            calls.append((model, text_tokens(overview_prompt)
+                          + image_tokens(width, height, options["detail"] or "low", model), min(max_tokens, cap)))
+            # Planning figure: each close-up covers about a quarter of the view
+            region_prompt = build_region_prompt(angle_name, "suspected defect", style_number, color, po_number)
+            crop_tokens = image_tokens(image_size[0] / 2, image_size[1] / 2, options["detail"] or "high", model)
+            calls.extend([(model, text_tokens(region_prompt) + crop_tokens, min(REGION_MAX_TOKENS, cap))]
+                         * MAX_SUSPECT_REGIONS)
+        else:
+            width, height = downscaled_size(image_size, max_side)
+            calls.append((model, text_tokens(prompt) + image_tokens(width, height, options["detail"] or detail, model),
+                          min(max_tokens, cap)))
+    return calls
+
+def estimate_inspection(image_sizes, angle_names, order_info, inspection_mode="Standard", cascade=None,
+                        detail="auto", max_side=None, compact=False, defect_boxes=False):
+    """Upper-bound tokens and cost of a whole inspection with fixed settings"""
+    prompt_tokens = completion_tokens = 0
+    cost = 0.0
+    for image_size, angle_name in zip(image_sizes, angle_names):
+        for model, prompt, completion in estimate_angle_calls(image_size, angle_name, order_info, inspection_mode,
+                                                              cascade, detail, max_side, compact, defect_boxes):
+            prompt_tokens += prompt
+            completion_tokens += completion
+            cost += call_cost(model, prompt, completion)
+    return {
+        "detail": detail,
+        "max_side": max_side,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "cost": cost
+    }
+
+def plan_inspection(image_sizes, angle_names, order_info, options, remaining=None):
+    """
+    Pick the best detail level and downscale target whose estimate fits the remaining budget.
+    remaining=None means unlimited. The plan's within_budget is False if nothing fits.
+    """
+    inspection_mode = options.get("inspection_mode", "Standard")
+    # Adaptive tiling already fixes its own detail levels
+    ladder = GOVERNOR_LADDER[:1] if inspection_mode == "Adaptive tiling" else GOVERNOR_LADDER
+
+    for step, (detail, max_side) in enumerate(ladder):
+        plan = estimate_inspection(image_sizes, angle_names, order_info, inspection_mode, options.get("cascade"),
+                                   detail, max_side, options.get("compact_output", False),
+                                   options.get("defect_boxes", False))
+        plan["downgraded"] = step > 0
+        plan["remaining"] = remaining
+        plan["within_budget"] = remaining is None or plan["cost"] <= remaining
+        if plan["within_budget"]:
+            break
+    return plan
+
+class SpendLedger:
+    """
+    Committed (estimated, in flight) and actual spend per PO and per day, persisted as JSON.
+    Updates re-read the file under a file lock, so processes sharing it see each other's spend.
+    """
+
+    def __init__(self, path=SPEND_LEDGER_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {"po": {}, "day": {}}
+
+    def _save(self, ledger):
+        tmp_path = f"{self.path}.{uuid.uuid4().hex[:6]}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(ledger, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def _update(self, po_number, day, budgets=None, plan=None, **deltas):
+        """Apply deltas to the PO and day entries; with budgets, first check that plan still fits them"""
+        with self._lock, file_lock(self.path):
+            ledger = self._load()
+            if budgets:
+                remaining = self._remaining(self._spent(ledger, po_number, day), *budgets)
+                if remaining is not None and plan["cost"] > remaining:
+                    raise BudgetExceeded(dict(plan, remaining=remaining, within_budget=False))
+            for scope, key in (("po", po_number), ("day", day)):
+                entry = ledger[scope].setdefault(key, {"estimated": 0.0, "committed": 0.0, "actual": 0.0})
+                for field, delta in deltas.items():
+                    entry[field] = max(0.0, entry[field] + delta)
+            self._save(ledger)
+
+    @staticmethod
+    def _spent(ledger, po_number, day):
+        totals = []
+        for scope, key in (("po", po_number), ("day", day)):
+            entry = ledger[scope].get(key, {})
+            totals.append(entry.get("actual", 0.0) + entry.get("committed", 0.0))
+        return tuple(totals)
+
+    def spent(self, po_number, day):
+        """(PO spend, day spend), counting in-flight jobs at their estimate"""
+        return self._spent(self._load(), po_number, day)
+
+    @staticmethod
+    def _remaining(totals, po_budget, day_budget):
+        po_spent, day_spent = totals
+        limits = [budget - spent for budget, spent in ((po_budget, po_spent), (day_budget, day_spent)) if budget]
+        return max(0.0, min(limits)) if limits else None
+
+    def remaining(self, po_number, day, po_budget=BUDGET_PER_PO, day_budget=BUDGET_PER_DAY):
+        """Smallest remaining budget for this PO and day, or None if neither is limited"""
+        return self._remaining(self.spent(po_number, day), po_budget, day_budget)
+
+    def entry(self, scope, key):
+        return self._load()[scope].get(key, {"estimated": 0.0, "committed": 0.0, "actual": 0.0})
+
+    def commit(self, po_number, day, plan, po_budget=BUDGET_PER_PO, day_budget=BUDGET_PER_DAY):
+        """
+        Reserve a plan's estimate. Raises BudgetExceeded if it no longer fits the remaining budget:
+        checked in the same locked update, so concurrent submits cannot both take the last of it.
+        """
+        self._update(po_number, day, (po_budget, day_budget), plan, estimated=plan["cost"], committed=plan["cost"])
+
+    def settle(self, po_number, day, estimate, actual):
+        self._update(po_number, day, committed=-estimate, actual=actual)
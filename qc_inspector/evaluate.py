@@ -0,0 +1,301 @@
+"""
+Prompt and model evaluation over a labelled corpus.
+
+    python -m qc_inspector.evaluate run --corpus eval/corpus --config eval/v1.json --config eval/v2-compact.json
+    python -m qc_inspector.evaluate compare --baseline 3f2a9c1e7b40 8d61e0a2c95f
+
+Corpus: <corpus>/labels.jsonl, one labelled view per line (image paths relative to the corpus):
+    {"image": "0144540/front.jpg", "angle": "Front View", "verdict": "fail", "categories": ["major", "GLO"],
+     "po_number": "0144540", "style_number": "GS1412401B", "color": "PPB"}
+verdict is "fail" if the view has a critical or major defect, else "pass". categories are the
+severity classes (critical, major, minor) and/or defect codes (codes.py) present in the view.
+
+Config: a JSON file describing one prompt/model setup; every key is optional:
+    {"name": "v2-compact", "model": "gpt-4o", "inspection_mode": "Standard", "cascade": null,
+     "compact_output": true, "detail": "auto", "max_side": null, "prompt_template": "prompts/v2.txt"}
+prompt_template is a file used instead of the built-in prompt ($angle_name, $style_number, $color
+and $po_number are filled in). Without it the run evaluates the current build_inspection_prompt.
+
+Each run is stored under QC_EVAL_DIR/<run_id>/ (run.json with config, prompt hash and metrics,
+results.jsonl with every view), so runs of different versions can be compared side by side.
+compare --baseline exits 1 when a run costs noticeably more tokens per view than the baseline
+without agreeing better with the labels.
+"""
+import argparse
+import hashlib
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from .analysis import STRONG_MODEL, build_inspection_prompt, inspect_angle, open_image
+from .backends import backend_api_key
+from .client import OPENAI_BASE_URL, create_openai_client
+from .cost import usage_cost
+
+EVAL_DIR = os.environ.get("QC_EVAL_DIR", ".qc_eval")
+SEVERITY_CLASSES = ("critical", "major", "minor")
+DEFAULT_CONFIG = {
+    "name": None,
+    "model": STRONG_MODEL,
+    "inspection_mode": "Standard",
+    "cascade": None,
+    "compact_output": False,
+    "detail": "auto",
+    "max_side": None,
+    "prompt_template": None,
+}
+TOKEN_INCREASE_LIMIT = 0.2   # compare --baseline: more tokens per view than this needs better agreement
+
+def load_corpus(corpus_dir):
+    with open(os.path.join(corpus_dir, "labels.jsonl")) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def load_config(path):
+    """Evaluation config from a JSON file, with the prompt template file read in"""
+    with open(path) as f:
+        config = dict(DEFAULT_CONFIG, **json.load(f))
+    unknown = set(config) - set(DEFAULT_CONFIG)
+    if unknown:
+        raise ValueError(f"Unknown config keys {sorted(unknown)} in {path}")
+    config["name"] = config["name"] or os.path.splitext(os.path.basename(path))[0]
+    if config["prompt_template"]:
+        template_path = os.path.join(os.path.dirname(path), config["prompt_template"])
+        with open(template_path) as f:
+            config["prompt_text"] = f.read()
+    return config
+
+def prompt_hash(config):
+    """Short hash of the prompt a config sends (built-in prompt for a sample view otherwise)"""
+    text = config.get("prompt_text") or build_inspection_prompt("$angle_name", "$style_number", "$color",
+                                                                "$po_number", config["compact_output"])
+    return hashlib.sha256(text.encode()).hexdigest()[:10]
+
+def predicted_categories(analysis, with_codes):
+    categories = {severity for severity in SEVERITY_CLASSES if analysis.get(f"{severity}_defects")}
+    if with_codes:
+        categories.update(d["code"] for d in analysis.get("coded_defects") or [])
+    return categories
+
+def evaluate_item(client, config, corpus_dir, item):
+    """Result record of one labelled view under one config (a missing or unreadable image is an error result)"""
+    usage = {}
+    started = time.perf_counter()
+    try:
+        with open(os.path.join(corpus_dir, item["image"]), "rb") as f:
+            image = open_image(f.read())
+        started = time.perf_counter()
+        analysis = inspect_angle(
+            client, image, item["angle"], item.get("style_number", ""), item.get("color", ""),
+            item.get("po_number", ""),
+            adaptive=config["inspection_mode"] == "Adaptive tiling",
+            cascade=config["cascade"],
+            detail=config["detail"],
+            max_side=config["max_side"],
+            usage=usage,
+            compact=config["compact_output"],
+            model=config["model"],
+            prompt_template=config.get("prompt_text")
+        )
+    except Exception as e:
+        analysis = None
+        error = str(e)
+    else:
+        error = None if analysis else "analysis failed"
+    latency_ms = (time.perf_counter() - started) * 1000
+
+    if analysis:
+        categories = predicted_categories(analysis, config["compact_output"])
+        verdict = "fail" if categories & {"critical", "major"} else "pass"
+    else:
+        categories, verdict = set(), "error"
+    return {
+        "image": item["image"],
+        "angle": item["angle"],
+        "expected_verdict": item["verdict"],
+        "predicted_verdict": verdict,
+        "expected_categories": sorted(item.get("categories", [])),
+        "predicted_categories": sorted(categories),
+        "latency_ms": round(latency_ms, 1),
+        "prompt_tokens": sum(u["prompt_tokens"] for u in usage.values()),
+        "completion_tokens": sum(u["completion_tokens"] for u in usage.values()),
+        "cost": usage_cost(usage),
+        "error": error
+    }
+
+def percentiles(values):
+    """{"p50", "p90", "p95", "max"} of a list of numbers (None when empty)"""
+    if not values:
+        return {"p50": None, "p90": None, "p95": None, "max": None}
+    cuts = statistics.quantiles(values, n=100, method="inclusive") if len(values) > 1 else [values[0]] * 99
+    return {"p50": round(cuts[49], 5), "p90": round(cuts[89], 5), "p95": round(cuts[94], 5),
+            "max": round(max(values), 5)}
+
+def summarize(results, with_codes):
+    """Agreement, per-category precision/recall and latency/token/cost percentiles of a run"""
+    categories = set(SEVERITY_CLASSES)
+    for r in results:
+        categories.update(c for c in r["expected_categories"] + r["predicted_categories"]
+                          if with_codes or c in SEVERITY_CLASSES)
+
+    per_category = {}
+    for category in sorted(categories):
+        tp = sum(1 for r in results if category in r["expected_categories"] and category in r["predicted_categories"])
+        fp = sum(1 for r in results if category not in r["expected_categories"] and category in r["predicted_categories"])
+        fn = sum(1 for r in results if category in r["expected_categories"] and category not in r["predicted_categories"])
+        per_category[category] = {
+            "support": tp + fn,
+            "precision": round(tp / (tp + fp), 3) if tp + fp else None,
+            "recall": round(tp / (tp + fn), 3) if tp + fn else None,
+        }
+
+    answered = [r for r in results if r["predicted_verdict"] != "error"]
+    tokens = [r["prompt_tokens"] + r["completion_tokens"] for r in answered]
+    return {
+        "views": len(results),
+        "errors": len(results) - len(answered),
+        "agreement": round(sum(1 for r in results if r["predicted_verdict"] == r["expected_verdict"])
+                           / len(results), 3) if results else None,
+        "missed_fails": sum(1 for r in results if r["expected_verdict"] == "fail" and r["predicted_verdict"] == "pass"),
+        "false_fails": sum(1 for r in results if r["expected_verdict"] == "pass" and r["predicted_verdict"] == "fail"),
+        "categories": per_category,
+        "latency_ms": percentiles([r["latency_ms"] for r in answered]),
+        "tokens_per_view": round(statistics.mean(tokens), 1) if tokens else None,
+        "completion_tokens": percentiles([r["completion_tokens"] for r in answered]),
+        "cost_per_view": percentiles([r["cost"] for r in answered]),
+        "total_cost": round(sum(r["cost"] for r in results), 4),
+    }
+
+def run_evaluation(configs, corpus_dir, client, workers=8, eval_dir=EVAL_DIR):
+    """Evaluate every config over the corpus in one shared worker pool; returns the stored run documents"""
+    corpus = load_corpus(corpus_dir)
+    runs = [{
+        "run_id": uuid.uuid4().hex[:12],
+        "name": config["name"],
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "corpus": os.path.abspath(corpus_dir),
+        "prompt_hash": prompt_hash(config),
+        "config": {key: value for key, value in config.items() if key != "prompt_text"},
+    } for config in configs]
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [[pool.submit(evaluate_item, client, config, corpus_dir, item) for item in corpus]
+                   for config in configs]
+        for run, config, run_futures in zip(runs, configs, futures):
+            results = [future.result() for future in run_futures]
+            run["finished_at"] = datetime.now().isoformat(timespec="seconds")
+            run["summary"] = summarize(results, config["compact_output"])
+            run_dir = os.path.join(eval_dir, run["run_id"])
+            os.makedirs(run_dir, exist_ok=True)
+            with open(os.path.join(run_dir, "results.jsonl"), "w") as f:
+                f.writelines(json.dumps(r) + "\n" for r in results)
+            with open(os.path.join(run_dir, "run.json"), "w") as f:
+                json.dump(run, f, indent=2)
+    return runs
+
+def load_runs(run_ids=None, eval_dir=EVAL_DIR):
+    """Stored runs (all of them, oldest first, or the given ids in that order)"""
+    stored = [name for name in os.listdir(eval_dir)
+              if os.path.exists(os.path.join(eval_dir, name, "run.json"))] if os.path.isdir(eval_dir) else []
+    runs = []
+    for run_id in run_ids or stored:
+        with open(os.path.join(eval_dir, run_id, "run.json")) as f:
+            runs.append(json.load(f))
+    return runs if run_ids else sorted(runs, key=lambda run: run["started_at"])
+
+def _fmt(value, pattern="{:.3f}"):
+    return "-" if value is None else pattern.format(value)
+
+def comparison_table(runs):
+    """Side-by-side text table of run summaries"""
+    rows = [
+        ("run", lambda r: r["run_id"]),
+        ("name", lambda r: r["name"]),
+        ("prompt", lambda r: r["prompt_hash"]),
+        ("model", lambda r: (r["config"].get("cascade") or {}).get("strong_model") or r["config"]["model"]),
+        ("views / errors", lambda r: f"{r['summary']['views']} / {r['summary']['errors']}"),
+        ("agreement", lambda r: _fmt(r["summary"]["agreement"])),
+        ("missed fails", lambda r: str(r["summary"]["missed_fails"])),
+        ("false fails", lambda r: str(r["summary"]["false_fails"])),
+    ]
+    # Severity classes first, then the labelled defect codes (run.json has the rest)
+    order = {severity: n for n, severity in enumerate(SEVERITY_CLASSES)}
+    categories = sorted({c for run in runs for c, metrics in run["summary"]["categories"].items()
+                         if c in order or metrics["support"]}, key=lambda c: (order.get(c, len(order)), c))
+    for category in categories:
+        rows.append((f"{category} P/R", lambda r, c=category: "/".join(
+            _fmt(r["summary"]["categories"].get(c, {}).get(k), "{:.2f}") for k in ("precision", "recall"))))
+    rows += [
+        ("latency p50/p95 ms", lambda r: "/".join(_fmt(r["summary"]["latency_ms"][k], "{:.0f}") for k in ("p50", "p95"))),
+        ("tokens per view", lambda r: _fmt(r["summary"]["tokens_per_view"], "{:.0f}")),
+        ("completion p50/p95", lambda r: "/".join(_fmt(r["summary"]["completion_tokens"][k], "{:.0f}")
+                                                  for k in ("p50", "p95"))),
+        ("cost/view p50/p95 $", lambda r: "/".join(_fmt(r["summary"]["cost_per_view"][k], "{:.4f}")
+                                                   for k in ("p50", "p95"))),
+        ("total cost $", lambda r: _fmt(r["summary"]["total_cost"], "{:.3f}")),
+    ]
+    cells = [[label] + [render(run) for run in runs] for label, render in rows]
+    widths = [max(len(row[col]) for row in cells) for col in range(len(runs) + 1)]
+    return "\n".join("  ".join(cell.ljust(width) for cell, width in zip(row, widths)) for row in cells)
+
+def regressions(baseline, runs, token_increase=TOKEN_INCREASE_LIMIT):
+    """Runs using more than token_increase more tokens per view than the baseline without better agreement"""
+    base = baseline["summary"]
+    flagged = []
+    for run in runs:
+        summary = run["summary"]
+        if run["run_id"] == baseline["run_id"] or not summary["tokens_per_view"] or not base["tokens_per_view"]:
+            continue
+        increase = summary["tokens_per_view"] / base["tokens_per_view"] - 1
+        if increase > token_increase and (summary["agreement"] or 0) <= (base["agreement"] or 0):
+            flagged.append((run, increase))
+    return flagged
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate prompt and model versions over a labelled corpus")
+    parser.add_argument("--eval-dir", default=EVAL_DIR, help="Where runs are stored (default QC_EVAL_DIR)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="Evaluate one or more configs")
+    run_parser.add_argument("--corpus", required=True, help="Directory with labels.jsonl and the images")
+    run_parser.add_argument("--config", action="append", required=True, help="Config JSON (repeatable)")
+    run_parser.add_argument("--workers", type=int, default=8, help="Views evaluated in parallel")
+    compare_parser = commands.add_parser("compare", help="Compare stored runs side by side")
+    compare_parser.add_argument("runs", nargs="*", help="Run ids (default: all stored runs)")
+    compare_parser.add_argument("--baseline", default=None, help="Run id the others are gated against")
+    compare_parser.add_argument("--max-token-increase", type=float, default=TOKEN_INCREASE_LIMIT)
+    args = parser.parse_args()
+
+    if args.command == "run":
+        api_key = backend_api_key()
+        if not api_key:
+            parser.error("No API key for the vision backend (OPENAI_API_KEY or the backend config)")
+        configs = [load_config(path) for path in args.config]
+        runs = run_evaluation(configs, args.corpus, create_openai_client(api_key, OPENAI_BASE_URL),
+                              args.workers, args.eval_dir)
+        print(comparison_table(runs))
+        return
+
+    run_ids = args.runs + ([args.baseline] if args.baseline and args.runs and args.baseline not in args.runs else [])
+    missing = [run_id for run_id in run_ids if not os.path.exists(os.path.join(args.eval_dir, run_id, "run.json"))]
+    if missing:
+        sys.exit(f"No stored run {', '.join(missing)} in {args.eval_dir}")
+    runs = load_runs(run_ids, args.eval_dir)
+    if not runs:
+        sys.exit(f"No stored runs in {args.eval_dir}")
+    print(comparison_table(runs))
+    if args.baseline:
+        baseline = next((run for run in runs if run["run_id"] == args.baseline), None)
+        if baseline is None:
+            sys.exit(f"Baseline {args.baseline} is not a stored run in {args.eval_dir}")
+        flagged = regressions(baseline, runs, args.max_token_increase)
+        for run, increase in flagged:
+            print(f"\nREGRESSION {run['run_id']} ({run['name']}): {increase:+.0%} tokens per view vs "
+                  f"{baseline['run_id']} with no gain in agreement", file=sys.stderr)
+        sys.exit(1 if flagged else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""
+Columnar exports of finished inspections for BI and log pipelines.
+
+    python -m qc_inspector.export --parquet exports/parquet --ndjson exports/inspections.ndjson
+
+Inspections, angle analyses and individual defects are flattened into three Arrow
+tables and written as Parquet datasets partitioned by inspection_date and customer.
+Writes are append-only: each run adds new files for jobs not exported before
+(tracked in _exported_jobs.txt), so a nightly run only pays for the new day.
+NDJSON writes one JSON object per record (record = inspection / angle / defect); a log
+file keeps its own manifest beside it (<log>.exported_jobs.txt) and only gets new jobs.
+Jobs every target already has are skipped before their JSON is read.
+"""
+import argparse
+import json
+import os
+import sys
+import uuid
+
+from .jobs import JobStore
+
+NDJSON_LOG = os.environ.get("QC_NDJSON_LOG")   # Finished jobs are streamed here when set
+PARTITION_COLS = ["inspection_date", "customer"]
+EXPORTED_MANIFEST = "_exported_jobs.txt"
+NDJSON_MANIFEST_SUFFIX = ".exported_jobs.txt"
+
+# Column layouts; pyarrow is only imported when Parquet is written (NDJSON does not need it)
+INSPECTION_COLUMNS = [
+    ("job_id", "string"),
+    ("inspection_date", "string"),
+    ("customer", "string"),
+    ("po_number", "string"),
+    ("style_number", "string"),
+    ("color", "string"),
+    ("inspector", "string"),
+    ("final_result", "string"),
+    ("decision_rationale", "string"),
+    ("critical_count", "int32"),
+    ("major_count", "int32"),
+    ("minor_count", "int32"),
+    ("views", "int32"),
+    ("failed_views", "int32"),
+    ("estimated_cost", "float64"),
+    ("actual_cost", "float64"),
+    ("submitted_at", "string"),
+    ("finished_at", "string"),
+]
+ANGLE_COLUMNS = [
+    ("job_id", "string"),
+    ("inspection_date", "string"),
+    ("customer", "string"),
+    ("po_number", "string"),
+    ("style_number", "string"),
+    ("color", "string"),
+    ("angle_index", "int32"),
+    ("angle", "string"),
+    ("analyzed", "bool"),
+    ("overall_condition", "string"),
+    ("confidence", "string"),
+    ("critical_count", "int32"),
+    ("major_count", "int32"),
+    ("minor_count", "int32"),
+    ("decided_by", "string"),
+    ("golden_match", "bool"),
+    ("encode_path", "string"),
+    ("inspection_notes", "string"),
+]
+DEFECT_COLUMNS = [
+    ("job_id", "string"),
+    ("inspection_date", "string"),
+    ("customer", "string"),
+    ("po_number", "string"),
+    ("style_number", "string"),
+    ("color", "string"),
+    ("angle", "string"),
+    ("severity", "string"),
+    ("description", "string"),
+]
+TABLES = {"inspections": INSPECTION_COLUMNS, "angle_analyses": ANGLE_COLUMNS, "defects": DEFECT_COLUMNS}
+
+def flatten_job(job):
+    """(inspection row, angle rows, defect rows) of a finished job"""
+    order_info = job["order_info"]
+    final_report = job["final_report"]
+    keys = {
+        "job_id": job["job_id"],
+        "inspection_date": order_info["inspection_date"],
+        # Hive partitions cannot be empty
+        "customer": order_info.get("customer") or "unknown",
+        "po_number": order_info["po_number"],
+        "style_number": order_info["style_number"],
+        "color": order_info["color"],
+    }
+    analyses = job["analyses"]
+    inspection = dict(
+        keys,
+        inspector=order_info.get("inspector", ""),
+        final_result=final_report["result"],
+        decision_rationale=final_report["reason"],
+        critical_count=final_report["critical_count"],
+        major_count=final_report["major_count"],
+        minor_count=final_report["minor_count"],
+        views=len(analyses),
+        failed_views=sum(1 for a in analyses if not a),
+        estimated_cost=job.get("options", {}).get("plan", {}).get("cost"),
+        actual_cost=job.get("actual_cost"),
+        submitted_at=job.get("submitted_at"),
+        finished_at=job.get("finished_at"),
+    )
+
+    angles, defects = [], []
+    for idx, (angle_name, analysis) in enumerate(zip(job["angle_names"], analyses)):
+        analysis = analysis or {}
+        golden = analysis.get("golden_comparison")
+        angles.append(dict(
+            keys,
+            angle_index=idx,
+            angle=angle_name,
+            analyzed=bool(analysis),
+            overall_condition=analysis.get("overall_condition"),
+            confidence=analysis.get("confidence"),
+            critical_count=len(analysis.get("critical_defects") or []),
+            major_count=len(analysis.get("major_defects") or []),
+            minor_count=len(analysis.get("minor_defects") or []),
+            decided_by=(analysis.get("cascade") or {}).get("decided_by"),
+            golden_match=golden["within_tolerance"] if golden else None,
+            encode_path=(analysis.get("encoding") or {}).get("path"),
+            inspection_notes=analysis.get("inspection_notes"),
+        ))
+        for severity in ("critical", "major", "minor"):
+            for description in analysis.get(f"{severity}_defects") or []:
+                defects.append(dict(keys, angle=angle_name, severity=severity, description=str(description)))
+    return inspection, angles, defects
+
+def jobs_to_tables(jobs):
+    """Arrow tables {"inspections", "angle_analyses", "defects"} for an iterable of finished jobs"""
+    import pyarrow as pa
+
+    rows = {name: [] for name in TABLES}
+    for job in jobs:
+        inspection, angles, defects = flatten_job(job)
+        rows["inspections"].append(inspection)
+        rows["angle_analyses"].extend(angles)
+        rows["defects"].extend(defects)
+    return {name: pa.Table.from_pylist(rows[name], schema=pa.schema([(c, pa.type_for_alias(t)) for c, t in columns]))
+            for name, columns in TABLES.items()}
+
+def _exported_ids(manifest):
+    try:
+        with open(manifest) as f:
+            return {line.strip() for line in f if line.strip()}
+    except OSError:
+        return set()
+
+def _record_exported(manifest, job_ids):
+    with open(manifest, "a") as f:
+        f.writelines(f"{job_id}\n" for job_id in job_ids)
+
+def append_parquet(jobs, root):
+    """Append jobs not exported before to the partitioned Parquet datasets under root; returns their count"""
+    import pyarrow.parquet as pq
+
+    exported = _exported_ids(os.path.join(root, EXPORTED_MANIFEST))
+    jobs = [job for job in jobs if job["job_id"] not in exported]
+    if not jobs:
+        return 0
+
+    # One new file per partition per table for this batch; existing files are never rewritten
+    batch = uuid.uuid4().hex[:12]
+    for name, table in jobs_to_tables(jobs).items():
+        if table.num_rows:
+            pq.write_to_dataset(
+                table,
+                root_path=os.path.join(root, name),
+                partition_cols=PARTITION_COLS,
+                basename_template=f"part-{batch}-{{i}}.parquet",
+                existing_data_behavior="overwrite_or_ignore",
+            )
+
+    # Recorded last, so an interrupted run re-exports rather than skips
+    _record_exported(os.path.join(root, EXPORTED_MANIFEST), [job["job_id"] for job in jobs])
+    return len(jobs)
+
+def ndjson_records(job):
+    """One JSON-ready record per inspection, angle analysis and defect"""
+    inspection, angles, defects = flatten_job(job)
+    yield dict(inspection, record="inspection")
+    for angle in angles:
+        yield dict(angle, record="angle")
+    for defect in defects:
+        yield dict(defect, record="defect")
+
+def write_ndjson(jobs, stream):
+    for job in jobs:
+        for record in ndjson_records(job):
+            stream.write(json.dumps(record, default=str) + "\n")
+
+def append_ndjson(jobs, path, new=False):
+    """
+    Append jobs not in path's manifest as NDJSON lines (one write per job, so concurrent appenders
+    do not interleave) and returns their count. new=True skips reading the manifest (just-finished jobs).
+    """
+    manifest = path + NDJSON_MANIFEST_SUFFIX
+    exported = set() if new else _exported_ids(manifest)
+    count = 0
+    with open(path, "a") as f:
+        for job in jobs:
+            if job["job_id"] in exported:
+                continue
+            f.write("".join(json.dumps(r, default=str) + "\n" for r in ndjson_records(job)))
+            f.flush()
+            # Recorded after the lines, so an interrupted run re-exports rather than skips
+            _record_exported(manifest, [job["job_id"]])
+            count += 1
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description="Export finished inspections as partitioned Parquet and NDJSON")
+    parser.add_argument("--jobs-dir", default=None, help="Job store directory (default QC_JOBS_DIR)")
+    parser.add_argument("--since", default=None, help="Only inspections dated on or after YYYY-MM-DD")
+    parser.add_argument("--until", default=None, help="Only inspections dated on or before YYYY-MM-DD")
+    parser.add_argument("--parquet", default=None, help="Root directory of the Parquet datasets")
+    parser.add_argument("--ndjson", default=None, help="NDJSON file to append to ('-' for stdout)")
+    args = parser.parse_args()
+    if not args.parquet and not args.ndjson:
+        parser.error("Give --parquet and/or --ndjson")
+
+    store = JobStore(args.jobs_dir) if args.jobs_dir else JobStore()
+    # Jobs every target has already are not loaded (stdout has no manifest and gets every job)
+    manifests = []
+    if args.parquet:
+        manifests.append(os.path.join(args.parquet, EXPORTED_MANIFEST))
+    if args.ndjson and args.ndjson != "-":
+        manifests.append(args.ndjson + NDJSON_MANIFEST_SUFFIX)
+    skip = set.intersection(*map(_exported_ids, manifests)) if manifests and args.ndjson != "-" else set()
+    jobs = [
+        job for job in store.iter_jobs(status="done", exclude=skip)
+        if (not args.since or job["order_info"]["inspection_date"] >= args.since)
+        and (not args.until or job["order_info"]["inspection_date"] <= args.until)
+    ]
+
+    if args.parquet:
+        os.makedirs(args.parquet, exist_ok=True)
+        print(f"Parquet: {append_parquet(jobs, args.parquet)} new inspections appended to {args.parquet}", file=sys.stderr)
+    if args.ndjson == "-":
+        write_ndjson(jobs, sys.stdout)
+    elif args.ndjson:
+        print(f"NDJSON: {append_ndjson(jobs, args.ndjson)} new inspections appended to {args.ndjson}",
+              file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Defect location heatmaps per style and angle.
+
+With defect boxes enabled, the model returns a normalized box for each defect it reports.
+Every finished inspection adds its views to one GRID x GRID density grid per style, angle
+and severity: a cell counts a view once if any of that view's boxes covers it, so
+counts / views is the fraction of inspected views with a defect at that spot. Grids are
+updated incrementally as inspections complete (history is never rescanned) and rendered
+over the golden sample image, so a glue overflow at the same toe spot on 30% of a lot
+shows up while the lot is still being inspected.
+"""
+import io
+import os
+import threading
+
+import numpy as np
+from PIL import Image
+
+from .golden import _slug
+from .imaging import region_name
+from .locking import file_lock
+
+HEATMAP_DIR = os.environ.get("QC_HEATMAP_DIR", ".qc_heatmaps")
+GRID = 64                    # Cells per side of a density grid
+SEVERITIES = ("critical", "major", "minor")
+CHANNELS = SEVERITIES + ("any",)
+HEAT_SATURATION = 0.3        # Fraction of views at which a cell is drawn fully hot
+MAX_ALPHA = 0.75             # Opacity of the hottest cells over the golden image
+HOTSPOT_MIN_SHARE = 0.1      # Cells below this fraction of views are not reported as hotspots
+
+def rasterize_boxes(boxes, grid=GRID):
+    """grid x grid coverage of normalized [x_min, y_min, x_max, y_max] boxes, via a 2D difference array"""
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    diff = np.zeros((grid + 1, grid + 1), dtype=np.int32)
+    if len(boxes):
+        x0 = np.clip(np.floor(boxes[:, 0] * grid).astype(int), 0, grid - 1)
+        y0 = np.clip(np.floor(boxes[:, 1] * grid).astype(int), 0, grid - 1)
+        x1 = np.clip(np.ceil(boxes[:, 2] * grid).astype(int), x0 + 1, grid)
+        y1 = np.clip(np.ceil(boxes[:, 3] * grid).astype(int), y0 + 1, grid)
+        np.add.at(diff, (y0, x0), 1)
+        np.add.at(diff, (y0, x1), -1)
+        np.add.at(diff, (y1, x0), -1)
+        np.add.at(diff, (y1, x1), 1)
+    return diff.cumsum(axis=0).cumsum(axis=1)[:grid, :grid] > 0
+
+class HeatmapStore:
+    """
+    Density grids on disk: <root>/<style>/<angle>.npz holding counts (CHANNELS x GRID x GRID) and views.
+    Updates take a file lock, so processes sharing the directory (like a JobStore) keep each other's counts.
+    """
+
+    def __init__(self, root=HEATMAP_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+        self._cache = {}     # path -> (mtime, counts, views)
+
+    def _path(self, style_number, angle_name):
+        return os.path.join(self.root, _slug(style_number), f"{_slug(angle_name)}.npz")
+
+    @staticmethod
+    def _read(path):
+        try:
+            with np.load(path) as data:
+                return data["counts"], int(data["views"])
+        except FileNotFoundError:
+            return np.zeros((len(CHANNELS), GRID, GRID), dtype=np.int32), 0
+
+    def load(self, style_number, angle_name):
+        """(counts, views) of a style and angle; zero grids if nothing was recorded yet"""
+        path = self._path(style_number, angle_name)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return np.zeros((len(CHANNELS), GRID, GRID), dtype=np.int32), 0
+        cached = self._cache.get(path)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime,) + self._read(path)
+            self._cache[path] = cached
+        return cached[1], cached[2]
+
+    def version(self, style_number, angle_name):
+        """Changes whenever the grid is updated (for render caches)"""
+        try:
+            return os.path.getmtime(self._path(style_number, angle_name))
+        except OSError:
+            return None
+
+    def add_view(self, style_number, angle_name, defect_boxes):
+        """Count one inspected view with its defect boxes ([{"severity", "box"}], [] for a clean view)"""
+        coverage = np.stack([
+            rasterize_boxes([d["box"] for d in defect_boxes if channel in ("any", d.get("severity"))])
+            for channel in CHANNELS
+        ])
+        path = self._path(style_number, angle_name)
+        # Processes sharing HEATMAP_DIR take turns; the grid is re-read under the lock, not from the cache
+        with self._lock, file_lock(path):
+            counts, views = self._read(path)
+            counts = counts + coverage
+            # Write-then-rename so readers never load a partial grid
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.savez_compressed(f, counts=counts, views=views + 1)
+            os.replace(tmp_path, path)
+
+    def add_job(self, job):
+        """Add every view of a finished job that was inspected with defect boxes (carried-forward views count once)"""
+        style_number = job["order_info"]["style_number"]
+        for angle_name, analysis in zip(job["angle_names"], job["analyses"]):
+            carried = (analysis or {}).get("provenance", {}).get("source") == "carried_forward"
+            if analysis and "defect_boxes" in analysis and not carried:
+                self.add_view(style_number, angle_name, analysis["defect_boxes"])
+
+    def density(self, style_number, angle_name, severity="any"):
+        """(GRID x GRID fraction of views with a defect of this severity per cell, views)"""
+        counts, views = self.load(style_number, angle_name)
+        return counts[CHANNELS.index(severity)] / max(views, 1), views
+
+def hotspots(density, top=3):
+    """Hottest spots of a density grid: [{"region", "share"}], one per named region"""
+    best = {}
+    for cell in np.argsort(density, axis=None)[::-1]:
+        share = float(density.flat[cell])
+        if share < HOTSPOT_MIN_SHARE or len(best) >= top:
+            break
+        name = region_name(*np.unravel_index(cell, density.shape), density.shape[0])
+        best.setdefault(name, round(share, 2))
+    return [{"region": name, "share": share} for name, share in best.items()]
+
+def render_overlay(density, background=None, max_side=480):
+    """PNG bytes of the density grid as a yellow-to-red ramp over the golden image (or a plain canvas)"""
+    if background is None:
+        background = Image.new("RGB", (max_side, max_side), (235, 235, 235))
+    background = background.convert("RGB")
+    background.thumbnail((max_side, max_side))
+    base = np.asarray(background, dtype=np.float32) / 255.0
+
+    heat = Image.fromarray(np.clip(density / HEAT_SATURATION, 0, 1).astype(np.float32), mode="F")
+    heat = np.asarray(heat.resize(background.size, Image.BILINEAR))[..., None]
+    color = np.concatenate([np.ones_like(heat), 1.0 - heat, np.zeros_like(heat)], axis=-1)
+    alpha = heat * MAX_ALPHA
+    blended = base * (1 - alpha) + color * alpha
+
+    buffer = io.BytesIO()
+    Image.fromarray((blended * 255).round().astype(np.uint8)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def heatmap_figures(store, golden, style_number, color, angle_names, severity="any"):
+    """[{"angle", "views", "hotspots", "png"}] for the angles of a style that have recorded views"""
+    figures = []
+    for angle_name in angle_names:
+        density, views = store.density(style_number, angle_name, severity)
+        if not views:
+            continue
+        figures.append({
+            "angle": angle_name,
+            "views": views,
+            "hotspots": hotspots(density),
+            "png": render_overlay(density, golden.reference_image(style_number, color, angle_name))
+        })
+    return figures
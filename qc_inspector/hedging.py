@@ -0,0 +1,235 @@
+"""
+Tail-latency control for vision calls: per-call deadlines, hedged requests and a circuit breaker.
+
+Every call goes through the guard of its backend (base URL) and model:
+
+hedging    once HEDGE_MIN_SAMPLES calls have been observed, a call still running after the
+           HEDGE_PERCENTILE latency of its model gets a duplicate request, and whichever
+           returns first wins (the other is left to finish in the background). At the 95th
+           percentile about one call in twenty is duplicated. The duplicate is billed by the
+           backend, so its usage is counted too: as reported if it has finished when the call
+           returns, otherwise at the winner's usage (see guarded_call's on_abandon).
+deadline   a call with no reply after CALL_DEADLINE seconds fails with CallDeadlineExceeded.
+           Each request gets the time left until the deadline as its own timeout, so an
+           abandoned request does not hold a call thread much past it.
+breaker    BREAKER_FAILURES failed calls in a row (5xx, 429, timeouts, connection errors,
+           deadlines; each after the client's own retries) open the backend's circuit: calls
+           fail fast with BackendUnavailable for BREAKER_COOLDOWN seconds, then a single probe
+           call decides whether it closes again. The job queue holds its tasks while the
+           circuit is open instead of failing them.
+
+    QC_HEDGE_PERCENTILE=0 disables hedging; QC_CALL_DEADLINE=0 disables the deadline.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+logger = logging.getLogger(__name__)
+
+HEDGE_PERCENTILE = float(os.environ.get("QC_HEDGE_PERCENTILE", "95"))
+CALL_DEADLINE = float(os.environ.get("QC_CALL_DEADLINE", "75"))
+HEDGE_MIN_SAMPLES = 20       # Observed calls of a model before its latency percentile is trusted
+HEDGE_MIN_DELAY = 1.0        # Never hedge a call earlier than this (seconds)
+LATENCY_WINDOW = 500         # Most recent call latencies kept per model
+BREAKER_FAILURES = 3         # Consecutive failed calls that open a backend's circuit
+BREAKER_COOLDOWN = 30.0      # Seconds an open circuit fails fast before a probe call is let through
+CALL_THREADS = 32            # Threads running vision calls, one per pooled connection (see client.py)
+
+class BackendUnavailable(Exception):
+    """The backend's circuit is open; retry_at is the time.monotonic() when a probe call is allowed"""
+
+    def __init__(self, base_url, retry_at):
+        self.base_url = base_url
+        self.retry_at = retry_at
+        super().__init__(f"Vision backend {base_url or 'api.openai.com'} is degraded; "
+                         f"retrying in {max(0.0, retry_at - time.monotonic()):.0f} s")
+
+class CallDeadlineExceeded(TimeoutError):
+    pass
+
+def counts_as_failure(error):
+    """Errors that say the backend is degraded, not that the request was bad"""
+    status = getattr(error, "status_code", None)
+    return status is None or status == 429 or status >= 500
+
+class LatencyTracker:
+    """Latencies of the most recent successful calls, for the hedge delay"""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+
+    def record(self, seconds):
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def percentile(self, q, min_samples=HEDGE_MIN_SAMPLES):
+        """The q-th percentile latency in seconds, or None with fewer than min_samples observations"""
+        with self._lock:
+            if len(self._latencies) < min_samples:
+                return None
+            latencies = sorted(self._latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * q / 100))]
+
+class CircuitBreaker:
+    """closed -> open after BREAKER_FAILURES consecutive failures -> half open (one probe) -> closed or open"""
+
+    def __init__(self, base_url, failures=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN):
+        self.base_url = base_url
+        self.max_failures = failures
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self.state = "closed"
+        self.failures = 0
+        self.retry_at = 0.0
+
+    def before_call(self):
+        """Raise BackendUnavailable unless a call may go out now"""
+        with self._lock:
+            if self.state == "closed":
+                return
+            if self.state == "open" and time.monotonic() >= self.retry_at:
+                self.state = "half_open"
+                logger.info("Probing vision backend %s", self.base_url or "api.openai.com")
+                return
+            raise BackendUnavailable(self.base_url, max(self.retry_at, time.monotonic() + 1.0))
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                logger.info("Vision backend %s recovered", self.base_url or "api.openai.com")
+            self.state, self.failures = "closed", 0
+
+    def record_failure(self):
+        """Count a failed call; True if the circuit is open now"""
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or (self.state == "closed" and self.failures >= self.max_failures):
+                self.state = "open"
+                self.retry_at = time.monotonic() + self.cooldown
+                logger.warning("Vision backend %s degraded after %d failed calls; failing fast for %.0f s",
+                               self.base_url or "api.openai.com", self.failures, self.cooldown)
+            return self.state == "open"
+
+    def snapshot(self):
+        with self._lock:
+            return {"state": self.state, "failures": self.failures,
+                    "retry_in": round(max(0.0, self.retry_at - time.monotonic()), 1) if self.state == "open" else 0.0}
+
+_executor = ThreadPoolExecutor(max_workers=CALL_THREADS, thread_name_prefix="qc-vision-call")
+_trackers = {}           # (base URL, model) -> LatencyTracker
+_breakers = {}           # base URL -> CircuitBreaker
+_stats = {}              # (base URL, model) -> {"calls", "hedged", "hedge_wins", "deadlines"}
+_registry_lock = threading.Lock()
+
+def _guard_state(base_url, model):
+    with _registry_lock:
+        tracker = _trackers.setdefault((base_url, model), LatencyTracker())
+        breaker = _breakers.setdefault(base_url, CircuitBreaker(base_url))
+        stats = _stats.setdefault((base_url, model), {"calls": 0, "hedged": 0, "hedge_wins": 0, "deadlines": 0})
+    return tracker, breaker, stats
+
+def _count(stats, field):
+    with _registry_lock:
+        stats[field] += 1
+
+def _timed(fn, tracker, timeout):
+    started = time.monotonic()
+    result = fn(timeout)
+    # Every successful attempt counts, hedged duplicates and losers included, so hedging
+    # does not hide the tail it is measured against
+    tracker.record(time.monotonic() - started)
+    return result
+
+def _remaining(end):
+    """Timeout in seconds for a request started now (None without a deadline)"""
+    return None if end is None else max(0.001, end - time.monotonic())
+
+def _settle(attempts, winner, on_attempt, on_abandon):
+    """Account for the attempts left over when guarded_call returns or raises"""
+    for attempt in attempts:
+        if not attempt.done():
+            if on_abandon is not None:
+                on_abandon(winner)
+        elif attempt.exception() is None and on_attempt is not None:
+            on_attempt(attempt.result())
+
+def guarded_call(base_url, model, fn, deadline=CALL_DEADLINE, hedge_percentile=HEDGE_PERCENTILE, on_attempt=None,
+                 on_abandon=None):
+    """
+    Result of fn(timeout) (one vision request, timeout being the seconds left until the deadline
+    or None) under the backend's circuit breaker, with a hedged duplicate after the model's
+    hedge_percentile latency and an overall deadline in seconds.
+    Raises BackendUnavailable, CallDeadlineExceeded or the request's own error.
+
+    on_attempt(result) is called for every request that succeeded by the time the call returns,
+    the winner included; on_abandon(winner) once for each request still running then, with the
+    winning result (None when the call fails), since those are billed without being seen.
+    """
+    tracker, breaker, stats = _guard_state(base_url, model)
+    breaker.before_call()
+    _count(stats, "calls")
+
+    started = time.monotonic()
+    end = started + deadline if deadline else None
+    primary = _executor.submit(_timed, fn, tracker, _remaining(end))
+    attempts = [primary]
+    hedge_delay = tracker.percentile(hedge_percentile) if hedge_percentile else None
+    hedge_at = started + max(HEDGE_MIN_DELAY, hedge_delay) if hedge_delay is not None else None
+
+    error = None
+    while attempts:
+        wake_at = min((t for t in (hedge_at, end) if t is not None), default=None)
+        done, _ = wait(attempts, timeout=None if wake_at is None else max(0.0, wake_at - time.monotonic()),
+                       return_when=FIRST_COMPLETED)
+        for attempt in done:
+            attempts.remove(attempt)
+            if attempt.exception() is None:
+                breaker.record_success()
+                if attempt is not primary:
+                    _count(stats, "hedge_wins")
+                if on_attempt is not None:
+                    on_attempt(attempt.result())
+                _settle(attempts, attempt.result(), on_attempt, on_abandon)
+                return attempt.result()
+            error = error or attempt.exception()
+        if done:
+            continue
+
+        now = time.monotonic()
+        if hedge_at is not None and now >= hedge_at:
+            hedge_at = None
+            if end is None or now < end:
+                _count(stats, "hedged")
+                logger.info("Hedging a %s call after %.1f s", model, now - started)
+                attempts.append(_executor.submit(_timed, fn, tracker, _remaining(end)))
+                continue
+        if end is not None and now >= end:
+            _count(stats, "deadlines")
+            error = CallDeadlineExceeded(f"No reply from {model} within {deadline:g} s")
+            break
+    _settle(attempts, None, on_attempt, on_abandon)
+
+    if not counts_as_failure(error):
+        breaker.record_success()   # The backend answered, the request itself was rejected
+        raise error
+    if breaker.record_failure():
+        # Failures from the call that opened the circuit on are held with the rest instead of failing their view
+        raise BackendUnavailable(base_url, breaker.retry_at) from error
+    raise error
+
+def guard_status():
+    """{base URL: breaker snapshot with per-model call stats and hedge delay} for status displays"""
+    with _registry_lock:
+        breakers = dict(_breakers)
+        stats = {key: dict(value) for key, value in _stats.items()}
+    status = {}
+    for base_url, breaker in breakers.items():
+        status[base_url] = dict(breaker.snapshot(), models={
+            model: dict(counts, hedge_delay=_trackers[(url, model)].percentile(HEDGE_PERCENTILE))
+            for (url, model), counts in stats.items() if url == base_url
+        })
+    return status
@@ -0,0 +1,178 @@
+"""Vectorized NumPy image utilities for the local (no API call) inspection stages"""
+import numpy as np
+from PIL import Image
+
+WORK_SIDE = 256              # Long side of the working resolution for local comparisons
+
+def to_rgb_array(image, size=None, max_side=WORK_SIDE):
+    """RGB float32 array in [0, 1], resized to size=(width, height) or to max_side on the long side"""
+    image = image.convert("RGB")
+    if size is None:
+        scale = max_side / max(image.size)
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    if image.size != tuple(size):
+        image = image.resize(tuple(size), Image.BILINEAR)
+    return np.asarray(image, dtype=np.float32) / 255.0
+
+def rgb_to_lab(rgb):
+    """sRGB (D65) in [0, 1] to CIE Lab"""
+    linear = np.where(rgb > 0.04045, ((rgb + 0.055) / 1.055) ** 2.4, rgb / 12.92)
+    xyz = linear @ np.array([
+        [0.4124564, 0.2126729, 0.0193339],
+        [0.3575761, 0.7151522, 0.1191920],
+        [0.1804375, 0.0721750, 0.9503041],
+    ], dtype=np.float32)
+    xyz /= np.array([0.95047, 1.0, 1.08883], dtype=np.float32)
+    f = np.where(xyz > 216 / 24389, np.cbrt(xyz), (24389 / 27 * xyz + 16) / 116)
+    return np.stack([
+        116 * f[..., 1] - 16,
+        500 * (f[..., 0] - f[..., 1]),
+        200 * (f[..., 1] - f[..., 2]),
+    ], axis=-1)
+
+def to_gray(rgb):
+    return rgb @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+def background_lab(lab, border=4):
+    """Median Lab colour of the image border, taken as the backdrop"""
+    edges = np.concatenate([
+        lab[:border].reshape(-1, 3), lab[-border:].reshape(-1, 3),
+        lab[:, :border].reshape(-1, 3), lab[:, -border:].reshape(-1, 3),
+    ])
+    return np.median(edges, axis=0)
+
+def foreground_mask(lab, threshold=12.0, background=None):
+    """Pixels whose colour differs from the backdrop by more than threshold (delta E)"""
+    if background is None:
+        background = background_lab(lab)
+    return np.linalg.norm(lab - background, axis=-1) > threshold
+
+def phase_correlation(reference, moving):
+    """Integer (dy, dx) translation that best aligns moving onto reference (same shape, grayscale)"""
+    f_ref = np.fft.fft2(reference - reference.mean())
+    f_mov = np.fft.fft2(moving - moving.mean())
+    cross = f_ref * np.conj(f_mov)
+    cross /= np.abs(cross) + 1e-9
+    correlation = np.fft.ifft2(cross).real
+    dy, dx = np.unravel_index(np.argmax(correlation), correlation.shape)
+    height, width = reference.shape
+    return (dy - height if dy > height // 2 else dy), (dx - width if dx > width // 2 else dx)
+
+def overlap_slices(shape, dy, dx):
+    """Slices of (reference, moving) that overlap once moving is shifted by (dy, dx)"""
+    height, width = shape[:2]
+    ref = (slice(max(0, dy), height + min(0, dy)), slice(max(0, dx), width + min(0, dx)))
+    mov = (slice(max(0, -dy), height + min(0, -dy)), slice(max(0, -dx), width + min(0, -dx)))
+    return ref, mov
+
+def box_filter(values, window):
+    """Mean over a window x window neighbourhood (same size output, edge-clamped) via cumulative sums"""
+    pad = window // 2
+    padded = np.pad(values, pad, mode="edge")
+    summed = padded.cumsum(0).cumsum(1)
+    summed = np.pad(summed, ((1, 0), (1, 0)))
+    total = (summed[window:, window:] - summed[:-window, window:]
+             - summed[window:, :-window] + summed[:-window, :-window])
+    return total / (window * window)
+
+def ssim_map(x, y, window=7):
+    """Local structural similarity of two grayscale arrays in [0, 1]"""
+    c1, c2 = 0.01 ** 2, 0.03 ** 2
+    mu_x, mu_y = box_filter(x, window), box_filter(y, window)
+    var_x = box_filter(x * x, window) - mu_x ** 2
+    var_y = box_filter(y * y, window) - mu_y ** 2
+    cov = box_filter(x * y, window) - mu_x * mu_y
+    return ((2 * mu_x * mu_y + c1) * (2 * cov + c2)) / ((mu_x ** 2 + mu_y ** 2 + c1) * (var_x + var_y + c2))
+
+def grid_means(values, grid, weights=None):
+    """Mean of values (H x W or H x W x C) over a grid x grid layout of cells, optionally weighted"""
+    height, width = values.shape[:2]
+    rows = np.minimum(np.arange(height) * grid // height, grid - 1)
+    cols = np.minimum(np.arange(width) * grid // width, grid - 1)
+    cell = (rows[:, None] * grid + cols[None, :]).ravel()
+    if weights is None:
+        weights = np.ones((height, width), dtype=np.float32)
+    w = weights.ravel().astype(np.float64)
+    counts = np.bincount(cell, weights=w, minlength=grid * grid)
+    flat = values.reshape(height * width, -1).astype(np.float64)
+    sums = np.stack([np.bincount(cell, weights=flat[:, c] * w, minlength=grid * grid)
+                     for c in range(flat.shape[1])], axis=-1)
+    means = sums / np.maximum(counts, 1e-9)[:, None]
+    shape = (grid, grid) if values.ndim == 2 else (grid, grid, values.shape[2])
+    return means.reshape(shape), counts.reshape(grid, grid)
+
+def region_name(row, col, grid):
+    """Human location of a grid cell, e.g. "upper-left" or "center" """
+    vertical = ("upper", "middle", "lower")[min(2, row * 3 // grid)]
+    horizontal = ("left", "center", "right")[min(2, col * 3 // grid)]
+    if vertical == "middle":
+        return "center" if horizontal == "center" else f"middle-{horizontal}"
+    return f"{vertical}-{horizontal}"
+
+def binary_close(mask, window):
+    """Morphological closing (dilate, then erode) with a window x window square, via box filters"""
+    dilated = box_filter(mask.astype(np.float32), window) > 1e-6
+    return box_filter(dilated.astype(np.float32), window) > 1 - 1e-6
+
+def connected_components(mask):
+    """
+    4-connected components of a boolean mask: (labels, count), labels -1 on background
+    and 0..count-1 on the components, numbered in raster order of their first pixel.
+    Works on horizontal runs: runs and their overlaps with the row above are found with
+    NumPy, and only the (few thousand, for shoe silhouettes) overlaps go through union-find.
+    """
+    height, width = mask.shape
+    edges = np.diff(np.pad(mask, ((0, 0), (1, 1))).astype(np.int8), axis=1)
+    run_rows, run_starts = np.nonzero(edges == 1)
+    run_ends = np.nonzero(edges == -1)[1]
+    stride = width + 1
+
+    # Runs of the row above overlapping each run form a contiguous, sorted range
+    start_keys = run_rows * stride + run_starts
+    end_keys = run_rows * stride + run_ends
+    above = (run_rows - 1) * stride
+    first = np.searchsorted(end_keys, above + run_starts, side="right")
+    last = np.searchsorted(start_keys, above + run_ends, side="left")
+    counts = np.maximum(last - first, 0)
+    below_runs = np.repeat(np.arange(len(run_rows)), counts)
+    above_runs = np.repeat(first, counts) + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+    parent = list(range(len(run_rows)))
+    def find(run):
+        while parent[run] != run:
+            parent[run] = parent[parent[run]]
+            run = parent[run]
+        return run
+    for a, b in zip(above_runs.tolist(), below_runs.tolist()):
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    roots = np.array([find(run) for run in range(len(run_rows))], dtype=np.int64)
+    _, run_labels = np.unique(roots, return_inverse=True)
+    labels = np.full(height * width, -1, dtype=np.int32)
+    lengths = run_ends - run_starts
+    pixels = np.repeat(run_rows * width + run_starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+    labels[pixels] = np.repeat(run_labels, lengths)
+    return labels.reshape(height, width), int(run_labels.max() + 1) if len(run_labels) else 0
+
+def _dct_matrix(size):
+    """Orthonormal DCT-II basis, rows are frequencies"""
+    n = np.arange(size)
+    basis = np.cos(np.pi * (2 * n[None, :] + 1) * n[:, None] / (2 * size)) * np.sqrt(2 / size)
+    basis[0] /= np.sqrt(2)
+    return basis
+
+def perceptual_hash(image, size=32, bits=8):
+    """
+    64-bit DCT perceptual hash of an image as 16 hex digits: the lowest bits x bits frequencies
+    of a size x size grayscale copy (DC excluded from the median), each set if above the median
+    """
+    dct = _dct_matrix(size)
+    low = (dct @ to_gray(to_rgb_array(image, size=(size, size))) @ dct.T)[:bits, :bits].ravel()
+    flags = low > np.median(low[1:])
+    return f"{int(''.join('1' if flag else '0' for flag in flags), 2):0{bits * bits // 4}x}"
+
+def hash_distance(a, b):
+    """Hamming distance of two hex perceptual hashes"""
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
@@ -0,0 +1,576 @@
+"""Background inspection jobs: fair-share worker pool and the shared job store"""
+import copy
+import hashlib
+import io
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from PIL import Image
+
+from .analysis import STRONG_MODEL, build_inspection_prompt, inspect_angle, merge_usage, open_image
+from .archive import ImageArchive, image_digest, start_compaction
+from .golden import GoldenLibrary, add_golden_evidence, golden_clean_analysis
+from .heatmap import HeatmapStore
+from .hedging import BackendUnavailable
+from .cost import BUDGET_PER_DAY, BUDGET_PER_PO, BudgetExceeded, SpendLedger, plan_inspection, usage_cost
+from .reinspect import carried_analysis, find_previous_inspection, plan_reinspection, view_hash
+from .report import generate_qc_report
+from .search import SearchIndex
+from .symmetry import SIDE_VIEWS, add_symmetry_evidence, compare_side_views
+
+logger = logging.getLogger(__name__)
+
+# Background inspection jobs
+JOBS_DIR = os.environ.get("QC_JOBS_DIR", ".qc_jobs")
+INSPECTION_WORKERS = int(os.environ.get("QC_INSPECTION_WORKERS", "4"))
+RETAINED_JOBS = 32          # Finished jobs whose status stays in memory (older ones are read from the store)
+HEARTBEAT_SECONDS = 15       # How often a process re-stamps the jobs it is working on
+STALE_AFTER_SECONDS = 120    # Unfinished jobs without a heartbeat this long are reported interrupted
+SPECULATIVE_RESULTS = 256    # Speculative view analyses kept for adoption by a later submit
+
+def speculation_key(image, angle_name, order_info, options, plan):
+    """
+    Identity of one view's analysis: the image bytes, the exact prompt and every setting that
+    changes the request. Order fields outside the prompt (customer, inspector, date) do not count.
+    """
+    cascade = options.get("cascade") or {}
+    request = json.dumps([
+        build_inspection_prompt(angle_name, order_info["style_number"], order_info["color"],
+                                order_info["po_number"], options.get("compact_output", False)),
+        options.get("inspection_mode"),
+        [cascade.get("screening_model"), cascade.get("strong_model")] if cascade else STRONG_MODEL,
+        bool(options.get("golden_samples")),
+        bool(options.get("defect_boxes")),
+        plan["detail"],
+        plan["max_side"]
+    ])
+    return f"{hashlib.sha256(image).hexdigest()}:{hashlib.sha256(request.encode()).hexdigest()}"
+
+class JobStore:
+    """
+    Job status documents as JSON files in one directory.
+    Point several processes (Streamlit servers, API workers) at the same directory,
+    e.g. a shared volume, and any of them can answer status and report requests.
+    """
+
+    def __init__(self, jobs_dir=JOBS_DIR):
+        self.jobs_dir = jobs_dir
+        os.makedirs(jobs_dir, exist_ok=True)
+
+    def _path(self, job_id):
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def save(self, job):
+        # Write-then-rename so readers in other processes never see a partial file
+        tmp_path = f"{self._path(job['job_id'])}.{uuid.uuid4().hex[:6]}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(job, f, default=str)
+        os.replace(tmp_path, self._path(job["job_id"]))
+
+    def load(self, job_id):
+        """Stored job status, or None if there is no such job"""
+        if not all(ch.isalnum() for ch in job_id):
+            return None
+        try:
+            with open(self._path(job_id)) as f:
+                job = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+        # The owning process died: the job will never finish
+        if job["status"] in ("queued", "running") and time.time() - job.get("heartbeat", 0) > STALE_AFTER_SECONDS:
+            job["status"] = "interrupted"
+        return job
+
+    def iter_jobs(self, status=None, exclude=()):
+        """
+        All stored jobs (optionally only those with this status), in no particular order.
+        Job ids in exclude are skipped without reading their file.
+        """
+        for name in os.listdir(self.jobs_dir):
+            if name.endswith(".json") and name[:-len(".json")] not in exclude:
+                job = self.load(name[:-len(".json")])
+                if job is not None and (status is None or job["status"] == status):
+                    yield job
+
+class InspectionJobQueue:
+    """
+    Process-wide inspection queue shared by every session of this process.
+    Jobs are split into one task per angle and a worker pool serves the sessions
+    round-robin, so one inspector's large batch cannot starve the others.
+    Job status is persisted in a JobStore and survives reruns and disconnects.
+    Every job stores perceptual view hashes; a re-inspection (options["reinspect_of"] = the job id
+    of the previous inspection) carries unchanged clean views forward and queues only the rest.
+    Uploaded images are written to the ImageArchive in the background and referenced from the
+    job by digest, so reports load them from there (the archive is compacted periodically).
+    Every job is planned against the spend ledger's remaining budget before it is queued.
+    Finished jobs are streamed to the NDJSON log and added to the defect heatmaps and the search
+    index by a background thread, off the queue lock.
+
+    While the vision backend's circuit breaker is open (see hedging.py), workers put their task
+    back at the front of its lane and wait for the breaker's retry time instead of failing views.
+
+    Opt-in speculation analyses views while the order form is still being filled in, on a
+    lower-priority lane that workers only serve when no job task is waiting. Results are keyed
+    by speculation_key, so a later submit adopts every view whose image and prompt are unchanged
+    and queues only the rest.
+    """
+
+    def __init__(self, store=None, workers=INSPECTION_WORKERS, ledger=None, golden=None, heatmaps=None, archive=None,
+                 search=None):
+        self.store = store or JobStore()
+        self.ledger = ledger or SpendLedger()
+        self.golden = golden or GoldenLibrary()
+        self.heatmaps = heatmaps or HeatmapStore()
+        self.archive = archive or ImageArchive()
+        self.search = search or SearchIndex()
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._cond = threading.Condition()
+        self._jobs = {}          # job_id -> status of jobs this process runs
+        self._runtime = {}       # job_id -> client and images (never persisted)
+        self._pending = {}       # session_id -> deque of (job_id, angle index)
+        self._rotation = deque() # sessions with pending tasks, in fair-share order
+        self._finished = deque() # finished job ids, oldest first
+        self._speculation = OrderedDict()  # speculation key -> speculative view analysis, oldest first
+        self._speculative = deque()        # speculation keys waiting for an idle worker
+        self._archiver = ThreadPoolExecutor(max_workers=1, thread_name_prefix="qc-archive")
+        self._publisher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="qc-publish")
+        for n in range(workers):
+            threading.Thread(target=self._worker, name=f"qc-inspection-{n}", daemon=True).start()
+        threading.Thread(target=self._heartbeat, name="qc-inspection-heartbeat", daemon=True).start()
+        start_compaction(self.archive, self.store)
+        threading.Thread(target=self._backfill_search, name="qc-search-backfill", daemon=True).start()
+
+    def _persist(self, job):
+        job["heartbeat"] = time.time()
+        self.store.save(job)
+
+    def previous_inspection(self, order_info):
+        """Latest finished inspection of the same PO, style and color, for linking a re-inspection"""
+        return find_previous_inspection(self.store, order_info)
+
+    def reinspection(self, images, angle_names, options, hashes=None):
+        """
+        {"previous": job, "views": per-view decisions (see reinspect.py)} for a re-inspection
+        against the job options["reinspect_of"] names, or None for a full inspection
+        """
+        previous_id = options.get("reinspect_of")
+        previous = self.status(previous_id) if previous_id else None
+        if previous is None or previous["status"] != "done":
+            return None
+        hashes = hashes or [view_hash(image) for image in images]
+        return {"previous": previous, "views": plan_reinspection(previous, hashes, angle_names, self.archive)}
+
+    def plan(self, images, angle_names, order_info, options, budgets=None, reinspection=None):
+        """
+        Cost plan for an inspection under the remaining (po_budget, day_budget) in USD, 0 = unlimited.
+        Views a re-inspection carries forward are not planned.
+        """
+        if reinspection:
+            analysed = [idx for idx, view in enumerate(reinspection["views"]) if not view["carry"]]
+            images, angle_names = [images[idx] for idx in analysed], [angle_names[idx] for idx in analysed]
+        po_budget, day_budget = budgets or (BUDGET_PER_PO, BUDGET_PER_DAY)
+        day = datetime.now().strftime("%Y-%m-%d")
+        image_sizes = [Image.open(io.BytesIO(data)).size for data in images]
+        remaining = self.ledger.remaining(order_info["po_number"], day, po_budget, day_budget)
+        return plan_inspection(image_sizes, angle_names, order_info, options, remaining)
+
+    def submit(self, session_id, client, images, angle_names, order_info, options, budgets=None):
+        """
+        Queue an inspection (images are raw upload bytes, one per angle) and return its job id.
+        Raises BudgetExceeded if even the cheapest plan does not fit the remaining budget, or if
+        a concurrent submit took that budget before this plan was committed to the ledger.
+        """
+        hashes = [view_hash(image) for image in images]
+        reinspection = self.reinspection(images, angle_names, options, hashes)
+        symmetry = self.symmetry(images, angle_names) if options.get("symmetry_check") else None
+        plan = self.plan(images, angle_names, order_info, options, budgets, reinspection)
+        if not plan["within_budget"]:
+            raise BudgetExceeded(plan)
+
+        day = datetime.now().strftime("%Y-%m-%d")
+        self.ledger.commit(order_info["po_number"], day, plan, *(budgets or (BUDGET_PER_PO, BUDGET_PER_DAY)))
+
+        job_id = uuid.uuid4().hex[:12]
+        job = {
+            "job_id": job_id,
+            "session_id": session_id,
+            "owner": self.owner,
+            "status": "queued",
+            "submitted_at": datetime.now().isoformat(timespec="seconds"),
+            "finished_at": None,
+            "order_info": order_info,
+            "angle_names": list(angle_names),
+            "options": dict(options, plan=plan),
+            "spend_day": day,
+            "usage": {},
+            "actual_cost": None,
+            "image_digests": [image_digest(image) for image in images],
+            "view_hashes": hashes,
+            "total": len(images),
+            "completed": 0,
+            "analyses": [None] * len(images),
+            "final_report": None
+        }
+        if symmetry:
+            job["symmetry"] = symmetry
+        if reinspection:
+            previous = reinspection["previous"]
+            job["reinspection"] = {
+                "job_id": previous["job_id"],
+                "result": previous["final_report"]["result"],
+                "views": [{key: view[key] for key in ("carry", "reason", "distance")} for view in reinspection["views"]]
+            }
+        keys = [speculation_key(image, angle_name, order_info, options, plan)
+                for image, angle_name in zip(images, angle_names)]
+        with self._cond:
+            self._jobs[job_id] = job
+            self._runtime[job_id] = {"client": client, "images": list(images)}
+
+            # Views already analysed speculatively are adopted, running ones are waited for
+            queued = []
+            for idx, key in enumerate(keys):
+                entry = self._speculation.get(key)
+                if reinspection and reinspection["views"][idx]["carry"]:
+                    self._complete_view(job, idx, carried_analysis(reinspection["previous"],
+                                                                   reinspection["views"][idx]), {})
+                elif entry and entry["status"] == "done":
+                    self._adopt(job, idx, entry)
+                elif entry and entry["status"] == "running":
+                    entry["waiters"].append((job_id, idx))
+                else:
+                    if entry:
+                        self._drop_speculation(key)
+                    queued.append((job_id, idx))
+            if queued:
+                tasks = self._pending.setdefault(session_id, deque())
+                if not tasks:
+                    self._rotation.append(session_id)
+                tasks.extend(queued)
+            self._persist(job)
+            self._cond.notify_all()
+        for image, digest in zip(images, job["image_digests"]):
+            self._archiver.submit(self._archive_image, image, digest)
+        return job_id
+
+    @staticmethod
+    def symmetry(images, angle_names):
+        """Local left/right comparison of the two side views, or None without both (see symmetry.py)"""
+        if not all(angle_name in angle_names for angle_name in SIDE_VIEWS):
+            return None
+        left, right = (open_image(images[list(angle_names).index(angle_name)]) for angle_name in SIDE_VIEWS)
+        try:
+            return compare_side_views(left, right)
+        except (OSError, ValueError):
+            logger.exception("Could not compare the side views")
+            return None
+
+    def _archive_image(self, data, digest):
+        try:
+            self.archive.put(data, digest)
+        except (OSError, ValueError):
+            logger.exception("Could not archive image %s", digest)
+
+    def speculate(self, session_id, client, images, angle_names, order_info, options, budgets=None,
+                  reinspection=None):
+        """
+        Start analysing the views of an inspection that has not been submitted yet.
+        Speculation only runs while the remaining budget covers the inspection twice, so its spend
+        (charged to the ledger as each view finishes) cannot downgrade the plan of the real submit.
+        With the re-inspection decisions submit will use, views it carries forward are neither
+        planned nor analysed, so the plan (and the speculation keys) match the submit's.
+        Queued speculation of this session for views that have since changed is dropped.
+        Returns {"ready", "running", "queued"} view counts (carried views are ready), or None if
+        nothing was started.
+        """
+        plan = self.plan(images, angle_names, order_info, options, budgets, reinspection)
+        if not plan["within_budget"] or (plan["remaining"] is not None and 2 * plan["cost"] > plan["remaining"]):
+            return None
+
+        carried = sum(view["carry"] for view in reinspection["views"]) if reinspection else 0
+        analysed = [idx for idx in range(len(images)) if not (reinspection and reinspection["views"][idx]["carry"])]
+        images, angle_names = [images[idx] for idx in analysed], [angle_names[idx] for idx in analysed]
+        keys = [speculation_key(image, angle_name, order_info, options, plan)
+                for image, angle_name in zip(images, angle_names)]
+        with self._cond:
+            for key in list(self._speculative):
+                if self._speculation[key]["session_id"] == session_id and key not in keys:
+                    self._drop_speculation(key)
+            for key, image, angle_name in zip(keys, images, angle_names):
+                if key in self._speculation:
+                    self._speculation.move_to_end(key)
+                    continue
+                self._speculation[key] = {
+                    "status": "queued",
+                    "session_id": session_id,
+                    "runtime": {"client": client, "image": image},
+                    "angle_name": angle_name,
+                    "order_info": dict(order_info),
+                    "options": dict(options, plan=plan),
+                    "analysis": None,
+                    "usage": {},
+                    "cost": 0.0,
+                    "waiters": []
+                }
+                self._speculative.append(key)
+            self._trim_speculation()
+            self._cond.notify_all()
+
+            counts = {"ready": carried, "running": 0, "queued": 0}
+            for key in keys:
+                status = self._speculation[key]["status"]
+                counts["ready" if status == "done" else status] += 1
+        return counts
+
+    def _drop_speculation(self, key):
+        entry = self._speculation.pop(key)
+        if entry["status"] == "queued":
+            self._speculative.remove(key)
+
+    def _trim_speculation(self):
+        """Forget the oldest finished speculative results beyond SPECULATIVE_RESULTS"""
+        excess = len(self._speculation) - SPECULATIVE_RESULTS
+        for key in [k for k, e in self._speculation.items() if e["status"] == "done"][:max(0, excess)]:
+            del self._speculation[key]
+
+    def _adopt(self, job, idx, entry):
+        """Use a finished speculative analysis for view idx of a job (its cost is already in the ledger)"""
+        usage = copy.deepcopy(entry["usage"])
+        job.setdefault("speculative_views", []).append(idx)
+        job["speculative_cost"] = job.get("speculative_cost", 0.0) + entry["cost"]
+        self._complete_view(job, idx, copy.deepcopy(entry["analysis"]), usage)
+
+    def status(self, job_id):
+        """Snapshot of a job's status, from memory or from the shared store"""
+        with self._cond:
+            if job_id in self._jobs:
+                return json.loads(json.dumps(self._jobs[job_id], default=str))
+        return self.store.load(job_id)
+
+    # Round-robin over sessions: take one task, then move that session to the back.
+    # Speculative tasks come back as (None, speculation key), only when no job task waits.
+    def _next_task(self):
+        with self._cond:
+            while not self._rotation and not self._speculative:
+                self._cond.wait()
+            if not self._rotation:
+                key = self._speculative.popleft()
+                self._speculation[key]["status"] = "running"
+                return None, key
+            session_id = self._rotation.popleft()
+            tasks = self._pending[session_id]
+            task = tasks.popleft()
+            if tasks:
+                self._rotation.append(session_id)
+            else:
+                del self._pending[session_id]
+
+            job = self._jobs[task[0]]
+            if job["status"] == "queued":
+                job["status"] = "running"
+                self._persist(job)
+            return task
+
+    def _analyze_angle(self, client, data, angle_name, order_info, options, usage):
+        """Analysis of one angle: golden-sample precheck, then the model"""
+        image = open_image(data)
+
+        # Views matching their golden sample are clean without an API call
+        comparison = None
+        if options.get("golden_samples"):
+            comparison = self.golden.compare(order_info["style_number"], order_info["color"], angle_name, image)
+            if comparison and comparison["within_tolerance"]:
+                analysis = golden_clean_analysis(angle_name, comparison)
+                if options.get("defect_boxes"):
+                    analysis["defect_boxes"] = []   # A clean view still counts toward the heatmap
+                return analysis
+
+        analysis = inspect_angle(
+            client,
+            image,
+            angle_name,
+            order_info["style_number"],
+            order_info["color"],
+            order_info["po_number"],
+            adaptive=options.get("inspection_mode") == "Adaptive tiling",
+            cascade=options.get("cascade"),
+            detail=options["plan"]["detail"],
+            max_side=options["plan"]["max_side"],
+            usage=usage,
+            compact=options.get("compact_output", False),
+            defect_boxes=options.get("defect_boxes", False)
+        )
+        if comparison and analysis:
+            add_golden_evidence(analysis, comparison)
+        return analysis
+
+    def _worker(self):
+        while True:
+            job_id, idx = self._next_task()
+            if job_id is None:
+                self._run_speculation(idx)
+                continue
+            job = self._jobs[job_id]
+            usage = {}
+            try:
+                analysis = self._analyze_angle(self._runtime[job_id]["client"], self._runtime[job_id]["images"][idx],
+                                               job["angle_names"][idx], job["order_info"], job["options"], usage)
+            except BackendUnavailable as e:
+                self._hold(e, usage, job=job, task=(job_id, idx))
+                continue
+            except Exception:
+                logger.exception("Inspection of %s in job %s failed", job["angle_names"][idx], job_id)
+                analysis = None
+
+            with self._cond:
+                self._complete_view(job, idx, analysis, usage)
+
+    def _run_speculation(self, key):
+        entry = self._speculation[key]
+        usage = {}
+        try:
+            analysis = self._analyze_angle(entry["runtime"]["client"], entry["runtime"]["image"], entry["angle_name"],
+                                           entry["order_info"], entry["options"], usage)
+        except BackendUnavailable as e:
+            self._hold(e, usage, key=key)
+            return
+        except Exception:
+            logger.exception("Speculative inspection of %s failed", entry["angle_name"])
+            analysis = None
+        # Spent whether or not the inspection is ever submitted
+        cost = usage_cost(usage)
+        self.ledger.settle(entry["order_info"]["po_number"], datetime.now().strftime("%Y-%m-%d"), 0.0, cost)
+
+        with self._cond:
+            entry.update(status="done", analysis=analysis, usage=usage, cost=cost, runtime=None)
+            waiters, entry["waiters"] = entry["waiters"], []
+            if analysis is not None:
+                for job_id, idx in waiters:
+                    self._adopt(self._jobs[job_id], idx, entry)
+                self._trim_speculation()
+                return
+
+            # Failed views are not kept: jobs waiting for one run the view themselves
+            del self._speculation[key]
+            for job_id, idx in waiters:
+                session_id = self._jobs[job_id]["session_id"]
+                tasks = self._pending.setdefault(session_id, deque())
+                if not tasks:
+                    self._rotation.append(session_id)
+                tasks.append((job_id, idx))
+            self._cond.notify_all()
+
+    def _hold(self, error, usage, job=None, task=None, key=None):
+        """Put a job task back at the front of its lane (or drop a speculative one) and wait for the backend"""
+        entry = None
+        with self._cond:
+            if job is not None:
+                # Calls that completed before the breaker opened were billed
+                merge_usage(job["usage"], usage)
+                tasks = self._pending.setdefault(job["session_id"], deque())
+                if not tasks:
+                    self._rotation.appendleft(job["session_id"])
+                tasks.appendleft(task)
+                job["backend_retry_at"] = time.time() + max(0.0, error.retry_at - time.monotonic())
+                self._persist(job)
+            else:
+                # Speculation is dropped; jobs already waiting for the view run it themselves
+                entry = self._speculation.pop(key)
+                for job_id, idx in entry["waiters"]:
+                    session_id = self._jobs[job_id]["session_id"]
+                    tasks = self._pending.setdefault(session_id, deque())
+                    if not tasks:
+                        self._rotation.appendleft(session_id)
+                    tasks.appendleft((job_id, idx))
+            self._cond.notify_all()
+        if entry is not None:
+            # Calls of the dropped speculation that completed were billed (ledger I/O stays off the queue lock)
+            self.ledger.settle(entry["order_info"]["po_number"], datetime.now().strftime("%Y-%m-%d"), 0.0,
+                               usage_cost(usage))
+        logger.warning("%s; holding the inspection queue", error)
+        time.sleep(max(0.0, error.retry_at - time.monotonic()))
+
+    def _complete_view(self, job, idx, analysis, usage):
+        job.pop("backend_retry_at", None)
+        if analysis is not None and "reinspection" in job and "provenance" not in analysis:
+            analysis["provenance"] = {"source": "reinspected", "reason": job["reinspection"]["views"][idx]["reason"]}
+        job["analyses"][idx] = analysis
+        merge_usage(job["usage"], usage)
+        job["completed"] += 1
+        if job["status"] == "queued":
+            job["status"] = "running"
+        if job["completed"] == job["total"]:
+            self._finish(job)
+        self._persist(job)
+
+    def _finish(self, job):
+        if job.get("symmetry"):
+            for angle_name in SIDE_VIEWS:
+                analysis = job["analyses"][job["angle_names"].index(angle_name)]
+                if analysis is not None:
+                    add_symmetry_evidence(analysis, job["symmetry"])
+        job["final_report"] = generate_qc_report(job["analyses"], job["order_info"], job["angle_names"])
+        job["status"] = "done"
+        job["finished_at"] = datetime.now().isoformat(timespec="seconds")
+        job["actual_cost"] = usage_cost(job["usage"])
+        # A snapshot, so publishing needs neither the queue lock nor a job that stays unchanged
+        self._publisher.submit(self._publish, copy.deepcopy(job))
+        # Reports load the images from the archive
+        self._runtime.pop(job["job_id"], None)
+        self._finished.append(job["job_id"])
+        while len(self._finished) > RETAINED_JOBS:
+            self._jobs.pop(self._finished.popleft(), None)
+
+    def _publish(self, job):
+        """Side effects of a finished job that do file or database I/O (run on the publisher thread)"""
+        # Adopted speculative views were charged to the ledger when they ran
+        try:
+            self.ledger.settle(job["order_info"]["po_number"], job["spend_day"],
+                               job["options"]["plan"]["cost"], job["actual_cost"] - job.get("speculative_cost", 0.0))
+        except OSError:
+            logger.exception("Could not settle the spend of job %s", job["job_id"])
+        self._stream_export(job)
+        try:
+            self.heatmaps.add_job(job)
+        except OSError:
+            logger.exception("Could not update the defect heatmaps with job %s", job["job_id"])
+        try:
+            self.search.index_job(job)
+        except sqlite3.Error:
+            logger.exception("Could not add job %s to the search index", job["job_id"])
+
+    def _backfill_search(self):
+        """Index the inspections finished before the search index existed"""
+        try:
+            if not self.search.indexed_jobs():
+                self.search.sync(self.store)
+        except sqlite3.Error:
+            logger.exception("Could not backfill the search index")
+
+    @staticmethod
+    def _stream_export(job):
+        """Append the finished job to the NDJSON log (QC_NDJSON_LOG) for log pipelines"""
+        from .export import NDJSON_LOG, append_ndjson
+        if NDJSON_LOG:
+            try:
+                append_ndjson([job], NDJSON_LOG, new=True)
+            except OSError:
+                logger.exception("Could not append job %s to %s", job["job_id"], NDJSON_LOG)
+
+    # Tell other processes sharing the store that our unfinished jobs are still alive
+    def _heartbeat(self):
+        while True:
+            time.sleep(HEARTBEAT_SECONDS)
+            with self._cond:
+                for job in self._jobs.values():
+                    if job["status"] in ("queued", "running"):
+                        self._persist(job)
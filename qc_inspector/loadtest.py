@@ -0,0 +1,493 @@
+"""
+Multi-session load test of the Streamlit app.
+
+    python -m qc_inspector.loadtest                                  # 1, 2, 4, 8, 16 sessions
+    python -m qc_inspector.loadtest --sessions 10 20 40 --latency 2.0 --images 6 --json load.json
+    python -m qc_inspector.loadtest --url http://qc-floor:8501 --server-pid 4242 --sessions 5 10
+
+One Streamlit server serves a whole inspection floor. This starts the app (streamlit run
+app.py) on a mock vision backend (mock_backend.py, --latency seconds per call) with private
+job, archive and ledger directories, and drives it with headless inspector sessions that
+speak Streamlit's websocket protocol the way a browser tab does: open the app, upload the
+images, start the inspection, poll the progress fragment until the report renders and
+download the JSON report. Every level of concurrent sessions reports
+
+    session      median / p95 seconds from opening the app to the downloaded report
+                 (progress is polled every 2 s, as in the browser)
+    rerun        median / p95 ms of the interactive reruns (open, upload, start)
+    throughput   inspections per minute
+    server CPU   share of one core (scripts run under one GIL) and CPU seconds per session
+    server RSS   peak resident memory and its growth per session over the idle server
+
+and the level where the app saturates: the first with failed sessions, a p95 rerun above
+SATURATION_RERUN_MS, server CPU above SATURATION_CPU of a core, or throughput growing by
+less than SATURATION_GAIN of the added sessions. Server CPU and memory are read from /proc
+(Linux); against a remote --url without --server-pid only latencies are reported. The
+sessions share one event loop, so for hundreds of sessions run the harness on another
+machine than the server.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+SATURATION_RERUN_MS = 1000.0 # p95 interactive rerun an inspector still accepts
+SATURATION_CPU = 0.85        # Share of one core
+SATURATION_GAIN = 0.5        # Min throughput gain, as a share of the relative increase in sessions
+SESSION_TIMEOUT = 600.0      # Seconds per session before it counts as failed
+MONITOR_INTERVAL = 0.25      # Seconds between server CPU / memory samples
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+UPLOAD_LABEL = "Choose images (JPG, PNG)"
+START_LABEL = "🔍 Start AI Quality Inspection"
+REPORT_LABEL = "📄 Download JSON Report"
+
+class SessionFailed(Exception):
+    pass
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _percentiles(values):
+    """(median, p95) of a list, (None, None) when empty"""
+    if not values:
+        return None, None
+    p95 = statistics.quantiles(values, n=20)[-1] if len(values) > 1 else values[0]
+    return statistics.median(values), p95
+
+def synthetic_images(count, seed, side=1600):
+    """JPEG bytes of distinct shoe-sized test photos (each gets its own mock verdict and archive blob)"""
+    import numpy as np
+    from PIL import Image, ImageDraw
+
+    rng = np.random.default_rng(seed)
+    images = []
+    for _ in range(count):
+        image = Image.new("RGB", (side, side * 3 // 4), (232, 232, 228))
+        draw = ImageDraw.Draw(image)
+        for _ in range(14):
+            x, y = (int(v) for v in rng.integers(0, side - 300, 2))
+            w, h = (int(v) for v in rng.integers(60, 300, 2))
+            draw.ellipse([x, y, x + w, y + h], fill=tuple(int(v) for v in rng.integers(0, 200, 3)))
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=88)
+        images.append(buffer.getvalue())
+    return images
+
+def folder_images(path, count):
+    names = sorted(n for n in os.listdir(path) if n.lower().endswith((".jpg", ".jpeg", ".png")))
+    if not names:
+        raise SystemExit(f"No JPG/PNG images in {path}")
+    images = []
+    for name in (names * count)[:count]:
+        with open(os.path.join(path, name), "rb") as f:
+            images.append(f.read())
+    return images
+
+class ProcessMonitor:
+    """CPU seconds and resident memory of a local process, sampled from /proc in a thread"""
+
+    def __init__(self, pid, interval=MONITOR_INTERVAL):
+        self.pid = pid
+        self.interval = interval
+        self.peak_rss = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def available(pid):
+        return pid is not None and os.path.exists(f"/proc/{pid}/stat")
+
+    def read(self):
+        """(CPU seconds, RSS bytes) of the process so far"""
+        with open(f"/proc/{self.pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()   # The command name may contain spaces
+        cpu = (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+        with open(f"/proc/{self.pid}/status") as f:
+            rss = next(int(line.split()[1]) * 1024 for line in f if line.startswith("VmRSS:"))
+        return cpu, rss
+
+    def start(self):
+        self.peak_rss = self.read()[1]
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="qc-load-monitor", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.peak_rss = max(self.peak_rss, self.read()[1])
+            except OSError:
+                return
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.peak_rss = max(self.peak_rss, self.read()[1])
+
+class InspectorSession:
+    """One headless browser tab: a websocket session on the app plus its HTTP uploads and downloads"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+        self.xsrf_cookie = None
+        self.ws = None
+        self.session_id = None
+        self.query_string = ""
+        self.widgets = {}        # Widget id -> WidgetState sent with every rerun
+        self.elements = []       # (type, proto) of the last full script run
+        self.auto_reruns = {}    # Fragment id -> interval, from the last full script run
+        self.errors = []
+        self.rerun_ms = []
+
+    async def connect(self):
+        from tornado.websocket import websocket_connect
+        from tornado.httpclient import HTTPRequest
+
+        url = self.base_url.replace("http", "ws", 1) + "/_stcore/stream"
+        self.ws = await websocket_connect(HTTPRequest(url), subprotocols=["streamlit"],
+                                          max_message_size=256 * 1024 * 1024)
+        # With XSRF protection on, the handshake sets the cookie that uploads must echo
+        for header in self.ws.headers.get_list("Set-Cookie"):
+            name, _, value = header.split(";", 1)[0].partition("=")
+            if name.strip() == "_streamlit_xsrf":
+                self.xsrf_cookie = value.strip().strip('"')
+
+    def close(self):
+        if self.ws is not None:
+            self.ws.close()
+
+    def _handle(self, msg):
+        kind = msg.WhichOneof("type")
+        if kind == "new_session":
+            if msg.new_session.initialize.session_id:
+                self.session_id = msg.new_session.initialize.session_id
+            if not msg.new_session.fragment_ids_this_run:
+                self.elements, self.auto_reruns = [], {}
+        elif kind == "delta" and msg.delta.WhichOneof("type") == "new_element":
+            element = msg.delta.new_element
+            element_type = element.WhichOneof("type")
+            self.elements.append((element_type, getattr(element, element_type)))
+            if element_type == "exception":
+                self.errors.append(element.exception.message)
+        elif kind == "page_info_changed":
+            self.query_string = msg.page_info_changed.query_string
+        elif kind == "auto_rerun":
+            self.auto_reruns[msg.auto_rerun.fragment_id] = msg.auto_rerun.interval
+
+    async def _read_until(self, predicate):
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        while True:
+            data = await self.ws.read_message()
+            if data is None:
+                raise SessionFailed("The server closed the websocket")
+            msg = ForwardMsg.FromString(data)
+            self._handle(msg)
+            if predicate(msg):
+                return msg
+
+    async def _send(self, **fields):
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        await self.ws.write_message(BackMsg(**fields).SerializeToString(), binary=True)
+
+    async def rerun(self, trigger=None, fragment_id=None):
+        """Run the script (or one fragment) like a widget interaction; returns the milliseconds it took"""
+        from streamlit.proto.ClientState_pb2 import ClientState
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        state = ClientState(query_string=self.query_string, fragment_id=fragment_id or "",
+                            is_auto_rerun=bool(fragment_id))
+        state.widget_states.widgets.extend(self.widgets.values())
+        if trigger:
+            state.widget_states.widgets.append(WidgetState(id=trigger, trigger_value=True))
+        started = time.perf_counter()
+        await self._send(rerun_script=state)
+        # A fragment that calls st.rerun() ends early and the server runs the whole script
+        await self._read_until(lambda msg: msg.WhichOneof("type") == "script_finished"
+                               and msg.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN)
+        if self.errors:
+            raise SessionFailed(f"app.py raised: {self.errors[0]}")
+        return (time.perf_counter() - started) * 1000
+
+    def element(self, element_type, label):
+        return next((proto for kind, proto in self.elements if kind == element_type and proto.label == label), None)
+
+    async def _http(self, path, method="GET", body=None, headers=None):
+        from tornado.httpclient import AsyncHTTPClient
+
+        headers = dict(headers or {})
+        if self.xsrf_cookie:
+            headers.update({"Cookie": f"_streamlit_xsrf={self.xsrf_cookie}", "X-Xsrftoken": self.xsrf_cookie})
+        url = path if path.startswith("http") else self.base_url + path
+        response = await AsyncHTTPClient().fetch(url, method=method, body=body, headers=headers,
+                                                 request_timeout=120, raise_error=False)
+        if response.code >= 400:
+            raise SessionFailed(f"{method} {path} returned {response.code}")
+        return response.body
+
+    async def _fetch_media(self):
+        """Load the images of the last run, as the browser does"""
+        for kind, proto in self.elements:
+            if kind == "imgs":
+                for image in proto.imgs:
+                    if image.url.startswith("/"):
+                        await self._http(image.url)
+
+    async def upload(self, uploader_id, images):
+        """Upload images to a file_uploader and keep its widget state for the following reruns"""
+        from streamlit.proto.Common_pb2 import FileURLsRequest, UploadedFileInfo
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        names = [f"view_{idx + 1}.jpg" for idx in range(len(images))]
+        request_id = uuid.uuid4().hex
+        await self._send(file_urls_request=FileURLsRequest(request_id=request_id, file_names=names,
+                                                           session_id=self.session_id))
+        response = (await self._read_until(lambda msg: msg.WhichOneof("type") == "file_urls_response"
+                                           and msg.file_urls_response.response_id == request_id)).file_urls_response
+        if response.error_msg:
+            raise SessionFailed(f"Upload refused: {response.error_msg}")
+
+        state = WidgetState(id=uploader_id)
+        for idx, (name, data, urls) in enumerate(zip(names, images, response.file_urls)):
+            boundary = uuid.uuid4().hex
+            body = (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{name}"\r\n'
+                    f"Content-Type: image/jpeg\r\n\r\n").encode() + data + f"\r\n--{boundary}--\r\n".encode()
+            await self._http(urls.upload_url, "PUT", body, {"Content-Type": f"multipart/form-data; boundary={boundary}"})
+            state.file_uploader_state_value.uploaded_file_info.append(
+                UploadedFileInfo(id=idx + 1, name=name, size=len(data), file_id=urls.file_id, file_urls=urls))
+        state.file_uploader_state_value.max_file_id = len(images)
+        self.widgets[uploader_id] = state
+
+    async def inspect(self, images, timeout=SESSION_TIMEOUT):
+        """Open the app, upload, start and follow one inspection; returns seconds to the downloaded report"""
+        started = time.perf_counter()
+        deadline = started + timeout
+        await self.connect()
+        self.rerun_ms.append(await self.rerun())
+        await self._fetch_media()
+
+        uploader = self.element("file_uploader", UPLOAD_LABEL)
+        if uploader is None:
+            raise SessionFailed("No image uploader on the page (is the vision backend configured?)")
+        await self.upload(uploader.id, images)
+        self.rerun_ms.append(await self.rerun())
+        await self._fetch_media()
+
+        start = self.element("button", START_LABEL)
+        if start is None or start.disabled:
+            raise SessionFailed("The inspection cannot be started (budget or image count)")
+        self.rerun_ms.append(await self.rerun(trigger=start.id))
+
+        # Poll the progress fragment until the finished report replaces it
+        while self.element("download_button", REPORT_LABEL) is None:
+            if not self.auto_reruns:
+                raise SessionFailed("Neither a progress view nor a report after starting the inspection")
+            if time.perf_counter() > deadline:
+                raise SessionFailed(f"No report within {timeout:.0f} s")
+            fragment_id, interval = next(iter(self.auto_reruns.items()))
+            await asyncio.sleep(interval)
+            await self.rerun(fragment_id=fragment_id)
+
+        report = json.loads(await self._http(self.element("download_button", REPORT_LABEL).url))
+        if "inspection_summary" not in report:
+            raise SessionFailed("The downloaded report has no inspection summary")
+        return time.perf_counter() - started
+
+async def _run_session(base_url, images, delay, timeout):
+    await asyncio.sleep(delay)
+    session = InspectorSession(base_url)
+    try:
+        seconds = await session.inspect(images, timeout)
+        return {"ok": True, "seconds": seconds, "rerun_ms": session.rerun_ms}
+    except (SessionFailed, OSError, asyncio.TimeoutError) as e:
+        return {"ok": False, "error": str(e), "rerun_ms": session.rerun_ms}
+    finally:
+        session.close()
+
+def run_level(base_url, sessions, image_sets, ramp, timeout, monitor=None, idle_rss=None):
+    """Run one level of concurrent sessions and summarize it"""
+    async def level():
+        return await asyncio.gather(*(_run_session(base_url, images, random.uniform(0, ramp), timeout)
+                                      for images in image_sets))
+
+    if monitor:
+        cpu_before = monitor.read()[0]
+        monitor.start()
+    started = time.perf_counter()
+    results = asyncio.run(level())
+    wall = time.perf_counter() - started
+
+    done = [r for r in results if r["ok"]]
+    session_median, session_p95 = _percentiles([r["seconds"] for r in done])
+    rerun_median, rerun_p95 = _percentiles([ms for r in results for ms in r["rerun_ms"]])
+    summary = {
+        "sessions": sessions,
+        "completed": len(done),
+        "failed": len(results) - len(done),
+        "errors": sorted({r["error"] for r in results if not r["ok"]}),
+        "session_median_s": session_median,
+        "session_p95_s": session_p95,
+        "rerun_median_ms": rerun_median,
+        "rerun_p95_ms": rerun_p95,
+        "throughput_per_min": len(done) / wall * 60,
+        "cpu_share": None,
+        "cpu_s_per_session": None,
+        "rss_peak_mb": None,
+        "rss_per_session_mb": None
+    }
+    if monitor:
+        monitor.stop()
+        cpu = monitor.read()[0] - cpu_before
+        summary.update(cpu_share=cpu / wall, cpu_s_per_session=cpu / sessions, rss_peak_mb=monitor.peak_rss / 1e6,
+                       rss_per_session_mb=(monitor.peak_rss - idle_rss) / 1e6 / sessions if idle_rss else None)
+    return summary
+
+def saturation(levels, rerun_ms=SATURATION_RERUN_MS, cpu=SATURATION_CPU, gain=SATURATION_GAIN):
+    """(sessions, reason) of the first saturated level, or (None, None)"""
+    previous = None
+    for level in levels:
+        if level["failed"]:
+            return level["sessions"], f"{level['failed']} of {level['sessions']} sessions failed"
+        if level["rerun_p95_ms"] is not None and level["rerun_p95_ms"] > rerun_ms:
+            return level["sessions"], f"p95 rerun {level['rerun_p95_ms']:.0f} ms > {rerun_ms:.0f} ms"
+        if level["cpu_share"] is not None and level["cpu_share"] > cpu:
+            return level["sessions"], f"server CPU at {level['cpu_share']:.0%} of a core"
+        if previous and previous["throughput_per_min"]:
+            expected = gain * (level["sessions"] / previous["sessions"] - 1)
+            achieved = level["throughput_per_min"] / previous["throughput_per_min"] - 1
+            if achieved < expected:
+                return level["sessions"], (f"throughput grew {achieved:+.0%} for {level['sessions'] / previous['sessions']:.1f}x "
+                                           f"sessions (inspection workers or backend are the limit)")
+        previous = level
+    return None, None
+
+def start_servers(app_path, latency, jitter, data_dir):
+    """Start the mock vision backend and the app on free ports; returns (app URL, [processes])"""
+    backend_port, app_port = _free_port(), _free_port()
+    config_path = os.path.join(data_dir, "mock-backend.json")
+    model = {"response_format": "auto", "price": [0, 0], "image_tokens": [0, 0]}
+    with open(config_path, "w") as f:
+        json.dump({"base_url": f"http://127.0.0.1:{backend_port}/v1", "api_key": "mock",
+                   "strong_model": "mock-vision", "screening_model": "mock-vision-mini",
+                   "models": {"mock-vision": model, "mock-vision-mini": model}}, f)
+    env = dict(os.environ, QC_BACKEND_CONFIG=config_path,
+               QC_JOBS_DIR=os.path.join(data_dir, "jobs"), QC_ARCHIVE_DIR=os.path.join(data_dir, "archive"),
+               QC_SPEND_LEDGER=os.path.join(data_dir, "spend.json"), QC_HEATMAP_DIR=os.path.join(data_dir, "heatmaps"),
+               QC_GOLDEN_DIR=os.path.join(data_dir, "golden"), QC_SEARCH_DB=os.path.join(data_dir, "search.sqlite"),
+               PYTHONPATH=os.pathsep.join(filter(None, [os.path.dirname(os.path.abspath(app_path)),
+                                                        os.environ.get("PYTHONPATH")])))
+    log = open(os.path.join(data_dir, "servers.log"), "wb")
+    backend = subprocess.Popen([sys.executable, "-m", "qc_inspector.mock_backend", "--port", str(backend_port),
+                                "--latency", str(latency), "--jitter", str(jitter)], env=env, stdout=log, stderr=log)
+    app = subprocess.Popen([sys.executable, "-m", "streamlit", "run", app_path, "--server.headless", "true",
+                            "--server.port", str(app_port), "--server.address", "127.0.0.1",
+                            "--server.fileWatcherType", "none", "--browser.gatherUsageStats", "false"],
+                           env=env, stdout=log, stderr=log)
+    url = f"http://127.0.0.1:{app_port}"
+    _wait_healthy(url, [backend, app], data_dir)
+    return url, [app, backend]
+
+def _wait_healthy(url, processes, data_dir, timeout=90):
+    from urllib.request import urlopen
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if any(p.poll() is not None for p in processes):
+            break
+        try:
+            with urlopen(f"{url}/_stcore/health", timeout=2) as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            time.sleep(0.5)
+    for p in processes:
+        p.terminate()
+    raise SystemExit(f"The app did not come up at {url}; see {os.path.join(data_dir, 'servers.log')}")
+
+def _fmt(value, spec, none="-"):
+    return none if value is None else format(value, spec)
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the Streamlit app with concurrent inspector sessions")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4, 8, 16],
+                        help="Concurrent sessions per level, run in order")
+    parser.add_argument("--images", type=int, default=4, help="Images per inspection")
+    parser.add_argument("--images-dir", help="Use these photos (cycled) instead of synthetic ones")
+    parser.add_argument("--latency", type=float, default=0.8, help="Mock backend seconds per vision call")
+    parser.add_argument("--jitter", type=float, default=0.2, help="+/- seconds of mock backend latency")
+    parser.add_argument("--ramp", type=float, default=1.0, help="Sessions of a level start within this many seconds")
+    parser.add_argument("--timeout", type=float, default=SESSION_TIMEOUT, help="Seconds per session")
+    parser.add_argument("--rerun-ms", type=float, default=SATURATION_RERUN_MS, help="Saturation: max p95 rerun")
+    parser.add_argument("--cpu", type=float, default=SATURATION_CPU, help="Saturation: max server CPU share of a core")
+    parser.add_argument("--url", help="Test a running app instead of starting one (with its own backend)")
+    parser.add_argument("--server-pid", type=int, help="Process id of the app at --url, for CPU and memory")
+    parser.add_argument("--app", default=APP_PATH)
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    processes = []
+    if args.url:
+        url, pid = args.url, args.server_pid
+    else:
+        data_dir = tempfile.mkdtemp(prefix="qc-load-")
+        url, processes = start_servers(args.app, args.latency, args.jitter, data_dir)
+        pid = processes[0].pid
+        print(f"App at {url} on a mock backend ({args.latency:g} s/call), data in {data_dir}")
+    monitor = ProcessMonitor(pid) if ProcessMonitor.available(pid) else None
+
+    levels = []
+    try:
+        # The first session warms up the server (imports, caches) and is not counted
+        warmup = run_level(url, 1, [synthetic_images(args.images, seed=0)], 0, args.timeout)
+        if warmup["failed"]:
+            raise SystemExit(f"The warm-up session failed: {warmup['errors'][0]}")
+        idle_rss = monitor.read()[1] if monitor else None
+        print(f"{'sessions':>8} {'done':>5} {'session s':>14} {'rerun ms':>14} {'insp/min':>9} "
+              f"{'CPU':>5} {'CPU s/sess':>10} {'RSS MB':>7} {'MB/sess':>7}")
+        seed = 1
+        for sessions in args.sessions:
+            image_sets = []
+            for _ in range(sessions):
+                image_sets.append(folder_images(args.images_dir, args.images) if args.images_dir
+                                  else synthetic_images(args.images, seed))
+                seed += 1
+            level = run_level(url, sessions, image_sets, args.ramp, args.timeout, monitor, idle_rss)
+            levels.append(level)
+            print(f"{sessions:>8} {level['completed']:>5} "
+                  f"{_fmt(level['session_median_s'], '.1f'):>6} / {_fmt(level['session_p95_s'], '.1f'):<5} "
+                  f"{_fmt(level['rerun_median_ms'], '.0f'):>6} / {_fmt(level['rerun_p95_ms'], '.0f'):<5} "
+                  f"{level['throughput_per_min']:>9.1f} {_fmt(level['cpu_share'], '.0%'):>5} "
+                  f"{_fmt(level['cpu_s_per_session'], '.2f'):>10} {_fmt(level['rss_peak_mb'], '.0f'):>7} "
+                  f"{_fmt(level['rss_per_session_mb'], '.1f'):>7}")
+            for error in level["errors"]:
+                print(f"         ! {error}")
+    finally:
+        for p in processes:
+            p.terminate()
+
+    saturated_at, reason = saturation(levels, args.rerun_ms, args.cpu)
+    if saturated_at is None:
+        print(f"No saturation up to {args.sessions[-1]} sessions")
+    else:
+        capacity = max((level["sessions"] for level in levels if level["sessions"] < saturated_at), default=0)
+        print(f"Saturates at {saturated_at} sessions: {reason}; capacity about {capacity} concurrent sessions")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"url": url, "latency": args.latency, "images": args.images, "levels": levels,
+                       "saturated_at": saturated_at, "reason": reason}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+"""Advisory file locks for the stores several processes update in place (spend ledger, heatmaps)"""
+import contextlib
+import os
+
+try:
+    import fcntl
+except ImportError:     # Windows: callers' thread locks still serialize one process
+    fcntl = None
+
+@contextlib.contextmanager
+def file_lock(path):
+    """
+    Exclusive lock on path + ".lock" for a load-modify-replace of path, held until the block exits.
+    Works across processes on one host and on shared volumes with POSIX locking (e.g. NFSv4).
+    """
+    lock_path = f"{path}.lock"
+    os.makedirs(os.path.dirname(lock_path) or ".", exist_ok=True)
+    with open(lock_path, "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        yield
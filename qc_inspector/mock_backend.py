@@ -0,0 +1,136 @@
+"""
+Local stand-in for an OpenAI-compatible vision server.
+
+    python -m qc_inspector.mock_backend --port 8700 --latency 0.8 --formats json_object
+    QC_BACKEND_CONFIG=mock-backend.json streamlit run app.py
+
+with mock-backend.json:
+    {"base_url": "http://127.0.0.1:8700/v1", "api_key": "mock", "strong_model": "mock-vision",
+     "screening_model": "mock-vision-mini",
+     "models": {"mock-vision": {"response_format": "auto", "price": [0, 0], "image_tokens": [0, 0]},
+                "mock-vision-mini": {"response_format": "auto", "price": [0, 0], "image_tokens": [0, 0]}}}
+
+Answers /v1/chat/completions with plausible inspection replies in whichever shape
+the prompt asks for (prose, compact coded, close-up region, with suspect regions
+or defect boxes).
+Findings are derived from a hash of the image, so the same photo always gets the
+same answer. --formats limits the accepted response_format types, so a server
+without JSON-schema output (400 on the request) can be simulated.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import time
+
+import tornado.ioloop
+import tornado.web
+
+from .codes import DEFECT_CODES, LOCATIONS
+
+logger = logging.getLogger(__name__)
+
+SEVERITY_TOKENS = {"critical": "crit", "major": "maj", "minor": "min"}
+
+def mock_reply(prompt, image_url, defect_rate=0.35):
+    """Reply text for a prompt and image, deterministic per image"""
+    rng = random.Random(hashlib.sha256(image_url.encode()).digest())
+    codes = [code for code in DEFECT_CODES if code != "OTH"]
+    defects = [(rng.choice(codes), rng.choice(list(LOCATIONS))) for _ in range(3) if rng.random() < defect_rate]
+    condition = "Poor" if any(DEFECT_CODES[c][1] != "minor" for c, _ in defects) else "Fair" if defects else "Good"
+
+    if "COMPACT CODED" in prompt:
+        reply = {
+            "d": [[SEVERITY_TOKENS[DEFECT_CODES[c][1]], c, loc, ""] for c, loc in defects],
+            "c": condition[0], "k": "H", "n": "Mock backend reply"
+        }
+    else:
+        reply = {f"{severity}_defects": [f"{LOCATIONS[loc]}: {DEFECT_CODES[c][0]}" for c, loc in defects
+                                         if DEFECT_CODES[c][1] == severity]
+                 for severity in ("critical", "major", "minor")}
+        if "CLOSE-UP REGION" in prompt:
+            reply["notes"] = "Mock close-up reply"
+        else:
+            reply.update(angle="", overall_condition=condition, confidence="High",
+                         inspection_notes="Mock backend reply")
+    if "defect_boxes" in prompt and "CLOSE-UP REGION" not in prompt:
+        # Boxes scatter a little around a per-location spot, so heatmaps show clusters
+        boxes = []
+        for code, loc in defects:
+            spot = random.Random(loc).random() * 0.7, random.Random(loc + "y").random() * 0.7
+            x, y = (min(0.8, max(0.0, v + rng.uniform(-0.05, 0.05))) for v in spot)
+            boxes.append({"severity": DEFECT_CODES[code][1], "box": [round(x, 3), round(y, 3), round(x + 0.15, 3),
+                                                                   round(y + 0.12, 3)], "label": code})
+        reply["defect_boxes"] = boxes
+    if "suspect_regions" in prompt and "CLOSE-UP REGION" not in prompt:
+        reply["suspect_regions"] = [{"box": [0.1, 0.5, 0.4, 0.9], "reason": "possible glue line"}] if defects else []
+    return json.dumps(reply)
+
+class ChatCompletionsHandler(tornado.web.RequestHandler):
+    def initialize(self, formats, latency, jitter, defect_rate):
+        self.formats = formats
+        self.latency = latency
+        self.jitter = jitter
+        self.defect_rate = defect_rate
+
+    def error(self, status, message):
+        self.set_status(status)
+        self.finish({"error": {"message": message, "type": "invalid_request_error"}})
+
+    async def post(self):
+        request = json.loads(self.request.body)
+        response_format = (request.get("response_format") or {}).get("type")
+        if response_format and response_format not in self.formats:
+            return self.error(400, f"response_format {response_format} is not supported by this server")
+
+        content = request["messages"][0]["content"]
+        prompt = next((part["text"] for part in content if part["type"] == "text"), "")
+        image_url = next((part["image_url"]["url"] for part in content if part["type"] == "image_url"), "")
+        await asyncio.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+
+        text = mock_reply(prompt, image_url, self.defect_rate)
+        prompt_tokens = len(prompt) // 4 + 85
+        self.finish({
+            "id": f"chatcmpl-mock-{hashlib.sha1(image_url.encode()).hexdigest()[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request["model"],
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": text}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(text) // 4,
+                      "total_tokens": prompt_tokens + len(text) // 4}
+        })
+
+class ModelsHandler(tornado.web.RequestHandler):
+    def get(self):
+        self.finish({"object": "list", "data": [{"id": "mock-vision", "object": "model"},
+                                                {"id": "mock-vision-mini", "object": "model"}]})
+
+def make_app(formats=("json_schema", "json_object"), latency=0.0, jitter=0.0, defect_rate=0.35):
+    options = {"formats": set(formats), "latency": latency, "jitter": jitter, "defect_rate": defect_rate}
+    return tornado.web.Application([
+        (r"/v1/chat/completions", ChatCompletionsHandler, options),
+        (r"/v1/models", ModelsHandler),
+    ])
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenAI-compatible vision server for local testing")
+    parser.add_argument("--port", type=int, default=8700)
+    parser.add_argument("--address", default="127.0.0.1")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds per reply")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- seconds of random latency")
+    parser.add_argument("--defect-rate", type=float, default=0.35)
+    parser.add_argument("--formats", nargs="*", default=["json_schema", "json_object"],
+                        choices=["json_schema", "json_object"], help="Accepted response_format types")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    make_app(args.formats, args.latency, args.jitter, args.defect_rate).listen(args.port, address=args.address,
+                                                                              max_body_size=100 * 1024 * 1024)
+    logger.info("Mock vision backend on %s:%d (response formats: %s)", args.address, args.port,
+                ", ".join(args.formats) or "none")
+    tornado.ioloop.IOLoop.current().start()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Rerun-latency check for the Streamlit app.
+
+    python -m qc_inspector.perf                 # exits 1 when over budget
+    python -m qc_inspector.perf --budget-ms 80 --runs 50
+
+Every widget interaction reruns app.py, so typing into the order form must stay
+cheap. This drives the app headless (streamlit.testing AppTest), types into the
+PO Number input repeatedly on the order form and on a finished inspection report,
+and compares the median rerun time with the budget. The app's .streamlit/config.toml is
+applied first, as streamlit run does from the repository root. tests/test_rerun_latency.py
+runs the same check under pytest.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+RERUN_BUDGET_MS = float(os.environ.get("QC_RERUN_BUDGET_MS", "75"))
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+def _sample_job():
+    """A finished six-view inspection with a few defects, as the job store holds it"""
+    from .analysis import ANGLE_NAMES
+    from .report import generate_qc_report
+
+    order_info = {"po_number": "0144540", "style_number": "GS1412401B", "color": "PPB", "customer": "MIA",
+                  "inspector": "AI Inspector", "inspection_date": "2026-01-15"}
+    analyses = [{
+        "angle": angle_name,
+        "critical_defects": [],
+        "major_defects": ["Visible glue residue along the foxing line"] if idx % 2 else [],
+        "minor_defects": ["Loose thread end near the eyelet row", "Slight crease on the vamp"],
+        "overall_condition": "Fair" if idx % 2 else "Good",
+        "confidence": "High",
+        "inspection_notes": "Construction is consistent with the approved sample."
+    } for idx, angle_name in enumerate(ANGLE_NAMES)]
+    return {
+        "job_id": "perfcheck0001",
+        "session_id": "perf",
+        "owner": "perf",
+        "status": "done",
+        "submitted_at": "2026-01-15T09:00:00",
+        "finished_at": "2026-01-15T09:00:40",
+        "order_info": order_info,
+        "angle_names": list(ANGLE_NAMES),
+        "options": {"inspection_mode": "Standard", "cascade": None, "golden_samples": False,
+                    "plan": {"cost": 0.05}},
+        "spend_day": "2026-01-15",
+        "usage": {},
+        "actual_cost": 0.04,
+        "total": len(ANGLE_NAMES),
+        "completed": len(ANGLE_NAMES),
+        "analyses": analyses,
+        "final_report": generate_qc_report(analyses, order_info),
+        "heartbeat": time.time()
+    }
+
+def apply_app_config(app_path=APP_PATH):
+    """Set the options of the .streamlit/config.toml beside app.py (AppTest only reads the working directory's)"""
+    import toml
+    from streamlit import config
+
+    path = os.path.join(os.path.dirname(os.path.abspath(app_path)), ".streamlit", "config.toml")
+    if os.path.exists(path):
+        for section, options in toml.load(path).items():
+            for name, value in options.items():
+                config.set_option(f"{section}.{name}", value)
+
+def sample_queue(data_dir):
+    """
+    (queue, job): an inspection queue with every store (jobs, ledger, golden samples, heatmaps,
+    archive, search index) under data_dir, whose job store holds one finished inspection
+    """
+    from .archive import ImageArchive
+    from .cost import SpendLedger
+    from .golden import GoldenLibrary
+    from .heatmap import HeatmapStore
+    from .jobs import InspectionJobQueue, JobStore
+    from .search import SearchIndex
+
+    queue = InspectionJobQueue(JobStore(os.path.join(data_dir, "jobs")),
+                               ledger=SpendLedger(os.path.join(data_dir, "spend.json")),
+                               golden=GoldenLibrary(os.path.join(data_dir, "golden")),
+                               heatmaps=HeatmapStore(os.path.join(data_dir, "heatmaps")),
+                               archive=ImageArchive(os.path.join(data_dir, "archive")),
+                               search=SearchIndex(os.path.join(data_dir, "search.sqlite")))
+    job = _sample_job()
+    queue.store.save(job)
+    return queue, job
+
+def measure_reruns(app_path=APP_PATH, runs=20, job_id=None, queue=None):
+    """
+    Milliseconds per rerun while typing into the PO Number input (after one warm-up run).
+    With a queue (see sample_queue) the app uses it instead of its process-wide default queue.
+    """
+    from streamlit.testing.v1 import AppTest
+    from . import ui
+
+    apply_app_config(app_path)
+    default_queue = ui.get_job_queue
+    if queue is not None:
+        ui.get_job_queue = lambda: queue
+    try:
+        return _measure_reruns(AppTest, app_path, runs, job_id)
+    finally:
+        ui.get_job_queue = default_queue
+
+def _measure_reruns(AppTest, app_path, runs, job_id):
+    app = AppTest.from_file(app_path, default_timeout=60)
+    if job_id:
+        app.query_params["job"] = job_id
+    app.run()
+    next(t for t in app.text_input if t.label == "OpenAI API Key").input("sk-perf-check").run()
+    if job_id and not any("Inspection Report" in header.value for header in app.header):
+        raise RuntimeError(f"Job {job_id} did not render a report")
+
+    timings = []
+    for n in range(runs):
+        po_input = next(t for t in app.text_input if t.label == "PO Number")
+        started = time.perf_counter()
+        po_input.input(f"{1000 + n}").run()
+        timings.append((time.perf_counter() - started) * 1000)
+        if app.exception:
+            raise RuntimeError(f"app.py raised during rerun: {app.exception[0].message}")
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the Streamlit rerun latency against a budget")
+    parser.add_argument("--budget-ms", type=float, default=RERUN_BUDGET_MS, help="Max median rerun time")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--app", default=APP_PATH)
+    args = parser.parse_args()
+
+    # Private stores, one finished inspection in them for the report scenario
+    sys.path.insert(0, os.path.dirname(os.path.abspath(args.app)))
+    queue, job = sample_queue(tempfile.mkdtemp(prefix="qc-perf-"))
+
+    failed = False
+    for scenario, job_id in (("order form", None), ("finished report", job["job_id"])):
+        timings = measure_reruns(args.app, args.runs, job_id, queue)
+        median = statistics.median(timings)
+        p95 = statistics.quantiles(timings, n=20)[-1] if len(timings) > 1 else median
+        verdict = "ok" if median <= args.budget_ms else "OVER BUDGET"
+        failed = failed or median > args.budget_ms
+        print(f"{scenario:16s} median {median:6.1f} ms  p95 {p95:6.1f} ms  budget {args.budget_ms:.0f} ms  {verdict}")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Differential re-inspection of a pair that comes back from rework.
+
+Every inspection stores a perceptual hash per view (job["view_hashes"]). A re-inspection
+is linked to the latest finished inspection of the same PO, style and color; each view is
+matched to the previous view of the same angle and
+
+    carried forward  when that view was clean and the new photo hashes within
+                     UNCHANGED_DISTANCE bits of it (its previous analysis is reused, no API call)
+    re-analysed      when the photo changed, the view previously had defects (the rework
+                     is what needs checking) or failed, or there is no previous view
+
+Carried analyses keep a "provenance" entry naming the inspection they come from, and
+generate_qc_report lists which views were carried forward and which were re-analysed.
+"""
+import copy
+import io
+
+from PIL import Image, ImageOps
+
+from .imaging import hash_distance, perceptual_hash
+
+UNCHANGED_DISTANCE = 6       # Max differing hash bits (of 64) for a view to count as unchanged
+HASH_DECODE_SIDE = 128       # JPEGs are decoded at a reduced scale for hashing
+
+def view_hash(data):
+    """Perceptual hash of an uploaded image (raw bytes), upright as displayed"""
+    image = Image.open(io.BytesIO(data))
+    image.draft("RGB", (HASH_DECODE_SIDE, HASH_DECODE_SIDE))  # JPEG only: decode at 1/2 to 1/8 scale
+    return perceptual_hash(ImageOps.exif_transpose(image))
+
+def find_previous_inspection(store, order_info):
+    """Latest finished inspection of the same PO, style and color in a JobStore, or None"""
+    key = (order_info["po_number"], order_info["style_number"], order_info["color"])
+    previous = None
+    for job in store.iter_jobs("done"):
+        info = job["order_info"]
+        if (info["po_number"], info["style_number"], info["color"]) != key:
+            continue
+        if previous is None or (job["finished_at"] or "") > (previous["finished_at"] or ""):
+            previous = job
+    return previous
+
+def has_defects(analysis):
+    return any(analysis.get(key) for key in ("critical_defects", "major_defects", "minor_defects"))
+
+def previous_view_hashes(previous, archive=None):
+    """View hashes of a previous inspection, recomputed from the image archive for jobs that predate them"""
+    hashes = previous.get("view_hashes")
+    if hashes:
+        return hashes
+    hashes = []
+    for digest in previous.get("image_digests") or []:
+        data = archive.get(digest) if archive else None
+        hashes.append(view_hash(data) if data else None)
+    return hashes or [None] * len(previous["angle_names"])
+
+def plan_reinspection(previous, hashes, angle_names, archive=None):
+    """
+    Per-view decisions against a previous inspection:
+    [{"carry": bool, "reason": str, "previous_index": int or None, "distance": int or None}]
+    """
+    previous_hashes = previous_view_hashes(previous, archive)
+    previous_index = {angle_name: idx for idx, angle_name in enumerate(previous["angle_names"])}
+    decisions = []
+    for view_hash_, angle_name in zip(hashes, angle_names):
+        idx = previous_index.get(angle_name)
+        analysis = previous["analyses"][idx] if idx is not None else None
+        distance = None
+        if idx is None:
+            carry, reason = False, "new view"
+        elif analysis is None:
+            carry, reason = False, "previous analysis failed"
+        elif has_defects(analysis):
+            carry, reason = False, "had defects"
+        elif idx >= len(previous_hashes) or previous_hashes[idx] is None:
+            carry, reason = False, "no previous image to compare"
+        else:
+            distance = hash_distance(view_hash_, previous_hashes[idx])
+            carry = distance <= UNCHANGED_DISTANCE
+            reason = "unchanged" if carry else "changed"
+        decisions.append({"carry": carry, "reason": reason, "previous_index": idx, "distance": distance})
+    return decisions
+
+def carried_analysis(previous, decision):
+    """The previous analysis of an unchanged view, with its provenance"""
+    analysis = copy.deepcopy(previous["analyses"][decision["previous_index"]])
+    # A view carried through several re-inspections points at the inspection that analysed it
+    origin = analysis.get("provenance") or {}
+    if origin.get("source") != "carried_forward":
+        origin = {"job_id": previous["job_id"], "inspected_at": previous["finished_at"]}
+    analysis["provenance"] = {
+        "source": "carried_forward",
+        "job_id": origin["job_id"],
+        "inspected_at": origin["inspected_at"],
+        "hash_distance": decision["distance"]
+    }
+    return analysis
@@ -0,0 +1,694 @@
+"""AQL 2.5 decision and report rendering (JSON document, HTML, styled text)"""
+import base64
+
+# Generate comprehensive QC Report
+def generate_qc_report(analyses, order_info, angle_names=None):
+    """
+    Generate final QC report based on all angle analyses and AQL 2.5 standards
+    Analyses of a re-inspection carry a "provenance" entry; the report then lists per view whether
+    it was carried forward from an earlier inspection or re-analysed, and why.
+    """
+    # Combine all defects from all angles
+    all_critical = []
+    all_major = []
+    all_minor = []
+    
+    for analysis in analyses:
+        if analysis:
+            all_critical.extend(analysis.get('critical_defects', []))
+            all_major.extend(analysis.get('major_defects', []))
+            all_minor.extend(analysis.get('minor_defects', []))
+    
+    # Remove duplicates while preserving order
+    all_critical = list(dict.fromkeys(all_critical))
+    all_major = list(dict.fromkeys(all_major))
+    all_minor = list(dict.fromkeys(all_minor))
+    
+    # Count defects
+    critical_count = len(all_critical)
+    major_count = len(all_major)
+    minor_count = len(all_minor)
+    
+    # Apply AQL 2.5 standards (based on sample size of 200 pieces)
+    # These are the actual limits from your inspection report
+    aql_limits = {
+        "critical": 0,  # Zero tolerance for critical defects
+        "major": 10,    # Maximum 10 major defects allowed
+        "minor": 14     # Maximum 14 minor defects allowed
+    }
+    
+    # Determine final result
+    if critical_count > aql_limits["critical"]:
+        result = "REJECT"
+        reason = f"Critical defects found ({critical_count}) - Zero tolerance policy"
+    elif major_count > aql_limits["major"]:
+        result = "REJECT" 
+        reason = f"Major defects ({major_count}) exceed AQL limit ({aql_limits['major']})"
+    elif minor_count > aql_limits["minor"]:
+        result = "REWORK"
+        reason = f"Minor defects ({minor_count}) exceed AQL limit ({aql_limits['minor']})"
+    else:
+        result = "ACCEPT"
+        reason = "All defects within acceptable AQL 2.5 limits"
+    
+    report = {
+        "result": result,
+        "reason": reason,
+        "critical_count": critical_count,
+        "major_count": major_count,
+        "minor_count": minor_count,
+        "critical_defects": all_critical,
+        "major_defects": all_major,
+        "minor_defects": all_minor,
+        "aql_limits": aql_limits
+    }
+    
+    # Re-inspection: where each view's findings come from
+    if any(analysis and analysis.get("provenance") for analysis in analyses):
+        views = []
+        for idx, analysis in enumerate(analyses):
+            angle = angle_names[idx] if angle_names else (analysis or {}).get("angle", f"View {idx+1}")
+            provenance = (analysis or {}).get("provenance") or {"source": "failed"}
+            views.append(dict(provenance, angle=angle))
+        carried = sum(view["source"] == "carried_forward" for view in views)
+        report["provenance"] = {
+            "carried_forward": carried,
+            "reanalyzed": sum(view["source"] == "reinspected" for view in views),
+            "views": views
+        }
+        report["reason"] += f" (re-inspection: {carried} of {len(views)} views carried forward unchanged)"
+    return report
+
+# Exportable report document (shared by the downloads and the HTTP API)
+def build_export_report(order_info, final_report, analyses):
+    """Combine order info, the final QC decision and the angle analyses into one export document"""
+    document = {
+        "inspection_summary": {
+            "inspection_date": order_info["inspection_date"],
+            "inspector": order_info["inspector"],
+            "customer": order_info["customer"],
+            "po_number": order_info["po_number"],
+            "style_number": order_info["style_number"],
+            "color": order_info["color"],
+            "final_result": final_report['result'],
+            "inspection_standard": "AQL 2.5"
+        },
+        "defect_summary": {
+            "critical_count": final_report['critical_count'],
+            "major_count": final_report['major_count'],
+            "minor_count": final_report['minor_count'],
+            "aql_limits": final_report['aql_limits']
+        },
+        "defect_details": {
+            "critical_defects": final_report['critical_defects'],
+            "major_defects": final_report['major_defects'],
+            "minor_defects": final_report['minor_defects']
+        },
+        "angle_analyses": analyses,
+        "decision_rationale": final_report['reason']
+    }
+    if final_report.get("provenance"):
+        document["provenance"] = final_report["provenance"]
+    return document
+
+# Enhanced HTML Report Generation
+def generate_html_report(export_report, po_number, style_number, heatmaps=None):
+    """
+    Generate a professional HTML report with styling
+    heatmaps are the style's defect location figures (heatmap.heatmap_figures), embedded as images.
+    """
+    
+    inspection_data = export_report['inspection_summary']
+    defect_data = export_report['defect_summary']
+    defects = export_report['defect_details']
+    
+    # Determine result color
+    result_colors = {
+        "ACCEPT": "#28a745",  # Green
+        "REWORK": "#ffc107",  # Yellow
+        "REJECT": "#dc3545"   # Red
+    }
+    
+    result_color = result_colors.get(inspection_data['final_result'], "#6c757d")
+    
+    html_content = f"""
+    <!DOCTYPE html>
+    <html lang="en">
+    <head>
+        <meta charset="UTF-8">
+        <meta name="viewport" content="width=device-width, initial-scale=1.0">
+        <title>QC Inspection Report - {po_number}</title>
+        <style>
+            body {{
+                font-family: 'Arial', sans-serif;
+                line-height: 1.6;
+                margin: 0;
+                padding: 20px;
+                background: linear-gradient(135deg, #f5f7fa 0%, #c3cfe2 100%);
+                color: #333;
+            }}
+            
+            .report-container {{
+                max-width: 800px;
+                margin: 0 auto;
+                background: white;
+                border-radius: 10px;
+                box-shadow: 0 10px 30px rgba(0,0,0,0.1);
+                overflow: hidden;
+            }}
+            
+            .header {{
+                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+                color: white;
+                padding: 30px;
+                text-align: center;
+                position: relative;
+            }}
+            
+            .header::before {{
+                content: '🔍';
+                font-size: 3rem;
+                position: absolute;
+                top: 15px;
+                left: 30px;
+                opacity: 0.3;
+            }}
+            
+            .header h1 {{
+                margin: 0;
+                font-size: 2.2rem;
+                font-weight: bold;
+                text-transform: uppercase;
+                letter-spacing: 2px;
+            }}
+            
+            .header .subtitle {{
+                margin: 10px 0 0 0;
+                font-size: 1rem;
+                opacity: 0.9;
+                font-style: italic;
+            }}
+            
+            .content {{
+                padding: 30px;
+            }}
+            
+            .result-banner {{
+                background: {result_color};
+                color: white;
+                padding: 20px;
+                margin: -30px -30px 30px -30px;
+                text-align: center;
+                font-size: 1.4rem;
+                font-weight: bold;
+                text-transform: uppercase;
+                letter-spacing: 1px;
+            }}
+            
+            .info-grid {{
+                display: grid;
+                grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
+                gap: 20px;
+                margin-bottom: 30px;
+                padding: 20px;
+                background: #f8f9fa;
+                border-radius: 8px;
+                border-left: 5px solid #667eea;
+            }}
+            
+            .info-item {{
+                display: flex;
+                align-items: center;
+            }}
+            
+            .info-label {{
+                font-weight: bold;
+                color: #495057;
+                margin-right: 10px;
+                min-width: 80px;
+            }}
+            
+            .info-value {{
+                color: #212529;
+                font-family: 'Courier New', monospace;
+                background: white;
+                padding: 4px 8px;
+                border-radius: 4px;
+                border: 1px solid #dee2e6;
+            }}
+            
+            .metrics-container {{
+                display: grid;
+                grid-template-columns: repeat(3, 1fr);
+                gap: 20px;
+                margin: 30px 0;
+            }}
+            
+            .metric-card {{
+                text-align: center;
+                padding: 20px;
+                border-radius: 10px;
+                box-shadow: 0 4px 15px rgba(0,0,0,0.1);
+                position: relative;
+                overflow: hidden;
+            }}
+            
+            .metric-card.critical {{
+                background: linear-gradient(135deg, #ff6b6b, #ee5a52);
+                color: white;
+            }}
+            
+            .metric-card.major {{
+                background: linear-gradient(135deg, #feca57, #ff9ff3);
+                color: white;
+            }}
+            
+            .metric-card.minor {{
+                background: linear-gradient(135deg, #48dbfb, #0abde3);
+                color: white;
+            }}
+            
+            .metric-number {{
+                font-size: 2.5rem;
+                font-weight: bold;
+                margin-bottom: 10px;
+            }}
+            
+            .metric-label {{
+                font-size: 0.9rem;
+                text-transform: uppercase;
+                letter-spacing: 1px;
+                opacity: 0.9;
+            }}
+            
+            .metric-limit {{
+                font-size: 0.8rem;
+                opacity: 0.8;
+                margin-top: 5px;
+            }}
+            
+            .defects-section {{
+                margin-top: 30px;
+            }}
+            
+            .section-title {{
+                font-size: 1.3rem;
+                font-weight: bold;
+                color: #495057;
+                margin: 25px 0 15px 0;
+                padding: 10px 0;
+                border-bottom: 2px solid #e9ecef;
+                display: flex;
+                align-items: center;
+            }}
+            
+            .defect-list {{
+                background: #fff;
+                border-radius: 8px;
+                padding: 20px;
+                margin-bottom: 20px;
+                box-shadow: 0 2px 10px rgba(0,0,0,0.05);
+            }}
+            
+            .defect-item {{
+                padding: 12px;
+                margin: 8px 0;
+                border-radius: 6px;
+                border-left: 4px solid;
+                display: flex;
+                align-items: flex-start;
+            }}
+            
+            .defect-item.critical {{
+                background: #fff5f5;
+                border-left-color: #dc3545;
+                color: #721c24;
+            }}
+            
+            .defect-item.major {{
+                background: #fff8e1;
+                border-left-color: #ffc107;
+                color: #7d4e00;
+            }}
+            
+            .defect-item.minor {{
+                background: #e3f2fd;
+                border-left-color: #17a2b8;
+                color: #0c5460;
+            }}
+            
+            .defect-number {{
+                font-weight: bold;
+                margin-right: 10px;
+                min-width: 25px;
+            }}
+            
+            .no-defects {{
+                text-align: center;
+                padding: 20px;
+                color: #28a745;
+                font-style: italic;
+                background: #f8fff8;
+                border: 1px dashed #28a745;
+                border-radius: 6px;
+            }}
+            
+            .footer {{
+                background: #f8f9fa;
+                padding: 20px 30px;
+                text-align: center;
+                color: #6c757d;
+                border-top: 1px solid #e9ecef;
+            }}
+            
+            .footer .logo {{
+                font-size: 1.1rem;
+                font-weight: bold;
+                color: #495057;
+            }}
+            
+            .generated-info {{
+                font-size: 0.9rem;
+                margin-top: 10px;
+            }}
+            
+            .reason-box {{
+                background: linear-gradient(135deg, #f093fb 0%, #f5576c 100%);
+                color: white;
+                padding: 15px;
+                border-radius: 8px;
+                margin: 20px 0;
+                text-align: center;
+                font-weight: 500;
+            }}
+            
+            @media print {{
+                body {{ background: white; }}
+                .report-container {{ box-shadow: none; }}
+            }}
+            
+            .icon {{
+                font-size: 1.2rem;
+                margin-right: 10px;
+            }}
+        </style>
+    </head>
+    <body>
+        <div class="report-container">
+            <div class="header">
+                <h1>Quality Control Inspection Report</h1>
+                <p class="subtitle">AI-Powered Footwear Analysis • AQL 2.5 Standard</p>
+            </div>
+            
+            <div class="content">
+                <div class="result-banner">
+                    🎯 Final Result: {inspection_data['final_result']}
+                </div>
+                
+                <div class="reason-box">
+                    <strong>📋 Decision Rationale:</strong> {export_report['decision_rationale']}
+                </div>
+                
+                <div class="info-grid">
+                    <div class="info-item">
+                        <span class="info-label">📦 PO Number:</span>
+                        <span class="info-value">{inspection_data['po_number']}</span>
+                    </div>
+                    <div class="info-item">
+                        <span class="info-label">👟 Style:</span>
+                        <span class="info-value">{inspection_data['style_number']}</span>
+                    </div>
+                    <div class="info-item">
+                        <span class="info-label">🎨 Color:</span>
+                        <span class="info-value">{inspection_data['color']}</span>
+                    </div>
+                    <div class="info-item">
+                        <span class="info-label">🏢 Customer:</span>
+                        <span class="info-value">{inspection_data['customer']}</span>
+                    </div>
+                    <div class="info-item">
+                        <span class="info-label">👨‍🔬 Inspector:</span>
+                        <span class="info-value">{inspection_data['inspector']}</span>
+                    </div>
+                    <div class="info-item">
+                        <span class="info-label">📅 Date:</span>
+                        <span class="info-value">{inspection_data['inspection_date']}</span>
+                    </div>
+                </div>
+                
+                <div class="section-title">
+                    <span class="icon">📊</span>
+                    Defect Summary (AQL 2.5 Standard)
+                </div>
+                
+                <div class="metrics-container">
+                    <div class="metric-card critical">
+                        <div class="metric-number">{defect_data['critical_count']}</div>
+                        <div class="metric-label">🚨 Critical Defects</div>
+                        <div class="metric-limit">Limit: {defect_data['aql_limits']['critical']}</div>
+                    </div>
+                    <div class="metric-card major">
+                        <div class="metric-number">{defect_data['major_count']}</div>
+                        <div class="metric-label">⚠️ Major Defects</div>
+                        <div class="metric-limit">Limit: {defect_data['aql_limits']['major']}</div>
+                    </div>
+                    <div class="metric-card minor">
+                        <div class="metric-number">{defect_data['minor_count']}</div>
+                        <div class="metric-label">ℹ️ Minor Defects</div>
+                        <div class="metric-limit">Limit: {defect_data['aql_limits']['minor']}</div>
+                    </div>
+                </div>
+                
+                <div class="defects-section">
+    """
+    
+    # Critical Defects Section
+    html_content += """
+                    <div class="section-title">
+                        <span class="icon">🚨</span>
+                        Critical Defects
+                    </div>
+                    <div class="defect-list">
+    """
+    
+    if defects['critical_defects']:
+        for i, defect in enumerate(defects['critical_defects'], 1):
+            html_content += f"""
+                        <div class="defect-item critical">
+                            <span class="defect-number">{i}.</span>
+                            <span>{defect}</span>
+                        </div>
+            """
+    else:
+        html_content += '<div class="no-defects">✅ No critical defects found</div>'
+    
+    html_content += "</div>"
+    
+    # Major Defects Section
+    html_content += """
+                    <div class="section-title">
+                        <span class="icon">⚠️</span>
+                        Major Defects
+                    </div>
+                    <div class="defect-list">
+    """
+    
+    if defects['major_defects']:
+        for i, defect in enumerate(defects['major_defects'], 1):
+            html_content += f"""
+                        <div class="defect-item major">
+                            <span class="defect-number">{i}.</span>
+                            <span>{defect}</span>
+                        </div>
+            """
+    else:
+        html_content += '<div class="no-defects">✅ No major defects found</div>'
+    
+    html_content += "</div>"
+    
+    # Minor Defects Section
+    html_content += """
+                    <div class="section-title">
+                        <span class="icon">ℹ️</span>
+                        Minor Defects
+                    </div>
+                    <div class="defect-list">
+    """
+    
+    if defects['minor_defects']:
+        for i, defect in enumerate(defects['minor_defects'], 1):
+            html_content += f"""
+                        <div class="defect-item minor">
+                            <span class="defect-number">{i}.</span>
+                            <span>{defect}</span>
+                        </div>
+            """
+    else:
+        html_content += '<div class="no-defects">✅ No minor defects found</div>'
+    
+    html_content += "</div>"
+    
+    # Defect Location Heatmaps Section (all inspections of this style so far)
+    if heatmaps:
+        html_content += f"""
+                    <div class="section-title">
+                        <span class="icon">🗺️</span>
+                        Defect Locations - Style {style_number}
+                    </div>
+                    <div class="defect-list" style="display: flex; flex-wrap: wrap; gap: 15px;">
+        """
+        for figure in heatmaps:
+            spots = ", ".join(f"{spot['region']} {spot['share']:.0%}" for spot in figure['hotspots']) or "no hotspots"
+            html_content += f"""
+                        <figure style="margin: 0; width: 240px;">
+                            <img src="data:image/png;base64,{base64.b64encode(figure['png']).decode()}" style="width: 100%; border-radius: 6px;">
+                            <figcaption style="font-size: 0.85rem; color: #6c757d;">
+                                <strong>{figure['angle']}</strong> - {figure['views']} views<br>{spots}
+                            </figcaption>
+                        </figure>
+            """
+        html_content += "</div>"
+    
+    html_content += f"""
+                </div>
+            </div>
+            
+            <div class="footer">
+                <div class="logo">🤖 AI Footwear Quality Control Inspector</div>
+                <div class="generated-info">
+                    Report generated on {inspection_data['inspection_date']} using OpenAI GPT-4 Vision API<br>
+                    Powered by advanced computer vision and professional QC expertise
+                </div>
+            </div>
+        </div>
+    </body>
+    </html>
+    """
+    
+    return html_content
+
+# Enhanced Text Report Generation
+def generate_styled_text_report(export_report, po_number, style_number):
+    """Generate a styled text report with better formatting and emojis"""
+    
+    inspection_data = export_report['inspection_summary']
+    defect_data = export_report['defect_summary']
+    defects = export_report['defect_details']
+    
+    # Create styled separator lines
+    main_separator = "═" * 70
+    sub_separator = "─" * 70
+    section_separator = "•" * 70
+    
+    # Result styling
+    result_symbols = {
+        "ACCEPT": "✅ ACCEPTED",
+        "REWORK": "🔄 REQUIRES REWORK", 
+        "REJECT": "❌ REJECTED"
+    }
+    
+    result_display = result_symbols.get(inspection_data['final_result'], inspection_data['final_result'])
+    
+    text_report = f"""
+{main_separator}
+🔍 FOOTWEAR QUALITY CONTROL INSPECTION REPORT
+{main_separator}
+
+📋 ORDER INFORMATION
+{sub_separator}
+📦 PO Number          : {inspection_data['po_number']}
+👟 Style Number       : {inspection_data['style_number']}
+🎨 Color Code         : {inspection_data['color']}
+🏢 Customer           : {inspection_data['customer']}
+👨‍🔬 Inspector          : {inspection_data['inspector']}
+📅 Inspection Date    : {inspection_data['inspection_date']}
+⚡ Standard Applied   : AQL 2.5 International Standard
+
+{section_separator}
+
+🎯 FINAL INSPECTION RESULT
+{sub_separator}
+{result_display}
+
+📝 DECISION RATIONALE:
+{export_report['decision_rationale']}
+
+{section_separator}
+
+📊 DEFECT SUMMARY (AQL 2.5 COMPLIANCE)
+{sub_separator}
+🚨 Critical Defects   : {defect_data['critical_count']:>3} / {defect_data['aql_limits']['critical']:>3} (Limit)
+⚠️  Major Defects      : {defect_data['major_count']:>3} / {defect_data['aql_limits']['major']:>3} (Limit)
+ℹ️  Minor Defects      : {defect_data['minor_count']:>3} / {defect_data['aql_limits']['minor']:>3} (Limit)
+
+{section_separator}
+
+🚨 CRITICAL DEFECTS (Zero Tolerance)
+{sub_separator}"""
+
+    if defects['critical_defects']:
+        for i, defect in enumerate(defects['critical_defects'], 1):
+            text_report += f"\n❗ {i:2d}. {defect}"
+    else:
+        text_report += "\n✅ No critical defects identified"
+
+    text_report += f"""
+
+{section_separator}
+
+⚠️ MAJOR DEFECTS (Customer Impact)
+{sub_separator}"""
+
+    if defects['major_defects']:
+        for i, defect in enumerate(defects['major_defects'], 1):
+            text_report += f"\n🔶 {i:2d}. {defect}"
+    else:
+        text_report += "\n✅ No major defects identified"
+
+    text_report += f"""
+
+{section_separator}
+
+ℹ️ MINOR DEFECTS (Cosmetic Issues)
+{sub_separator}"""
+
+    if defects['minor_defects']:
+        for i, defect in enumerate(defects['minor_defects'], 1):
+            text_report += f"\n🔸 {i:2d}. {defect}"
+    else:
+        text_report += "\n✅ No minor defects identified"
+
+    text_report += f"""
+
+{main_separator}
+
+🏭 QUALITY ASSURANCE CERTIFICATION
+{sub_separator}
+This inspection has been conducted in accordance with:
+• AQL 2.5 International Quality Standard (ISO 2859-1)
+• Professional footwear manufacturing guidelines  
+• Customer-specific quality requirements
+• Industry best practices for retail footwear
+
+🤖 TECHNOLOGY DETAILS
+{sub_separator}
+• Analysis Engine    : OpenAI GPT-4 Vision API
+• Computer Vision    : Advanced image recognition
+• QC Expertise       : 15+ years professional knowledge base
+• Processing Time    : Real-time analysis
+• Accuracy Level     : Professional grade inspection
+
+📊 REPORT METADATA
+{sub_separator}
+• Report Generated   : {inspection_data['inspection_date']}
+• Document Version   : AI-QC-v2.0
+• File Format        : Professional Quality Report
+• Certification      : AI-Powered Quality Control System
+
+{main_separator}
+🎯 End of Report - AI Footwear Quality Control Inspector
+    Transforming Manufacturing QC with Computer Vision
+{main_separator}
+"""
+
+    return text_report
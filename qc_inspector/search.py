@@ -0,0 +1,253 @@
+"""
+Full-text search over stored defect descriptions and inspector notes.
+
+    python -m qc_inspector.search "heel kick" --customer MIA --severity major --since 2026-07-01
+    python -m qc_inspector.search 'rubber* NOT "toe cap"' --by-po
+    python -m qc_inspector.search --sync      # index finished inspections the index has not seen
+
+Every finished inspection is indexed into an SQLite FTS5 table (QC_SEARCH_DB) as it is
+saved: one row per defect string and one per angle's inspection_notes, with customer,
+PO, style, color, angle, severity and inspection date beside the text. Only the text is
+tokenized (porter stemming, so "kicks" finds "kick"); the other columns are plain indexed
+columns of the content table and filter the matches. Queries take FTS5 syntax (phrases
+in quotes, prefix*, AND / OR / NOT), are ranked by bm25 and return highlighted snippets.
+Indexing a job replaces its rows, so re-indexing is harmless.
+"""
+import argparse
+import logging
+import os
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+SEARCH_DB = os.environ.get("QC_SEARCH_DB", ".qc_search.sqlite")
+SEARCH_LIMIT = 50            # Hits per search
+SNIPPET_TOKENS = 12          # Tokens of context per snippet
+SYNC_BATCH = 500             # Jobs per transaction when indexing the job store
+SEVERITIES = ("critical", "major", "minor")
+FILTERS = ("customer", "po_number", "style_number", "color", "angle", "severity")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    job_id TEXT NOT NULL,
+    inspection_date TEXT,
+    customer TEXT,
+    po_number TEXT,
+    style_number TEXT,
+    color TEXT,
+    angle TEXT,
+    severity TEXT,           -- critical / major / minor, NULL for notes
+    kind TEXT NOT NULL,      -- defect / note
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_job ON entries (job_id);
+CREATE INDEX IF NOT EXISTS entries_customer_date ON entries (customer, inspection_date);
+CREATE INDEX IF NOT EXISTS entries_style ON entries (style_number);
+CREATE INDEX IF NOT EXISTS entries_date ON entries (inspection_date);
+CREATE TABLE IF NOT EXISTS indexed_jobs (job_id TEXT PRIMARY KEY, finished_at TEXT);
+CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5(
+    text, content='entries', content_rowid='id', tokenize='porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS entries_ai AFTER INSERT ON entries BEGIN
+    INSERT INTO entries_fts (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS entries_ad AFTER DELETE ON entries BEGIN
+    INSERT INTO entries_fts (entries_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+"""
+
+class InvalidQuery(ValueError):
+    """A query SQLite cannot run, even reduced to its quoted words"""
+
+def job_entries(job):
+    """(angle, severity, kind, text) of every defect string and inspection note of a finished job"""
+    for angle_name, analysis in zip(job["angle_names"], job["analyses"]):
+        analysis = analysis or {}
+        for severity in SEVERITIES:
+            for description in analysis.get(f"{severity}_defects") or []:
+                yield angle_name, severity, "defect", str(description)
+        if analysis.get("inspection_notes"):
+            yield angle_name, None, "note", str(analysis["inspection_notes"])
+
+def fts_query(text):
+    """Every word of a query as a quoted FTS5 term, for input that is not valid FTS5 syntax (e.g. toe-cap)"""
+    words = text.replace('"', " ").split()
+    return " ".join(f'"{word}"' for word in words)
+
+class SearchIndex:
+    """SQLite FTS5 index of defect strings and notes; one short-lived connection per call"""
+
+    def __init__(self, path=SEARCH_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._ready = False
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.row_factory = sqlite3.Row
+        if not self._ready:
+            with self._lock:
+                # WAL lets searches read while another process indexes
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.executescript(SCHEMA)
+                self._ready = True
+        return connection
+
+    @staticmethod
+    def _index(connection, job):
+        order_info = job["order_info"]
+        keys = (job["job_id"], order_info["inspection_date"], order_info.get("customer") or "",
+                order_info["po_number"], order_info["style_number"], order_info["color"])
+        rows = [keys + entry for entry in job_entries(job)]
+        connection.execute("DELETE FROM entries WHERE job_id = ?", (job["job_id"],))
+        connection.executemany(
+            "INSERT INTO entries (job_id, inspection_date, customer, po_number, style_number, color, "
+            "angle, severity, kind, text) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        connection.execute("INSERT OR REPLACE INTO indexed_jobs VALUES (?, ?)", (job["job_id"], job.get("finished_at")))
+        return len(rows)
+
+    def index_job(self, job):
+        """Replace the rows of a finished job; returns the number of rows indexed"""
+        connection = self._connect()
+        try:
+            with connection:
+                return self._index(connection, job)
+        finally:
+            connection.close()
+
+    def indexed_jobs(self):
+        connection = self._connect()
+        try:
+            return {row["job_id"] for row in connection.execute("SELECT job_id FROM indexed_jobs")}
+        finally:
+            connection.close()
+
+    def sync(self, store, batch=SYNC_BATCH):
+        """Index the finished jobs of a JobStore that are not indexed yet; returns their count"""
+        indexed = self.indexed_jobs()
+        count = 0
+        connection = self._connect()
+        try:
+            for job in store.iter_jobs("done"):
+                if job["job_id"] in indexed:
+                    continue
+                self._index(connection, job)
+                count += 1
+                if count % batch == 0:
+                    connection.commit()
+            connection.commit()
+        finally:
+            connection.close()
+        if count:
+            logger.info("Search index: %d inspections added", count)
+        return count
+
+    def _select(self, columns, query, filters, since, until, tail, params):
+        """Rows of a full-text query under exact-match filters and an inclusive date range"""
+        if not query or not query.strip():
+            return []
+        where = [f"e.{column} = ?" for column in FILTERS if filters.get(column)]
+        values = [filters[column] for column in FILTERS if filters.get(column)]
+        if since:
+            where.append("e.inspection_date >= ?")
+            values.append(since)
+        if until:
+            where.append("e.inspection_date <= ?")
+            values.append(until)
+        sql = (f"SELECT {columns} FROM entries_fts JOIN entries e ON e.id = entries_fts.rowid "
+               "WHERE entries_fts MATCH ?" + "".join(f" AND {clause}" for clause in where) + f" {tail}")
+        connection = self._connect()
+        try:
+            try:
+                rows = connection.execute(sql, params[0] + [query] + values + params[1]).fetchall()
+            except sqlite3.OperationalError:
+                # Not valid FTS5 syntax (stray quote, hyphen, colon): search the words instead
+                words = fts_query(query)
+                if not words:
+                    return []
+                try:
+                    rows = connection.execute(sql, params[0] + [words] + values + params[1]).fetchall()
+                except sqlite3.OperationalError as e:
+                    raise InvalidQuery(f"Cannot search for {query!r}: {e}") from e
+            return [dict(row) for row in rows]
+        finally:
+            connection.close()
+
+    def search(self, query, since=None, until=None, limit=SEARCH_LIMIT, highlight=("[", "]"), **filters):
+        """
+        Best matches first: [{"job_id", "inspection_date", "customer", "po_number", "style_number",
+        "color", "angle", "severity", "kind", "text", "snippet", "score"}]. filters are exact
+        matches on FILTERS columns; since / until are inclusive YYYY-MM-DD inspection dates.
+        """
+        return self._select(
+            "e.job_id, e.inspection_date, e.customer, e.po_number, e.style_number, e.color, e.angle, e.severity, "
+            "e.kind, e.text, snippet(entries_fts, 0, ?, ?, '…', ?) AS snippet, bm25(entries_fts) AS score",
+            query, filters, since, until, "ORDER BY score LIMIT ?",
+            ([highlight[0], highlight[1], SNIPPET_TOKENS], [limit]))
+
+    def search_pos(self, query, since=None, until=None, limit=SEARCH_LIMIT, **filters):
+        """
+        POs with matches, most first: [{"po_number", "customer", "style_number", "color", "hits",
+        "inspections", "first_date", "last_date"}]
+        """
+        return self._select(
+            "e.po_number, e.customer, e.style_number, e.color, COUNT(*) AS hits, "
+            "COUNT(DISTINCT e.job_id) AS inspections, MIN(e.inspection_date) AS first_date, "
+            "MAX(e.inspection_date) AS last_date",
+            query, filters, since, until,
+            "GROUP BY e.po_number, e.customer, e.style_number, e.color ORDER BY hits DESC LIMIT ?",
+            ([], [limit]))
+
+def main():
+    from .jobs import JobStore
+
+    parser = argparse.ArgumentParser(description="Full-text search over defect descriptions and inspector notes")
+    parser.add_argument("query", nargs="?", help='FTS5 query, e.g. "heel kick" or rubber* OR wire')
+    parser.add_argument("--customer")
+    parser.add_argument("--po", dest="po_number")
+    parser.add_argument("--style", dest="style_number")
+    parser.add_argument("--color")
+    parser.add_argument("--severity", choices=SEVERITIES)
+    parser.add_argument("--since", help="Inspections dated on or after YYYY-MM-DD")
+    parser.add_argument("--until", help="Inspections dated on or before YYYY-MM-DD")
+    parser.add_argument("--limit", type=int, default=SEARCH_LIMIT)
+    parser.add_argument("--by-po", action="store_true", help="One line per PO with its number of hits")
+    parser.add_argument("--sync", action="store_true", help="Index finished inspections not indexed yet")
+    parser.add_argument("--jobs-dir", default=None, help="Job store directory (default QC_JOBS_DIR)")
+    args = parser.parse_args()
+    if not args.query and not args.sync:
+        parser.error("Give a query and/or --sync")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    index = SearchIndex()
+    if args.sync:
+        store = JobStore(args.jobs_dir) if args.jobs_dir else JobStore()
+        print(f"{index.sync(store)} inspections indexed")
+    if not args.query:
+        return
+
+    filters = {"customer": args.customer, "po_number": args.po_number, "style_number": args.style_number,
+               "color": args.color, "severity": args.severity}
+    try:
+        results = (index.search_pos if args.by_po else index.search)(args.query, args.since, args.until, args.limit,
+                                                                      **filters)
+    except InvalidQuery as e:
+        parser.error(str(e))
+    if args.by_po:
+        groups = results
+        for group in groups:
+            print(f"PO {group['po_number']:<12} {group['customer']:<10} {group['style_number']}/{group['color']:<8} "
+                  f"{group['hits']:>5} hits in {group['inspections']} inspections  "
+                  f"{group['first_date']} .. {group['last_date']}")
+        print(f"{len(groups)} POs" + (" (limit reached)" if len(groups) == args.limit else ""))
+        return
+    hits = results
+    for hit in hits:
+        print(f"{hit['inspection_date']}  PO {hit['po_number']}  {hit['customer']}  {hit['style_number']}/"
+              f"{hit['color']}  {hit['angle']}  {hit['severity'] or 'note'}: {hit['snippet']}")
+    print(f"{len(hits)} hits" + (" (limit reached)" if len(hits) == args.limit else ""))
+
+if __name__ == "__main__":
+    main()
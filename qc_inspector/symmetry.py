@@ -0,0 +1,170 @@
+"""
+Local left/right symmetry check of the two side views.
+
+Each view is analysed by the model on its own, so it never sees the Left Side View and the
+Right Side View together. This stage compares them locally (NumPy, a few milliseconds):
+the shoe silhouette of each view is segmented against the backdrop, the right view is
+mirrored, both are oriented toe first (the collar at the heel end stands higher than the
+toe box) and registered by scaling to the same length and levelling on the ground line
+through the forefoot and heel contact points (the lower hull edge the shoe rests on).
+From the top and bottom contours it measures
+
+    heel pitch    rise of the sole from the ball contact to the heel breast, in degrees
+    toe spring    rise of the toe tip over the ball of the last, in degrees
+    waist         mean deviation of the contours through the waist, in % of shoe length
+    silhouette    overlap (IoU) of the two registered silhouettes
+
+and differences beyond tolerance become major defects of the side views, in the existing
+categories (heel counter, midfoot profile, toe lasting, misalignment).
+"""
+import time
+
+import numpy as np
+
+from .codes import expand_defect
+from .imaging import binary_close, connected_components, foreground_mask, rgb_to_lab, to_rgb_array
+
+SIDE_VIEWS = ("Left Side View", "Right Side View")
+SYMMETRY_SIDE = 384          # Long side of the working resolution
+CLOSE_WINDOW = 5             # Closing window (working pixels) bridging laces and shiny patches
+PROFILE_POINTS = 200         # Contour samples along the shoe length
+BALL_POSITION = 0.27         # Ball of the last, in shoe lengths from the toe tip
+TOE_INSET = 0.02             # Where the toe tip height is read, in shoe lengths from the extreme point
+GROUND_TOLERANCE = 0.005     # Sole heights (shoe lengths) that still count as touching the ground
+WAIST_RANGE = (0.35, 0.65)
+HEEL_PITCH_TOLERANCE = 2.0   # Degrees
+TOE_SPRING_TOLERANCE = 3.0   # Degrees
+WAIST_TOLERANCE = 1.5        # % of shoe length
+SILHOUETTE_TOLERANCE = 0.93  # Min IoU of the registered silhouettes
+
+def side_silhouette(image):
+    """Boolean mask of the largest foreground component of a side view, or None if there is none"""
+    rgb = to_rgb_array(image, max_side=SYMMETRY_SIDE)
+    mask = binary_close(foreground_mask(rgb_to_lab(rgb)), CLOSE_WINDOW)
+    labels, count = connected_components(mask)
+    if not count:
+        return None
+    return labels == np.bincount(labels[labels >= 0]).argmax()
+
+def side_profile(mask):
+    """
+    (top, bottom) contour heights of a silhouette at PROFILE_POINTS positions, toe first,
+    in shoe lengths above the ground line through the ball and heel contact points
+    """
+    rows, cols = np.nonzero(mask.any(axis=1))[0], np.nonzero(mask.any(axis=0))[0]
+    crop = mask[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1]
+    height, length = crop.shape
+    # Image rows grow downward: heights are measured up from the lowest silhouette row
+    top = height - crop.argmax(axis=0)
+    bottom = crop[::-1].argmax(axis=0)
+    x = np.linspace(0.5, length - 0.5, PROFILE_POINTS)
+    top = np.interp(x, np.arange(length), top) / length
+    bottom = np.interp(x, np.arange(length), bottom) / length
+
+    # Toe first: the collar at the heel end stands higher than the toe box
+    quarter = PROFILE_POINTS // 4
+    if top[:quarter].mean() > top[-quarter:].mean():
+        top, bottom = top[::-1], bottom[::-1]
+
+    # Level on the line the shoe rests on (camera roll): the lower hull edge under the midpoint
+    position = np.linspace(0.0, 1.0, PROFILE_POINTS)
+    ball, heel = _ground_contacts(position, bottom)
+    slope = (bottom[heel] - bottom[ball]) / max(position[heel] - position[ball], 1e-6)
+    ground = bottom[ball] + slope * (position - position[ball])
+    return top - ground, bottom - ground, ball, heel
+
+def _ground_contacts(position, bottom):
+    """Indices of the forefoot and heel contact points: the lower convex hull edge spanning the middle"""
+    hull = []
+    for i in range(len(position)):
+        while len(hull) >= 2:
+            a, b = hull[-2], hull[-1]
+            cross = ((position[b] - position[a]) * (bottom[i] - bottom[a])
+                     - (bottom[b] - bottom[a]) * (position[i] - position[a]))
+            if cross > 0:
+                break
+            hull.pop()
+        hull.append(i)
+    for a, b in zip(hull, hull[1:]):
+        if position[b] >= 0.5:
+            return a, b
+    return hull[0], hull[-1]
+
+def profile_metrics(top, bottom, ball, heel):
+    """Heel pitch and toe spring of one side view, in degrees"""
+    position = np.linspace(0.0, 1.0, PROFILE_POINTS)
+    # Heel breast: the highest point of the sole between the ball and the heel contact
+    breast = ball + int(np.argmax(bottom[ball:heel + 1]))
+    # A flat forefoot touches the ground over a stretch: the shank rises from its rear end
+    grounded = np.nonzero(bottom[:breast + 1] <= GROUND_TOLERANCE)[0]
+    rear = grounded[-1] if len(grounded) else ball
+    heel_pitch = np.degrees(np.arctan2(max(bottom[breast], 0.0), max(position[breast] - position[rear], 1e-6)))
+    # Toe spring pivots on the ball of the last, which sits at a fixed share of the length; the
+    # tip is read just behind the extreme column, which a slight camera roll turns into a corner
+    tip = int(TOE_INSET * (PROFILE_POINTS - 1))
+    toe_spring = np.degrees(np.arctan2(max(bottom[tip], 0.0), BALL_POSITION - position[tip]))
+    return {"heel_pitch_deg": round(float(heel_pitch), 2), "toe_spring_deg": round(float(toe_spring), 2)}
+
+def silhouette_iou(a, b):
+    """IoU of two registered silhouettes given as (top, bottom) contours"""
+    overlap = np.clip(np.minimum(a[0], b[0]) - np.maximum(a[1], b[1]), 0, None)
+    union = (a[0] - a[1]) + (b[0] - b[1]) - overlap
+    return float(overlap.sum() / max(union.sum(), 1e-9))
+
+def compare_side_views(left_image, right_image):
+    """Asymmetry metrics of the two side views; None if a shoe cannot be found in either"""
+    started = time.perf_counter()
+    left_mask, right_mask = side_silhouette(left_image), side_silhouette(right_image)
+    if left_mask is None or right_mask is None:
+        return None
+    left = side_profile(left_mask)
+    right = side_profile(right_mask[:, ::-1])   # Mirrored, so both views face the same way
+
+    position = np.linspace(0.0, 1.0, PROFILE_POINTS)
+    waist = (position >= WAIST_RANGE[0]) & (position <= WAIST_RANGE[1])
+    left_metrics, right_metrics = profile_metrics(*left), profile_metrics(*right)
+    heel_pitch_diff = abs(left_metrics["heel_pitch_deg"] - right_metrics["heel_pitch_deg"])
+    toe_spring_diff = abs(left_metrics["toe_spring_deg"] - right_metrics["toe_spring_deg"])
+    waist_deviation = 100 * float(np.mean(np.abs(left[0][waist] - right[0][waist])
+                                          + np.abs(left[1][waist] - right[1][waist])) / 2)
+    iou = silhouette_iou(left[:2], right[:2])
+
+    findings = []
+    if heel_pitch_diff > HEEL_PITCH_TOLERANCE:
+        findings.append(("HCD", "HEL", f"left/right heel pitch differs by {heel_pitch_diff:.1f}°"))
+    if waist_deviation > WAIST_TOLERANCE:
+        findings.append(("MFI", "WST", f"left/right waist profile deviates by {waist_deviation:.1f}% of length"))
+    if toe_spring_diff > TOE_SPRING_TOLERANCE:
+        findings.append(("LST", "TOE", f"left/right toe spring differs by {toe_spring_diff:.1f}°"))
+    if iou < SILHOUETTE_TOLERANCE:
+        findings.append(("MIS", "ALL", f"left/right silhouettes overlap only {iou:.0%}"))
+
+    return {
+        "within_tolerance": not findings,
+        "left": left_metrics,
+        "right": right_metrics,
+        "heel_pitch_diff_deg": round(heel_pitch_diff, 2),
+        "toe_spring_diff_deg": round(toe_spring_diff, 2),
+        "waist_deviation_pct": round(waist_deviation, 2),
+        "silhouette_iou": round(iou, 3),
+        "defects": [expand_defect(code, location, note) for code, location, note in findings],
+        "coded_defects": [{"severity": "major", "code": code, "location": location, "note": note}
+                          for code, location, note in findings],
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)
+    }
+
+def add_symmetry_evidence(analysis, comparison):
+    """Attach the comparison to a side view analysis and report its findings as major defects"""
+    # A carried-forward analysis may hold the evidence of an earlier comparison
+    previous = analysis.get("symmetry") or {}
+    analysis["major_defects"] = [d for d in analysis.get("major_defects") or [] if d not in previous.get("defects", [])]
+    if "coded_defects" in analysis:
+        analysis["coded_defects"] = [d for d in analysis["coded_defects"] if d not in previous.get("coded_defects", [])]
+
+    analysis["symmetry"] = comparison
+    if comparison["defects"]:
+        analysis["major_defects"].extend(comparison["defects"])
+        if "coded_defects" in analysis:
+            analysis["coded_defects"].extend(comparison["coded_defects"])
+        analysis["overall_condition"] = "Poor"
+    return analysis
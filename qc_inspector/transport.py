@@ -0,0 +1,134 @@
+"""
+Record/replay HTTP transport under the OpenAI client.
+
+    QC_TRANSPORT_MODE=record QC_CASSETTE=cassettes/line3.jsonl streamlit run app.py
+    QC_TRANSPORT_MODE=replay QC_CASSETTE=cassettes/line3.jsonl QC_REPLAY_SPEED=10 streamlit run app.py
+
+live    requests go straight to the API (default)
+record  requests go to the API and every response is appended to the cassette
+replay  responses are served from the cassette, nothing leaves the machine
+
+Requests are matched by a fingerprint of method, path and the canonical JSON body
+(model, prompt, image bytes, options), never by headers, so API keys do not matter
+in replay and are never written to a cassette. Replay waits the recorded latency
+divided by QC_REPLAY_SPEED (0 = no wait), or a fixed QC_REPLAY_LATENCY in seconds.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+
+import httpx
+
+TRANSPORT_MODE = os.environ.get("QC_TRANSPORT_MODE", "live")
+CASSETTE_PATH = os.environ.get("QC_CASSETTE", "cassette.jsonl")
+REPLAY_SPEED = float(os.environ.get("QC_REPLAY_SPEED", "1"))
+REPLAY_LATENCY = os.environ.get("QC_REPLAY_LATENCY")  # seconds; overrides the recorded latency
+
+# Response headers worth keeping; the body is stored decoded, so no encoding/length headers
+KEPT_HEADERS = ("content-type", "x-request-id", "openai-model", "openai-processing-ms")
+
+def request_fingerprint(request):
+    """Stable hash of what determines the response: method, path and canonical JSON body"""
+    body = request.read()
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True, separators=(",", ":")).encode()
+    except (ValueError, UnicodeDecodeError):
+        pass
+    digest = hashlib.sha256()
+    digest.update(request.method.encode())
+    digest.update(request.url.raw_path)
+    digest.update(body)
+    return digest.hexdigest()
+
+class CassetteTransport(httpx.BaseTransport):
+    """httpx transport that records responses to, or replays them from, a JSONL cassette"""
+
+    def __init__(self, mode, cassette_path, inner=None, replay_speed=REPLAY_SPEED, replay_latency=REPLAY_LATENCY):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown transport mode {mode!r}")
+        self.mode = mode
+        self.cassette_path = cassette_path
+        self.inner = inner or httpx.HTTPTransport()
+        self.replay_speed = replay_speed
+        self.replay_latency = None if replay_latency is None else float(replay_latency)
+        self._lock = threading.Lock()
+        self._entries = defaultdict(list)   # fingerprint -> recorded responses, in recording order
+        self._served = defaultdict(int)     # fingerprint -> responses served so far
+        if mode == "replay":
+            self._load()
+
+    def _load(self):
+        with open(self.cassette_path) as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._entries[entry["fingerprint"]].append(entry)
+
+    def handle_request(self, request):
+        fingerprint = request_fingerprint(request)
+        if self.mode == "replay":
+            return self._replay(request, fingerprint)
+        return self._record(request, fingerprint)
+
+    def _record(self, request, fingerprint):
+        started = time.monotonic()
+        response = self.inner.handle_request(request)
+        try:
+            content = response.read()
+        finally:
+            response.close()
+        latency = time.monotonic() - started
+
+        headers = {k: v for k, v in response.headers.items() if k.lower() in KEPT_HEADERS}
+        entry = {
+            "fingerprint": fingerprint,
+            "method": request.method,
+            "path": request.url.path,
+            "status": response.status_code,
+            "headers": headers,
+            "body": content.decode("utf-8", errors="replace"),
+            "latency": round(latency, 4),
+            "recorded_at": datetime.now().isoformat(timespec="seconds")
+        }
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.cassette_path)), exist_ok=True)
+            with open(self.cassette_path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+        return httpx.Response(response.status_code, headers=headers, content=content, request=request)
+
+    def _replay(self, request, fingerprint):
+        with self._lock:
+            entries = self._entries.get(fingerprint)
+            if not entries:
+                entry = None
+            else:
+                # Repeated identical requests get their responses in recorded order, then the last one
+                entry = entries[min(self._served[fingerprint], len(entries) - 1)]
+                self._served[fingerprint] += 1
+
+        if entry is None:
+            # 404 is not retried by the OpenAI client, so a miss fails once and clearly
+            return httpx.Response(404, request=request, json={"error": {
+                "message": f"No cassette entry for {request.method} {request.url.path} ({fingerprint[:12]})",
+                "type": "cassette_miss"
+            }})
+
+        if self.replay_latency is not None:
+            time.sleep(self.replay_latency)
+        elif self.replay_speed > 0:
+            time.sleep(entry["latency"] / self.replay_speed)
+        return httpx.Response(entry["status"], headers=entry["headers"], content=entry["body"].encode(),
+                              request=request)
+
+    def close(self):
+        self.inner.close()
+
+def make_transport(limits=None, mode=TRANSPORT_MODE, cassette_path=CASSETTE_PATH):
+    """Transport for the configured mode, or None for live (httpx's default pooled transport)"""
+    if mode == "live":
+        return None
+    return CassetteTransport(mode, cassette_path, inner=httpx.HTTPTransport(limits=limits or httpx.Limits()))
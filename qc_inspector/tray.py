@@ -0,0 +1,115 @@
+"""
+Multi-shoe tray photos: local segmentation into one crop per shoe.
+
+Stations that photograph a whole tray of shoes from one angle upload a single photo.
+segment_tray finds each shoe against the tray backdrop (Lab background subtraction,
+then connected components, all NumPy on a downscaled copy) and crops it from the
+full-resolution photo. Shoes are numbered in reading order (row by row, left to right)
+and consecutive shoes form a pair, left shoe first, so a tray is laid out as
+
+    P1-L  P1-R  P2-L  P2-R
+    P3-L  P3-R  P4-L  P4-R
+
+Each crop becomes its own view of the inspection, named e.g. "Top View - Pair 2 Right".
+"""
+import io
+import logging
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from .imaging import binary_close, connected_components, foreground_mask, rgb_to_lab, to_rgb_array
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_SIDE = 512           # Long side of the working resolution for segmentation
+MAX_SHOES = 8                # Largest components kept per tray
+MIN_SHOE_AREA = 0.01         # Components smaller than this fraction of the photo are specks, not shoes
+BACKDROP_THRESHOLD = 14.0    # Delta E from the tray colour that counts as shoe
+CLOSE_WINDOW = 7             # Closing window (working pixels) bridging laces, seams and shiny patches
+CROP_PADDING = 0.04          # Extra margin around each shoe (fraction of its box size)
+SIDES = ("Left", "Right")
+
+def reading_order(boxes):
+    """Indices of boxes (left, top, right, bottom) row by row, left to right"""
+    if not boxes:
+        return []
+    centers = [((b[0] + b[2]) / 2, (b[1] + b[3]) / 2) for b in boxes]
+    row_gap = np.median([b[3] - b[1] for b in boxes]) / 2
+    order = sorted(range(len(boxes)), key=lambda i: centers[i][1])
+    rows = [[order[0]]]
+    for idx in order[1:]:
+        row_center = np.mean([centers[i][1] for i in rows[-1]])
+        if centers[idx][1] - row_center > row_gap:
+            rows.append([])
+        rows[-1].append(idx)
+    return [idx for row in rows for idx in sorted(row, key=lambda i: centers[i][0])]
+
+def segment_tray(image, max_shoes=MAX_SHOES, min_area=MIN_SHOE_AREA):
+    """
+    Shoes on a tray photo, in reading order:
+    [{"box": (left, top, right, bottom) in photo pixels, "pair": 1.., "side": "Left"/"Right", "area": fraction}]
+    """
+    rgb = to_rgb_array(image, max_side=SEGMENT_SIDE)
+    height, width = rgb.shape[:2]
+    mask = binary_close(foreground_mask(rgb_to_lab(rgb), BACKDROP_THRESHOLD), CLOSE_WINDOW)
+    labels, count = connected_components(mask)
+    if not count:
+        return []
+
+    # Component areas and bounding boxes in one pass each
+    flat = labels.ravel()
+    shoe = flat >= 0
+    ids = flat[shoe]
+    rows, cols = np.divmod(np.nonzero(shoe)[0], width)
+    areas = np.bincount(ids, minlength=count) / (height * width)
+    top = np.full(count, height); np.minimum.at(top, ids, rows)
+    bottom = np.zeros(count, dtype=int); np.maximum.at(bottom, ids, rows)
+    left = np.full(count, width); np.minimum.at(left, ids, cols)
+    right = np.zeros(count, dtype=int); np.maximum.at(right, ids, cols)
+
+    kept = [int(i) for i in np.argsort(-areas)[:max_shoes] if areas[i] >= min_area]
+    if len(kept) < np.count_nonzero(areas >= min_area):
+        logger.warning("Tray photo has more than %d shoe-sized regions; keeping the largest", max_shoes)
+
+    scale_x, scale_y = image.width / width, image.height / height
+    boxes = []
+    for i in kept:
+        pad_x = (right[i] - left[i] + 1) * CROP_PADDING
+        pad_y = (bottom[i] - top[i] + 1) * CROP_PADDING
+        boxes.append((
+            max(0, int((left[i] - pad_x) * scale_x)),
+            max(0, int((top[i] - pad_y) * scale_y)),
+            min(image.width, int(np.ceil((right[i] + 1 + pad_x) * scale_x))),
+            min(image.height, int(np.ceil((bottom[i] + 1 + pad_y) * scale_y))),
+        ))
+    areas = [float(areas[i]) for i in kept]
+
+    return [{"box": boxes[i], "pair": n // 2 + 1, "side": SIDES[n % 2], "area": round(areas[i], 4)}
+            for n, i in enumerate(reading_order(boxes))]
+
+def shoe_view_name(angle_name, shoe):
+    return f"{angle_name} - Pair {shoe['pair']} {shoe['side']}"
+
+def tray_views(data, angle_name):
+    """
+    [(JPEG bytes, view name)] for each shoe on a tray photo (raw upload bytes).
+    A photo where no shoe stands out from the backdrop is kept whole as one view.
+    """
+    image = ImageOps.exif_transpose(Image.open(io.BytesIO(data))).convert("RGB")
+    shoes = segment_tray(image)
+    if not shoes:
+        logger.warning("No shoes found on the %s tray photo; inspecting it as a single view", angle_name)
+        return [(data, angle_name)]
+
+    views = []
+    for shoe in shoes:
+        buffer = io.BytesIO()
+        image.crop(shoe["box"]).save(buffer, format="JPEG", quality=95)
+        views.append((buffer.getvalue(), shoe_view_name(angle_name, shoe)))
+    return views
+
+def split_trays(images, angle_names):
+    """(crops, view names) of tray photos taken from the given angles, ready for the inspection queue"""
+    views = [view for data, angle_name in zip(images, angle_names) for view in tray_views(data, angle_name)]
+    return [data for data, _ in views], [name for _, name in views]
@@ -0,0 +1,198 @@
+"""
+Turntable video input: the sharpest, best-exposed frame per view.
+
+A short video of the shoe turning on a turntable replaces the four horizontal stills.
+Frames are decoded one at a time (ffmpeg pipe when ffmpeg is installed, else Pillow for
+animated GIF/WebP/APNG), scored on a small copy for sharpness (variance of the Laplacian)
+and exposure (clipped pixels, distance from mid-grey), and mapped to a rotation position.
+One revolution is detected by the frame returning to the first frame's appearance
+(or the whole clip if it never does). The best frame in a window around each view's
+position is then decoded at full resolution; only those keyframes are inspected.
+
+Convention: the clip starts with the toe facing the camera (Front View). With a
+clockwise turntable (seen from above) the right side comes a quarter turn later.
+"""
+import io
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+
+import numpy as np
+from PIL import Image, ImageSequence
+
+from .imaging import to_gray, to_rgb_array
+
+logger = logging.getLogger(__name__)
+
+FFMPEG = os.environ.get("QC_FFMPEG") or shutil.which("ffmpeg")
+SCORE_SIDE = 256             # Long side of the frames that are scored
+THUMB_SIDE = 24              # Long side of the thumbnails used to find the revolution
+POSITION_WINDOW = 1 / 24     # Frames within +/- 15 degrees of a view's position compete for it
+RETURN_THRESHOLD = 0.35      # A frame this close (relative to the median distance) to frame 0 closes the revolution
+MIN_REVOLUTION = 0.25        # Earliest possible return to the start, as a fraction of the clip
+CLIP_LOW, CLIP_HIGH = 0.02, 0.98
+MID_RANGE = (0.2, 0.8)       # Mean brightness that counts as well exposed
+
+# Rotation position of each view, as a fraction of one clockwise revolution from the front
+TURNTABLE_POSITIONS = {
+    "Front View": 0.0,
+    "Right Side View": 0.25,
+    "Back View": 0.5,
+    "Left Side View": 0.75,
+}
+
+def frame_scores(gray):
+    """(sharpness, exposure) of a grayscale frame in [0, 1]; exposure is 1.0 for ideal, 0.0 for unusable"""
+    laplacian = (gray[:-2, 1:-1] + gray[2:, 1:-1] + gray[1:-1, :-2] + gray[1:-1, 2:] - 4 * gray[1:-1, 1:-1])
+    clipped = np.count_nonzero((gray < CLIP_LOW) | (gray > CLIP_HIGH)) / gray.size
+    # Any mean brightness in the mid range is fine; darker or brighter frames fall off to zero
+    exposure = min(1.0, (0.5 - abs(float(gray.mean()) - 0.5)) / (0.5 - MID_RANGE[0])) * (1.0 - clipped)
+    return float(laplacian.var()), exposure
+
+def _bmp_stream(stream):
+    """Frames of an ffmpeg image2pipe BMP stream, one PIL image at a time"""
+    while True:
+        header = stream.read(14)
+        if len(header) < 14:
+            return
+        size = int.from_bytes(header[2:6], "little")
+        yield Image.open(io.BytesIO(header + stream.read(size - 14)))
+
+def _ffmpeg_frames(path, select=None, max_side=None):
+    command = [FFMPEG, "-v", "error", "-nostdin", "-i", path]
+    filters = []
+    if select is not None:
+        filters.append("select='" + "+".join(f"eq(n\\,{n})" for n in select) + "'")
+    if max_side:
+        filters.append(f"scale='min({max_side},iw)':-2")
+    if filters:
+        command += ["-vf", ",".join(filters)]
+    command += ["-fps_mode", "passthrough", "-f", "image2pipe", "-c:v", "bmp", "-"]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        yield from _bmp_stream(process.stdout)
+    finally:
+        process.stdout.close()
+        process.kill()
+        error = process.stderr.read().decode(errors="replace").strip()
+        process.wait()
+        if error:
+            logger.warning("ffmpeg: %s", error)
+
+def iter_frames(path, select=None, max_side=None):
+    """
+    Decoded frames of a video file, one at a time. select is an ordered collection of frame
+    numbers to decode (None = all); max_side downscales in the decoder when ffmpeg is used.
+    """
+    if FFMPEG:
+        yield from _ffmpeg_frames(path, select, max_side)
+        return
+    with Image.open(path) as clip:
+        for n, frame in enumerate(ImageSequence.Iterator(clip)):
+            if select is None or n in select:
+                yield frame.convert("RGB")
+
+def revolution_length(thumbs):
+    """Frames in one revolution: the first return to the starting appearance, else the whole clip"""
+    count = len(thumbs)
+    distances = np.abs(thumbs - thumbs[0]).mean(axis=(1, 2))
+    start = max(2, int(count * MIN_REVOLUTION))
+    if count <= start:
+        return count
+    threshold = RETURN_THRESHOLD * float(np.median(distances[1:]))
+    returning = np.nonzero(distances[start:] <= threshold)[0]
+    if not len(returning):
+        return count
+    # Closest frame of the first run of returning frames
+    first = start + returning[0]
+    run_end = first
+    while run_end + 1 < count and distances[run_end + 1] <= threshold:
+        run_end += 1
+    return int(first + np.argmin(distances[first:run_end + 1]))
+
+def pick_keyframes(scores, period, positions, clockwise=True):
+    """
+    {view: frame number} of the best-scoring frame near each view's rotation position.
+    Raises ValueError when the clip is too short to give every view a frame of its own.
+    """
+    if len(scores) < len(positions):
+        raise ValueError(f"The turntable video has {len(scores)} frame(s); "
+                         f"at least {len(positions)} are needed, one per view")
+    frames = np.arange(len(scores))
+    rotation = (frames % period) / period
+    if not clockwise:
+        rotation = (1.0 - rotation) % 1.0
+    sharpness = np.array([s for s, _ in scores])
+    exposure = np.array([e for _, e in scores])
+    quality = sharpness / (sharpness.max() or 1.0) * exposure
+
+    picks = {}
+    for view, position in positions.items():
+        offset = np.abs((rotation - position + 0.5) % 1.0 - 0.5)
+        candidates = np.nonzero(offset <= POSITION_WINDOW)[0]
+        if not len(candidates):
+            candidates = [int(np.argmin(offset))]
+        picks[view] = int(max(candidates, key=lambda n: quality[n]))
+    if len(set(picks.values())) < len(picks):
+        raise ValueError("The turntable video is too short to show every view in a frame of its own; "
+                         "record at least one full, steady revolution")
+    return picks
+
+def extract_keyframes(data, positions=TURNTABLE_POSITIONS, clockwise=True):
+    """
+    Keyframes of a turntable clip (raw upload bytes), in the order of positions:
+    [{"angle", "frame", "rotation_deg", "sharpness", "exposure", "image": JPEG bytes}].
+    Views whose frame cannot be decoded at full resolution are left out.
+    """
+    with tempfile.NamedTemporaryFile(suffix=".video") as clip:
+        clip.write(data)
+        clip.flush()
+
+        # Pass 1: score every frame on a small copy, keeping only numbers and thumbnails
+        scores, thumbs = [], []
+        try:
+            for frame in iter_frames(clip.name, max_side=SCORE_SIDE):
+                gray = to_gray(to_rgb_array(frame, max_side=SCORE_SIDE))
+                scores.append(frame_scores(gray))
+                thumbs.append(to_gray(to_rgb_array(frame, size=(THUMB_SIDE, THUMB_SIDE))))
+        except OSError as e:
+            logger.warning("Could not decode the turntable video: %s", e)
+            scores = []
+        if not scores:
+            raise ValueError("No frames could be decoded from the turntable video"
+                             + ("" if FFMPEG else " (install ffmpeg for MP4/MOV/WebM)"))
+
+        period = revolution_length(np.stack(thumbs))
+        picks = pick_keyframes(scores, period, positions, clockwise)
+        logger.info("Turntable clip: %d frames, revolution of %d frames, keyframes %s", len(scores), period, picks)
+
+        # Pass 2: decode only the chosen frames at full resolution. Frames come out in order, so a
+        # truncated or variable-frame-rate clip that ends early yields a prefix of the wanted frames
+        wanted = sorted(set(picks.values()))
+        full = {}
+        try:
+            for n, frame in zip(wanted, iter_frames(clip.name, select=wanted)):
+                full[n] = frame
+        except OSError as e:
+            logger.warning("Could not decode the turntable keyframes: %s", e)
+        if not full:
+            raise ValueError("No keyframes could be decoded from the turntable video")
+
+    keyframes = []
+    for view, n in picks.items():
+        if n not in full:
+            logger.warning("Turntable clip: frame %d for the %s was not decoded; that view is left out", n, view)
+            continue
+        buffer = io.BytesIO()
+        full[n].convert("RGB").save(buffer, format="JPEG", quality=95)
+        keyframes.append({
+            "angle": view,
+            "frame": n,
+            "rotation_deg": round(360.0 * (n % period) / period, 1),
+            "sharpness": round(scores[n][0], 5),
+            "exposure": round(scores[n][1], 3),
+            "image": buffer.getvalue()
+        })
+    return keyframes
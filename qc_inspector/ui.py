@@ -0,0 +1,396 @@
+"""
+Streamlit side of the app: cached per-process resources and the report page.
+
+Imported once per server process, so the cache decorators and render functions
+are set up once; app.py itself only runs the page on every rerun.
+"""
+import io
+import json
+from datetime import datetime
+
+import streamlit as st
+
+@st.cache_resource(max_entries=16)
+def get_openai_client(api_key):
+    """One pooled OpenAI client per API key, shared across sessions"""
+    from .client import OPENAI_BASE_URL, create_openai_client
+    return create_openai_client(api_key, OPENAI_BASE_URL)
+
+@st.cache_resource
+def get_job_queue():
+    """One inspection queue (and worker pool) per server process"""
+    from .jobs import InspectionJobQueue
+    return InspectionJobQueue()
+
+@st.cache_resource
+def get_folder_watcher(watch_dir):
+    """Single drop-folder watcher per server process (uses the server's backend API key)"""
+    from .backends import backend_api_key
+    from .watch import FolderWatcher
+    client = get_openai_client(backend_api_key())
+    return FolderWatcher(watch_dir, get_job_queue(), client, idle_seconds=120).start()
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def image_preview(data, max_side=640):
+    """Downscaled JPEG of an uploaded photo, so reruns do not decode and re-encode the full image"""
+    from PIL import Image
+    image = Image.open(io.BytesIO(data)).convert("RGB")
+    image.thumbnail((max_side, max_side))
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+def archived_preview(digest, max_side=300):
+    """Downscaled JPEG of an archived inspection image, or None if it is not (yet) in the archive"""
+    data = get_job_queue().archive.get(digest)
+    return None if data is None else image_preview(data, max_side)
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def tray_views(data, angle_name):
+    """Per-shoe crops and view names of a tray photo, segmented once per upload"""
+    from .tray import tray_views
+    return tray_views(data, angle_name)
+
+@st.cache_data(max_entries=8, show_spinner="Picking keyframes from the turntable video...")
+def turntable_keyframes(data):
+    """Sharpest keyframe per horizontal view of a turntable video, extracted once per upload"""
+    from .turntable import extract_keyframes
+    return extract_keyframes(data)
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def view_hash(data):
+    """Perceptual hash of an uploaded photo, for re-inspections"""
+    from .reinspect import view_hash
+    return view_hash(data)
+
+@st.cache_data(ttl=10, show_spinner=False)
+def previous_inspection(po_number, style_number, color):
+    """Latest finished inspection of a PO, style and color (the job store is rescanned at most every 10 s)"""
+    return get_job_queue().previous_inspection({"po_number": po_number, "style_number": style_number,
+                                                "color": color})
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def defect_heatmaps(style_number, color, angle_names, versions):
+    """Heatmap figures of a style's angles; versions (grid mtimes) key the cache, so updates show at once"""
+    from .heatmap import heatmap_figures
+    queue = get_job_queue()
+    return heatmap_figures(queue.heatmaps, queue.golden, style_number, color, angle_names)
+
+def style_heatmaps(order_info, angle_names):
+    """Current defect heatmap figures for the style of an inspection"""
+    heatmaps = get_job_queue().heatmaps
+    versions = tuple(heatmaps.version(order_info["style_number"], angle_name) for angle_name in angle_names)
+    if not any(versions):
+        return []
+    return defect_heatmaps(order_info["style_number"], order_info["color"], tuple(angle_names), versions)
+
+@st.cache_data(ttl=10, max_entries=64, show_spinner=False)
+def search_history(query, since, until, by_po, **filters):
+    """Search hits (or matching POs) in the defect history, refreshed at most every 10 s"""
+    index = get_job_queue().search
+    if by_po:
+        return index.search_pos(query, since, until, **filters)
+    return index.search(query, since, until, highlight=("**", "**"), **filters)
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def export_documents(job_id, finished_at, heatmap_views, _job, _heatmaps=None):
+    """
+    JSON, NDJSON, HTML and styled-text exports of a finished job, built once instead of on every rerun.
+    Keyed by the job id, finish time and view counts of its heatmaps: hashing the whole job (and the
+    heatmap PNGs) on every rerun cost more than any other cached call on the report page.
+    """
+    job, heatmaps = _job, _heatmaps
+    from .export import ndjson_records
+    from .report import build_export_report, generate_html_report, generate_styled_text_report
+
+    order_info = job["order_info"]
+    po_number, style_number = order_info["po_number"], order_info["style_number"]
+    export_report = build_export_report(order_info, job["final_report"], job["analyses"])
+    return {
+        "json": json.dumps(export_report, indent=2, default=str),
+        "ndjson": "".join(json.dumps(r, default=str) + "\n" for r in ndjson_records(job)),
+        "html": generate_html_report(export_report, po_number, style_number, heatmaps),
+        "text": generate_styled_text_report(export_report, po_number, style_number),
+    }
+
+# Inspection results display
+def render_inspection_report(job):
+    """Render the QC report of a finished inspection job (view images are loaded from the archive)"""
+    analyses = job["analyses"]
+    angle_names = job["angle_names"]
+    order_info = job["order_info"]
+    final_report = job["final_report"]
+    po_number = order_info["po_number"]
+    style_number = order_info["style_number"]
+    inspection_date = datetime.strptime(order_info["inspection_date"], "%Y-%m-%d")
+    
+    # Display Results
+    st.header("📊 Quality Control Inspection Report")
+    
+    # Result Header
+    result_colors = {
+        "ACCEPT": "success",
+        "REWORK": "warning", 
+        "REJECT": "error"
+    }
+    
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        st.markdown(f"### Final Result:")
+        st.markdown(f"## :{result_colors[final_report['result']]}[{final_report['result']}]")
+    
+    with col2:
+        st.markdown(f"### Reason:")
+        st.markdown(f"**{final_report['reason']}**")
+        st.markdown(f"*Inspection completed on {inspection_date.strftime('%B %d, %Y')}*")
+        if job.get("actual_cost") is not None:
+            st.caption(f"💰 Actual cost ${job['actual_cost']:.3f} (estimated up to ${job['options']['plan']['cost']:.3f})")
+        encoded = [a['encoding'] for a in analyses if a and a.get('encoding')]
+        if encoded:
+            passthrough = sum(1 for e in encoded if e['path'] == "passthrough")
+            st.caption(f"📦 {passthrough} of {len(encoded)} views sent as the original JPEG, "
+                       f"{len(encoded) - passthrough} re-encoded ({sum(e['encode_ms'] for e in encoded):.0f} ms encoding)")
+        if job.get("reinspection"):
+            st.caption(f"🔁 Re-inspection after rework of the {job['reinspection']['result']} inspection "
+                       f"{job['reinspection']['job_id']}")
+        if job.get("speculative_views"):
+            st.caption(f"⚡ {len(job['speculative_views'])} of {len(analyses)} views analysed speculatively "
+                       f"before the inspection was started")
+    
+    # An accepted pair can become the golden sample for its style/color
+    if final_report['result'] == "ACCEPT" and job.get("image_digests"):
+        if st.button(f"⭐ Approve as golden sample for {style_number} / {order_info['color']}",
+                     help="Future inspections with the golden-sample precheck compare against these views"):
+            from PIL import Image
+            archive = get_job_queue().archive
+            library = get_job_queue().golden
+            stored = 0
+            for angle_name, digest in zip(angle_names, job["image_digests"]):
+                # The original upload when the archive keeps it, else the archival rendition
+                data = archive.get(digest, original=True) or archive.get(digest)
+                if data:
+                    library.store(style_number, order_info['color'], angle_name, Image.open(io.BytesIO(data)))
+                    stored += 1
+            if stored:
+                st.success(f"✅ Stored {stored} of {len(angle_names)} golden views for {style_number} / "
+                           f"{order_info['color']}")
+            else:
+                st.error("❌ None of the views are in the image archive any more; nothing was stored")
+    
+    # Defect Summary Dashboard
+    st.subheader("📈 Defect Summary (AQL 2.5 Standard)")
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        st.metric(
+            "🚨 Critical Defects", 
+            final_report['critical_count'],
+            delta=f"Limit: {final_report['aql_limits']['critical']}",
+            delta_color="inverse"
+        )
+        
+    with col2:
+        major_over_limit = final_report['major_count'] - final_report['aql_limits']['major']
+        st.metric(
+            "⚠️ Major Defects", 
+            final_report['major_count'],
+            delta=f"Limit: {final_report['aql_limits']['major']}",
+            delta_color="inverse" if major_over_limit > 0 else "normal"
+        )
+        
+    with col3:
+        minor_over_limit = final_report['minor_count'] - final_report['aql_limits']['minor']
+        st.metric(
+            "ℹ️ Minor Defects", 
+            final_report['minor_count'],
+            delta=f"Limit: {final_report['aql_limits']['minor']}",
+            delta_color="inverse" if minor_over_limit > 0 else "normal"
+        )
+    
+    # Detailed Defect Lists
+    if final_report['critical_defects']:
+        st.subheader("🚨 Critical Defects (Must Fix)")
+        for i, defect in enumerate(final_report['critical_defects'], 1):
+            st.error(f"**{i}.** {defect}")
+    
+    if final_report['major_defects']:
+        st.subheader("⚠️ Major Defects (Require Attention)")
+        for i, defect in enumerate(final_report['major_defects'], 1):
+            st.warning(f"**{i}.** {defect}")
+    
+    if final_report['minor_defects']:
+        st.subheader("ℹ️ Minor Defects (Monitor)")
+        for i, defect in enumerate(final_report['minor_defects'], 1):
+            st.info(f"**{i}.** {defect}")
+    
+    # Individual Angle Analysis
+    st.subheader("🔍 Detailed Analysis by View")
+    
+    cascade = job["options"].get("cascade")
+    if cascade:
+        screened = sum(1 for a in analyses if a and a.get('cascade', {}).get('decided_by') == "screening")
+        st.caption(f"🪜 Model cascade: {screened} of {len(analyses)} views decided by {cascade['screening_model']}, "
+                   f"{len(analyses) - screened} escalated to {cascade['strong_model']}")
+    
+    for idx, analysis in enumerate(analyses):
+        angle_name = angle_names[idx]
+        if not analysis:
+            st.error(f"❌ {angle_name} - analysis failed, this view is not included in the report")
+        else:
+            
+            # Color code based on condition
+            condition_colors = {"Good": "🟢", "Fair": "🟡", "Poor": "🔴"}
+            condition_icon = condition_colors.get(analysis['overall_condition'], "⚫")
+            
+            with st.expander(f"{condition_icon} {angle_name} - {analysis['overall_condition']} (Confidence: {analysis['confidence']})"):
+                col1, col2 = st.columns([2, 1])
+                
+                with col1:
+                    if analysis['critical_defects']:
+                        st.markdown("**🚨 Critical:** " + " | ".join(analysis['critical_defects']))
+                    if analysis['major_defects']:
+                        st.markdown("**⚠️ Major:** " + " | ".join(analysis['major_defects']))
+                    if analysis['minor_defects']:
+                        st.markdown("**ℹ️ Minor:** " + " | ".join(analysis['minor_defects']))
+                    if not any([analysis['critical_defects'], analysis['major_defects'], analysis['minor_defects']]):
+                        st.success("✅ No defects detected in this view")
+                
+                with col2:
+                    # Show the corresponding image thumbnail
+                    digests = job.get("image_digests") or []
+                    preview = archived_preview(digests[idx]) if idx < len(digests) else None
+                    if preview:
+                        st.image(preview, caption=f"{angle_name}", width=150)
+                
+                if analysis.get('tiling', {}).get('regions'):
+                    reasons = [region['reason'] for region in analysis['tiling']['regions']]
+                    st.markdown("**🔬 Close-up Regions:** " + " | ".join(reasons))
+                
+                if analysis.get('golden_comparison'):
+                    golden = analysis['golden_comparison']
+                    verdict = "within tolerance" if golden['within_tolerance'] else "outside tolerance"
+                    st.markdown(f"**⭐ Golden Sample:** {verdict} - max ΔE {golden['max_delta_e']}, "
+                                f"min SSIM {golden['min_region_ssim']} ({golden['elapsed_ms']} ms)")
+
+                if analysis.get('symmetry'):
+                    symmetry = analysis['symmetry']
+                    verdict = "within tolerance" if symmetry['within_tolerance'] else "asymmetric"
+                    st.markdown(f"**⚖️ Left/Right Symmetry:** {verdict} - heel pitch "
+                                f"{symmetry['left']['heel_pitch_deg']}° / {symmetry['right']['heel_pitch_deg']}°, "
+                                f"toe spring {symmetry['left']['toe_spring_deg']}° / {symmetry['right']['toe_spring_deg']}°, "
+                                f"waist {symmetry['waist_deviation_pct']}%, IoU {symmetry['silhouette_iou']} "
+                                f"({symmetry['elapsed_ms']} ms)")
+
+                if analysis.get('encoding'):
+                    encoding = analysis['encoding']
+                    how = "original JPEG, no re-encode" if encoding['path'] == "passthrough" else "re-encoded"
+                    st.markdown(f"**📦 Upload:** {how} - {encoding['bytes'] / 1024:.0f} KB in {encoding['encode_ms']} ms")
+                
+                if analysis.get('provenance'):
+                    provenance = analysis['provenance']
+                    if provenance['source'] == "carried_forward":
+                        st.markdown(f"**🔁 Carried forward:** photo unchanged since inspection {provenance['job_id']} "
+                                    f"({provenance['inspected_at']}), previous analysis reused")
+                    else:
+                        st.markdown(f"**🔁 Re-analysed:** {provenance['reason']}")
+                
+                if analysis.get('cascade'):
+                    tier = analysis['cascade']
+                    escalation = f" (escalated: {tier['escalation_reason']})" if tier['escalation_reason'] else ""
+                    st.markdown(f"**🪜 Decided by:** {tier['decided_by']} tier - {tier['model']}{escalation}")
+                
+                if analysis.get('inspection_notes'):
+                    st.markdown(f"**Inspector Notes:** {analysis['inspection_notes']}")
+    
+    # Where defects cluster across every inspection of this style so far
+    heatmaps = style_heatmaps(order_info, angle_names)
+    if heatmaps:
+        st.subheader(f"🗺️ Defect Locations - Style {style_number}")
+        st.caption("Share of inspected views with a defect at each spot, over the golden sample where one exists")
+        cols = st.columns(min(len(heatmaps), 3))
+        for idx, figure in enumerate(heatmaps):
+            spots = ", ".join(f"{spot['region']} {spot['share']:.0%}" for spot in figure['hotspots']) or "no hotspots"
+            with cols[idx % 3]:
+                st.image(figure['png'], caption=f"{figure['angle']} - {figure['views']} views - {spots}",
+                         use_container_width=True)
+    
+    # Export Report Section
+    st.divider()
+    st.subheader("💾 Export Report")
+    
+    # Prepare comprehensive report data
+    documents = export_documents(job["job_id"], job["finished_at"],
+                                 tuple((figure["angle"], figure["views"]) for figure in heatmaps), job, heatmaps)
+    
+    # Enhanced Export Section with three columns
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        st.download_button(
+            label="📄 Download JSON Report",
+            data=documents["json"],
+            file_name=f"QC_Report_{po_number}_{style_number}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+            mime="application/json",
+            use_container_width=True
+        )
+        # One record per inspection / angle / defect, for log pipelines
+        st.download_button(
+            label="🧾 Download NDJSON Records",
+            data=documents["ndjson"],
+            file_name=f"QC_Records_{po_number}_{style_number}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.ndjson",
+            mime="application/x-ndjson",
+            use_container_width=True
+        )
+    
+    with col2:
+        st.download_button(
+            label="🎨 Download HTML Report",
+            data=documents["html"],
+            file_name=f"QC_Report_{po_number}_{style_number}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html",
+            mime="text/html",
+            use_container_width=True
+        )
+    
+    with col3:
+        st.download_button(
+            label="📝 Download Styled Report",
+            data=documents["text"],
+            file_name=f"QC_Report_{po_number}_{style_number}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt",
+            mime="text/plain",
+            use_container_width=True
+        )
+
+def render_history_search():
+    """Full-text search over the defects and notes of every finished inspection (see search.py)"""
+    query = st.text_input("Defects or notes", key="search_query", placeholder='"heel kick", rubber wire, glue* NOT toe',
+                          help="Words match any form (kick, kicks); quotes match a phrase, * a prefix; AND, OR, NOT combine")
+    col1, col2, col3, col4 = st.columns(4)
+    customer = col1.text_input("Customer", key="search_customer")
+    style_number = col2.text_input("Style Number", key="search_style")
+    severity = col3.selectbox("Severity", ["Any", "critical", "major", "minor"], key="search_severity")
+    dates = col4.date_input("Inspection dates", value=(), key="search_dates")
+    by_po = st.toggle("Group by PO", key="search_by_po")
+    if not query:
+        return
+
+    since = dates[0].strftime("%Y-%m-%d") if len(dates) > 0 else None
+    until = dates[1].strftime("%Y-%m-%d") if len(dates) > 1 else since
+    from .search import InvalidQuery
+    try:
+        results = search_history(query, since, until, by_po, customer=customer or None,
+                                 style_number=style_number or None, severity=None if severity == "Any" else severity)
+    except InvalidQuery as e:
+        st.warning(str(e))
+        return
+    if not results:
+        st.info("No matching defects or notes")
+    elif by_po:
+        for group in results:
+            st.markdown(f"**PO {group['po_number']}** - {group['customer']} {group['style_number']}/{group['color']}: "
+                        f"{group['hits']} matches in {group['inspections']} inspection(s), "
+                        f"{group['first_date']} to {group['last_date']}")
+    else:
+        for hit in results:
+            st.markdown(f"[PO {hit['po_number']}](?job={hit['job_id']}) · {hit['inspection_date']} · {hit['customer']} "
+                        f"{hit['style_number']}/{hit['color']} · {hit['angle']} · {hit['severity'] or 'note'}: "
+                        f"{hit['snippet']}")
@@ -0,0 +1,329 @@
+"""
+Watch-folder ingestion for camera stations.
+
+    python -m qc_inspector.watch /srv/qc/drop --customer MIA
+
+Photos dropped into the folder are grouped into pairs by order (PO, style, color)
+and angle, and every complete pair is submitted to the inspection queue as soon
+as its last photo has settled, so inspection overlaps with photography.
+
+Order and angle come from a sidecar manifest next to the photo (same name, .json):
+    {"po_number": "0144540", "style_number": "GS1412401B", "color": "PPB", "angle": "front"}
+or else from the filename convention PO_STYLE_COLOR_ANGLE.jpg, e.g. 0144540_GS1412401B_PPB_front.jpg.
+Submitted photos are moved to processed/<job_id>/ inside the drop folder. A pair refused
+for lack of budget stays in the drop folder and is submitted again every BUDGET_RETRY_SECONDS.
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from PIL import Image
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+from .analysis import ANGLE_NAMES, SCREENING_MODEL, STRONG_MODEL
+from .cost import BudgetExceeded
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+SETTLE_SECONDS = 2.0         # A photo counts as written once its size and mtime stop changing this long
+SCAN_INTERVAL = 0.5
+PROCESSED_DIR = "processed"
+BUDGET_RETRY_SECONDS = 300.0 # A pair refused for lack of budget is tried again after this long
+SUBMIT_RETRY_SECONDS = 30.0  # A pair whose submit failed otherwise (unreadable photo, store error) likewise
+
+# Angle tokens accepted in filenames and manifests
+ANGLE_ALIASES = {
+    "front": "Front View",
+    "back": "Back View",
+    "heel": "Back View",
+    "left": "Left Side View",
+    "leftside": "Left Side View",
+    "right": "Right Side View",
+    "rightside": "Right Side View",
+    "top": "Top View",
+    "sole": "Sole View",
+    "bottom": "Sole View",
+}
+ANGLE_ALIASES.update({name.lower().replace(" ", ""): name for name in ANGLE_NAMES})
+
+def normalize_angle(token):
+    """Map an angle token such as "front", "Left-Side" or "Sole View" to its standard name"""
+    key = "".join(ch for ch in str(token).lower() if ch.isalnum())
+    return ANGLE_ALIASES.get(key) or ANGLE_ALIASES.get(key.removesuffix("view"))
+
+def read_photo_metadata(path):
+    """(po_number, style_number, color, angle, extra manifest fields) for a photo, or None if unknown"""
+    sidecar = os.path.splitext(path)[0] + ".json"
+    if os.path.exists(sidecar):
+        try:
+            with open(sidecar) as f:
+                manifest = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None  # Probably still being written; try again on the next scan
+        angle = normalize_angle(manifest.get("angle", ""))
+        if angle and manifest.get("po_number"):
+            extra = {k: v for k, v in manifest.items() if k in ("customer", "inspector")}
+            return manifest["po_number"], manifest.get("style_number", ""), manifest.get("color", ""), angle, extra
+
+    parts = os.path.splitext(os.path.basename(path))[0].split("_")
+    if len(parts) >= 4:
+        angle = normalize_angle(parts[-1])
+        if angle:
+            return parts[0], parts[1], "_".join(parts[2:-1]), angle, {}
+    return None
+
+class _DropHandler(FileSystemEventHandler):
+    def __init__(self, watcher):
+        self.watcher = watcher
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.watcher.touch(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.watcher.touch(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.watcher.touch(event.dest_path)
+
+class FolderWatcher:
+    """
+    Watches a drop directory, debounces partial writes, groups photos into pairs
+    and submits each complete pair to an InspectionJobQueue.
+    A pair is complete when every required angle is present, or, with idle_seconds
+    set, when at least two angles are present and nothing new arrived for that long.
+    """
+
+    def __init__(self, drop_dir, queue, client, required_angles=None, order_defaults=None,
+                 options=None, settle_seconds=SETTLE_SECONDS, idle_seconds=None):
+        self.drop_dir = os.path.abspath(drop_dir)
+        self.queue = queue
+        self.client = client
+        self.required_angles = list(required_angles or ANGLE_NAMES)
+        self.order_defaults = order_defaults or {}
+        self.options = options or {"inspection_mode": "Standard", "cascade": None}
+        self.settle_seconds = settle_seconds
+        self.idle_seconds = idle_seconds
+        self.recent_jobs = deque(maxlen=50)   # (job_id, po_number, style_number, color), newest last
+
+        self._lock = threading.Lock()
+        self._changes = {}       # path -> (last change time, size, mtime)
+        self._unparsed = set()   # settled photos without usable metadata (warned once)
+        self._pairs = {}         # (po, style, color) -> {"angles": {angle: path}, "extra": {}, "updated": t}
+        self._observer = None
+        self._stop = threading.Event()
+        os.makedirs(self.drop_dir, exist_ok=True)
+
+    def start(self):
+        # Photos already waiting from before the watcher started
+        for name in sorted(os.listdir(self.drop_dir)):
+            self.touch(os.path.join(self.drop_dir, name))
+        self._observer = Observer()
+        self._observer.schedule(_DropHandler(self), self.drop_dir, recursive=False)
+        self._observer.start()
+        threading.Thread(target=self._scan_loop, name="qc-watch-folder", daemon=True).start()
+        logger.info("Watching %s for %s", self.drop_dir, ", ".join(self.required_angles))
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._observer:
+            self._observer.stop()
+            self._observer.join()
+
+    def touch(self, path):
+        """Record that a file in the drop folder appeared or changed"""
+        if os.path.dirname(os.path.abspath(path)) != self.drop_dir:
+            return
+        if path.lower().endswith(".json"):
+            # A sidecar changed: re-read its photo
+            path = next((os.path.splitext(path)[0] + ext for ext in IMAGE_EXTENSIONS
+                         if os.path.exists(os.path.splitext(path)[0] + ext)), None)
+            if path is None:
+                return
+        if not path.lower().endswith(IMAGE_EXTENSIONS):
+            return
+        with self._lock:
+            self._changes[path] = (time.monotonic(), None, None)
+            self._unparsed.discard(path)
+
+    def _scan_loop(self):
+        while not self._stop.wait(SCAN_INTERVAL):
+            try:
+                self._scan()
+            except Exception:
+                logger.exception("Watch folder scan failed")
+
+    def _scan(self):
+        now = time.monotonic()
+        with self._lock:
+            candidates = list(self._changes.items())
+
+        for path, (changed_at, size, mtime) in candidates:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                with self._lock:
+                    self._changes.pop(path, None)
+                continue
+            # Debounce: wait until the writer has stopped touching the file
+            if (stat.st_size, stat.st_mtime) != (size, mtime):
+                with self._lock:
+                    self._changes[path] = (now, stat.st_size, stat.st_mtime)
+                continue
+            if now - changed_at < self.settle_seconds or not self._is_readable_image(path):
+                continue
+
+            metadata = read_photo_metadata(path)
+            if metadata is None:
+                if path not in self._unparsed:
+                    logger.warning("No order/angle for %s (use PO_STYLE_COLOR_ANGLE or a .json sidecar)", path)
+                    self._unparsed.add(path)
+                continue
+
+            po_number, style_number, color, angle, extra = metadata
+            with self._lock:
+                self._changes.pop(path, None)
+                pair = self._pairs.setdefault((po_number, style_number, color), {"angles": {}, "extra": {}})
+                pair["angles"][angle] = path
+                pair["extra"].update(extra)
+                pair["updated"] = now
+
+        for key, pair in list(self._pairs.items()):
+            if pair.get("retry_at", 0) > now:
+                continue
+            complete = all(angle in pair["angles"] for angle in self.required_angles)
+            idle = (self.idle_seconds is not None and len(pair["angles"]) >= 2
+                    and now - pair["updated"] >= self.idle_seconds)
+            if complete or idle:
+                del self._pairs[key]
+                self._submit(key, pair)
+
+    @staticmethod
+    def _is_readable_image(path):
+        try:
+            with Image.open(path) as image:
+                image.verify()
+            return True
+        except Exception:
+            return False
+
+    def _submit(self, key, pair):
+        po_number, style_number, color = key
+        # Standard angles first, in the usual order, then anything extra
+        angle_names = [a for a in ANGLE_NAMES if a in pair["angles"]]
+        angle_names += [a for a in pair["angles"] if a not in angle_names]
+        paths = [pair["angles"][a] for a in angle_names]
+
+        order_info = {
+            "po_number": po_number,
+            "style_number": style_number,
+            "color": color,
+            "customer": pair["extra"].get("customer", self.order_defaults.get("customer", "")),
+            "inspector": pair["extra"].get("inspector", self.order_defaults.get("inspector", "AI Inspector")),
+            "inspection_date": datetime.now().strftime("%Y-%m-%d")
+        }
+        try:
+            images = []
+            for path in paths:
+                with open(path, "rb") as f:
+                    images.append(f.read())
+            job_id = self.queue.submit(f"watch:{self.drop_dir}", self.client, images, angle_names, order_info,
+                                       self.options)
+        except BudgetExceeded as e:
+            # Photos stay in the drop folder; the pair waits for budget (e.g. the next day) and is retried
+            logger.error("Not inspecting PO#%s %s %s: %s; retrying in %.0f s", po_number, style_number, color, e,
+                         BUDGET_RETRY_SECONDS)
+            self._requeue(key, pair, BUDGET_RETRY_SECONDS)
+            return
+        except Exception:
+            logger.exception("Submitting PO#%s %s %s failed; retrying in %.0f s", po_number, style_number, color,
+                             SUBMIT_RETRY_SECONDS)
+            self._requeue(key, pair, SUBMIT_RETRY_SECONDS)
+            return
+        self.recent_jobs.append((job_id, po_number, style_number, color))
+        logger.info("Submitted PO#%s %s %s (%d views) as job %s", po_number, style_number, color, len(images), job_id)
+
+        # Move the photos (and sidecars) out of the drop folder so they are not picked up again
+        target_dir = os.path.join(self.drop_dir, PROCESSED_DIR, job_id)
+        os.makedirs(target_dir, exist_ok=True)
+        for path in paths:
+            for source in (path, os.path.splitext(path)[0] + ".json"):
+                if os.path.exists(source):
+                    shutil.move(source, os.path.join(target_dir, os.path.basename(source)))
+
+    def _requeue(self, key, pair, delay):
+        """Put a pair that was not submitted back, to be tried again after delay seconds"""
+        pair["retry_at"] = time.monotonic() + delay
+        with self._lock:
+            # Photos of the same order that arrived in the meantime join the pair
+            newer = self._pairs.get(key)
+            if newer:
+                pair["angles"].update(newer["angles"])
+                pair["extra"].update(newer["extra"])
+                pair["updated"] = newer["updated"]
+            self._pairs[key] = pair
+
+def main():
+    from .backends import backend_api_key
+    from .client import OPENAI_BASE_URL, create_openai_client
+    from .jobs import InspectionJobQueue
+
+    parser = argparse.ArgumentParser(description="Submit photos dropped by camera stations for QC inspection")
+    parser.add_argument("drop_dir")
+    parser.add_argument("--customer", default="")
+    parser.add_argument("--inspector", default="AI Inspector")
+    parser.add_argument("--angles", nargs="+", default=None,
+                        help="Angles that make a pair complete (default: all six standard views)")
+    parser.add_argument("--idle-timeout", type=float, default=None,
+                        help="Also submit pairs with 2+ views once no photo arrived for this many seconds")
+    parser.add_argument("--adaptive", action="store_true", help="Use adaptive tiling")
+    parser.add_argument("--cascade", action="store_true", help="Use the screening/strong model cascade")
+    parser.add_argument("--golden", action="store_true", help="Skip views that match their golden sample")
+    parser.add_argument("--compact", action="store_true", help="Ask for coded defects instead of prose (faster)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    api_key = backend_api_key()
+    if not api_key:
+        parser.error("OPENAI_API_KEY is not set (nor an API key in the backend config)")
+
+    required_angles = None
+    if args.angles:
+        required_angles = [normalize_angle(a) for a in args.angles]
+        if None in required_angles:
+            parser.error(f"Unknown angle in {args.angles}")
+
+    options = {
+        "inspection_mode": "Adaptive tiling" if args.adaptive else "Standard",
+        "cascade": {"screening_model": SCREENING_MODEL, "strong_model": STRONG_MODEL} if args.cascade else None,
+        "golden_samples": args.golden,
+        "compact_output": args.compact
+    }
+    watcher = FolderWatcher(
+        args.drop_dir,
+        InspectionJobQueue(),
+        create_openai_client(api_key, OPENAI_BASE_URL),
+        required_angles=required_angles,
+        order_defaults={"customer": args.customer, "inspector": args.inspector},
+        options=options,
+        idle_seconds=args.idle_timeout
+    ).start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        watcher.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+import pytest
+
+from qc_inspector.report import generate_qc_report
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "perf: wall-clock timing checks; deselect on loaded machines with -m 'not perf'")
+
+@pytest.fixture
+def finished_job():
+    """Factory of finished inspection jobs as the job store saves them"""
+    def make(job_id="job0001", po_number="4711", customer="MIA", inspection_date="2026-10-19",
+             style_number="ST-1", color="Black", defects=None, notes="Clean construction"):
+        angle_names = ["Front View", "Back View"]
+        defects = defects or {"Back View": {"major_defects": ["Heel: Overflowing glue along the foxing"]}}
+        analyses = [dict({"angle": angle_name, "critical_defects": [], "major_defects": [], "minor_defects": [],
+                          "overall_condition": "Good", "confidence": "High", "inspection_notes": notes},
+                         **defects.get(angle_name, {}))
+                    for angle_name in angle_names]
+        order_info = {"po_number": po_number, "style_number": style_number, "color": color, "customer": customer,
+                      "inspector": "QC", "inspection_date": inspection_date}
+        return {
+            "job_id": job_id,
+            "session_id": "test",
+            "status": "done",
+            "submitted_at": f"{inspection_date}T09:00:00",
+            "finished_at": f"{inspection_date}T09:00:30",
+            "order_info": order_info,
+            "angle_names": angle_names,
+            "options": {"inspection_mode": "Standard", "plan": {"cost": 0.05}},
+            "spend_day": inspection_date,
+            "usage": {},
+            "actual_cost": 0.04,
+            "total": len(angle_names),
+            "completed": len(angle_names),
+            "analyses": analyses,
+            "final_report": generate_qc_report(analyses, order_info, angle_names),
+        }
+    return make
@@ -0,0 +1,141 @@
+"""HTTP inspection API handlers (see qc_inspector/api.py)"""
+import io
+import json
+import shutil
+import tempfile
+import threading
+import time
+import types
+import uuid
+from unittest import mock
+
+from PIL import Image
+from tornado.testing import AsyncHTTPTestCase
+
+from qc_inspector import api
+from qc_inspector.perf import sample_queue
+
+TOKEN = "test-token"
+AUTH = {"Authorization": f"Bearer {TOKEN}"}
+REPLY = {"angle": "", "critical_defects": [], "major_defects": ["Heel: heel kick on the counter"],
+         "minor_defects": [], "overall_condition": "Fair", "confidence": "High", "inspection_notes": "Sharp photo"}
+
+class FakeClient:
+    """Stands in for the OpenAI client: every vision call answers REPLY"""
+
+    def __init__(self):
+        self.calls = 0
+        self._lock = threading.Lock()
+        self.chat = types.SimpleNamespace(completions=self)
+
+    def create(self, **request):
+        with self._lock:
+            self.calls += 1
+        message = types.SimpleNamespace(content=json.dumps(REPLY))
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)],
+                                     usage=types.SimpleNamespace(prompt_tokens=1000, completion_tokens=100))
+
+def jpeg(color):
+    output = io.BytesIO()
+    Image.new("RGB", (640, 480), color).save(output, format="JPEG")
+    return output.getvalue()
+
+def multipart(fields):
+    """(body, content type) of a multipart form; bytes values are sent as image files"""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields:
+        if isinstance(value, bytes):
+            parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{name}.jpg"\r\n'
+                         f"Content-Type: image/jpeg\r\n\r\n".encode() + value + b"\r\n")
+        else:
+            parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    return b"".join(parts) + f"--{boundary}--\r\n".encode(), f"multipart/form-data; boundary={boundary}"
+
+ORDER = [("po_number", "4711"), ("style_number", "ST-1"), ("color", "Black"), ("customer", "MIA")]
+
+class ApiTest(AsyncHTTPTestCase):
+    def setUp(self):
+        data_dir = tempfile.mkdtemp(prefix="qc-api-")
+        self.addCleanup(shutil.rmtree, data_dir, ignore_errors=True)
+        self.queue, self.sample = sample_queue(data_dir)
+        self.client = FakeClient()
+        for name, value in (("backend_api_key", lambda: "sk-test"), ("get_openai_client", lambda *a: self.client)):
+            patcher = mock.patch.object(api, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        super().setUp()
+
+    def get_app(self):
+        return api.make_app(self.queue, api_token=TOKEN)
+
+    def submit(self, fields):
+        body, content_type = multipart(fields)
+        return self.fetch("/inspections", method="POST", body=body, headers=dict(AUTH, **{"Content-Type": content_type}))
+
+    def get_json(self, path):
+        response = self.fetch(path, headers=AUTH)
+        return response.code, json.loads(response.body)
+
+    def wait_until(self, condition, timeout=10.0):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            self.assertLess(time.monotonic(), deadline, "timed out")
+            time.sleep(0.05)
+
+    def test_health_needs_no_token_but_the_rest_does(self):
+        self.assertEqual(self.fetch("/healthz").code, 200)
+        self.assertEqual(self.fetch(f"/inspections/{self.sample['job_id']}").code, 401)
+        self.assertEqual(self.fetch("/search?q=glue", headers={"Authorization": "Bearer wrong"}).code, 401)
+
+    def test_submit_run_and_report(self):
+        response = self.submit([("images", jpeg((90, 60, 40))), ("images", jpeg((40, 60, 90)))] + ORDER)
+        self.assertEqual(response.code, 202)
+        job_id = json.loads(response.body)["job_id"]
+        self.assertEqual(response.headers["Location"], f"/inspections/{job_id}")
+
+        self.wait_until(lambda: self.get_json(f"/inspections/{job_id}")[1]["status"] == "done")
+        code, status = self.get_json(f"/inspections/{job_id}")
+        self.assertEqual((status["completed"], status["total"]), (2, 2))
+        self.assertEqual(self.client.calls, 2)
+
+        code, report = self.get_json(f"/inspections/{job_id}/report")
+        self.assertEqual(code, 200)
+        self.assertIn("Heel: heel kick on the counter", json.dumps(report))
+        for report_format, content_type in (("html", "text/html"), ("text", "text/plain")):
+            response = self.fetch(f"/inspections/{job_id}/report?format={report_format}", headers=AUTH)
+            self.assertEqual(response.code, 200)
+            self.assertTrue(response.headers["Content-Type"].startswith(content_type))
+        self.assertEqual(self.fetch(f"/inspections/{job_id}/report?format=pdf", headers=AUTH).code, 400)
+
+        # Views are archived in the background too
+        self.wait_until(lambda: self.fetch(status["images"][0], headers=AUTH).code == 200)
+        image = self.fetch(status["images"][0], headers=AUTH)
+        self.assertEqual(Image.open(io.BytesIO(image.body)).size, (640, 480))
+
+        # Finished jobs are indexed for search in the background
+        self.wait_until(lambda: self.get_json("/search?q=kick")[1]["hits"])
+        code, result = self.get_json("/search?q=kick&group=po")
+        self.assertEqual([(po["po_number"], po["hits"]) for po in result["pos"]], [("4711", 2)])
+
+    def test_unknown_jobs_and_images_are_404s(self):
+        self.assertEqual(self.fetch("/inspections/nosuchjob", headers=AUTH).code, 404)
+        self.assertEqual(self.fetch("/inspections/nosuchjob/report", headers=AUTH).code, 404)
+        self.assertEqual(self.fetch(f"/images/{'0' * 64}", headers=AUTH).code, 404)
+
+    def test_bad_submits_are_400s(self):
+        self.assertEqual(self.submit([("images", jpeg((1, 2, 3)))] + ORDER).code, 400)
+        response = self.submit([("images", b"not an image"), ("images", jpeg((1, 2, 3)))] + ORDER)
+        self.assertEqual(response.code, 400)
+        self.assertEqual(json.loads(response.body)["error"], "Every upload must be a JPEG or PNG image")
+        self.assertEqual(self.client.calls, 0)
+
+    def test_reinspection_needs_a_finished_inspection(self):
+        fields = [("images", jpeg((1, 2, 3))), ("images", jpeg((3, 2, 1))), ("reinspect", "true")]
+        response = self.submit(fields + [("po_number", "none"), ("style_number", "ST-1"), ("color", "Black")])
+        self.assertEqual(response.code, 409)
+
+    def test_search_arguments_are_checked(self):
+        for query in ("", "q=", "q=glue&limit=0", "q=glue&limit=-1", "q=glue&limit=many"):
+            self.assertEqual(self.fetch(f"/search?{query}", headers=AUTH).code, 400, query)
+        self.assertEqual(self.get_json('/search?q="'), (200, {"query": '"', "hits": []}))
@@ -0,0 +1,31 @@
+"""Expansion of compact coded replies into the standard angle analysis (see qc_inspector/codes.py)"""
+from qc_inspector.codes import expand_compact_analysis
+
+def test_expands_codes_into_defect_strings():
+    raw = {"d": [["maj", "GLO", "FOX", "heel side"], ["crit", "OSD", "OUT", ""]], "c": "P", "k": "H", "n": "Sharp photo"}
+    analysis = expand_compact_analysis(raw, "Left Side View")
+
+    assert analysis["angle"] == "Left Side View"
+    assert analysis["major_defects"] == ["Foxing/sole edge: Overflowing glue (visible excess adhesive) - heel side"]
+    assert analysis["critical_defects"] == ["Outsole: Outsole debonding or separation"]
+    assert analysis["minor_defects"] == []
+    assert (analysis["overall_condition"], analysis["confidence"], analysis["inspection_notes"]) == \
+        ("Poor", "High", "Sharp photo")
+    assert analysis["coded_defects"][0] == {"severity": "major", "code": "GLO", "location": "FOX", "note": "heel side"}
+
+def test_severity_falls_back_to_the_code_class():
+    analysis = expand_compact_analysis({"d": [["?", "drt", "toe"], ["", "OTH", "", "odd seam"]]}, "Top View")
+    assert analysis["minor_defects"] == ["Toe box: Surface dirt or dust (cleanable)"]
+    assert analysis["major_defects"] == ["Unspecified location: Other defect - odd seam"]
+
+def test_unknown_codes_are_kept_and_malformed_entries_skipped():
+    analysis = expand_compact_analysis({"d": [["min", "ZZZ", "XYZ"], "GLO", ["maj"]], "c": "x"}, "Sole View")
+    assert analysis["minor_defects"] == ["XYZ: Defect ZZZ"]
+    assert analysis["major_defects"] == analysis["critical_defects"] == []
+    assert (analysis["overall_condition"], analysis["confidence"]) == ("Fair", "Low")
+
+def test_passes_regions_and_boxes_through():
+    regions = [{"box": [0.1, 0.1, 0.2, 0.2], "reason": "glue"}]
+    analysis = expand_compact_analysis({"d": [], "suspect_regions": regions}, "Front View")
+    assert analysis["suspect_regions"] == regions
+    assert "defect_boxes" not in analysis
@@ -0,0 +1,57 @@
+"""Budget governor: inspection plans and the spend ledger (see qc_inspector/cost.py)"""
+import pytest
+
+from qc_inspector.cost import GOVERNOR_LADDER, BudgetExceeded, SpendLedger, plan_inspection
+
+ORDER = {"po_number": "4711", "style_number": "ST-1", "color": "Black"}
+SIZES = [(3000, 2000)] * 4
+ANGLES = ["Front View", "Back View", "Left Side View", "Right Side View"]
+DAY = "2026-10-19"
+
+def test_unlimited_budget_plans_best_quality():
+    plan = plan_inspection(SIZES, ANGLES, ORDER, {})
+    assert (plan["detail"], plan["max_side"]) == GOVERNOR_LADDER[0]
+    assert plan["within_budget"] and not plan["downgraded"] and plan["remaining"] is None
+    assert plan["cost"] > 0 and plan["prompt_tokens"] > 0 and plan["completion_tokens"] > 0
+
+def test_tight_budget_downgrades_to_a_cheaper_step():
+    full = plan_inspection(SIZES, ANGLES, ORDER, {})
+    plan = plan_inspection(SIZES, ANGLES, ORDER, {}, remaining=full["cost"] * 0.99)
+    assert plan["within_budget"] and plan["downgraded"]
+    assert plan["cost"] <= full["cost"] * 0.99
+
+def test_nothing_fits_an_empty_budget():
+    plan = plan_inspection(SIZES, ANGLES, ORDER, {}, remaining=0.0)
+    assert not plan["within_budget"]
+    assert (plan["detail"], plan["max_side"]) == GOVERNOR_LADDER[-1]
+
+def test_adaptive_tiling_is_never_downgraded():
+    plan = plan_inspection(SIZES, ANGLES, ORDER, {"inspection_mode": "Adaptive tiling"}, remaining=0.0)
+    assert not plan["downgraded"] and not plan["within_budget"]
+
+def test_commit_reserves_and_settle_books_the_actual(tmp_path):
+    ledger = SpendLedger(str(tmp_path / "spend.json"))
+    ledger.commit(ORDER["po_number"], DAY, {"cost": 0.30}, po_budget=1.0, day_budget=0)
+    assert ledger.spent(ORDER["po_number"], DAY) == pytest.approx((0.30, 0.30))
+    assert ledger.remaining(ORDER["po_number"], DAY, 1.0, 0) == pytest.approx(0.70)
+
+    ledger.settle(ORDER["po_number"], DAY, 0.30, 0.10)
+    entry = ledger.entry("po", ORDER["po_number"])
+    assert entry["committed"] == pytest.approx(0.0)
+    assert entry["actual"] == pytest.approx(0.10)
+    assert entry["estimated"] == pytest.approx(0.30)
+
+def test_commit_refuses_a_plan_over_the_remaining_budget(tmp_path):
+    ledger = SpendLedger(str(tmp_path / "spend.json"))
+    ledger.commit("1", DAY, {"cost": 0.60}, po_budget=0, day_budget=1.0)
+    with pytest.raises(BudgetExceeded) as error:
+        ledger.commit("2", DAY, {"cost": 0.50}, po_budget=0, day_budget=1.0)
+    assert error.value.plan["remaining"] == pytest.approx(0.40)
+    assert not error.value.plan["within_budget"]
+    # The refused plan reserved nothing
+    assert ledger.spent("2", DAY) == pytest.approx((0.0, 0.60))
+
+def test_ledger_is_shared_through_its_file(tmp_path):
+    path = str(tmp_path / "spend.json")
+    SpendLedger(path).commit("1", DAY, {"cost": 0.25}, po_budget=0, day_budget=0)
+    assert SpendLedger(path).spent("1", DAY) == pytest.approx((0.25, 0.25))
@@ -0,0 +1,41 @@
+"""Partitioned Parquet and NDJSON exports (see qc_inspector/export.py)"""
+import json
+
+import pytest
+
+from qc_inspector.export import append_ndjson, append_parquet
+
+@pytest.fixture
+def read_table():
+    """Rows of an exported table; skips Parquet tests where pyarrow is not installed"""
+    pq = pytest.importorskip("pyarrow.parquet")
+    return lambda root, name: pq.read_table(str(root / name)).to_pylist()
+
+def test_parquet_is_partitioned_by_date_and_customer(tmp_path, finished_job, read_table):
+    jobs = [finished_job("a", customer="MIA"), finished_job("b", customer="", inspection_date="2026-10-20")]
+    assert append_parquet(jobs, str(tmp_path)) == 2
+
+    assert (tmp_path / "inspections" / "inspection_date=2026-10-19" / "customer=MIA").is_dir()
+    assert (tmp_path / "inspections" / "inspection_date=2026-10-20" / "customer=unknown").is_dir()
+    inspections = sorted(read_table(tmp_path, "inspections"), key=lambda row: row["job_id"])
+    assert [(row["job_id"], row["major_count"], row["views"]) for row in inspections] == [("a", 1, 2), ("b", 1, 2)]
+    assert len(read_table(tmp_path, "angle_analyses")) == 4
+    defects = read_table(tmp_path, "defects")
+    assert {(row["job_id"], row["angle"], row["severity"]) for row in defects} == \
+        {("a", "Back View", "major"), ("b", "Back View", "major")}
+
+def test_parquet_appends_only_new_jobs(tmp_path, finished_job, read_table):
+    assert append_parquet([finished_job("a")], str(tmp_path)) == 1
+    assert append_parquet([finished_job("a"), finished_job("b")], str(tmp_path)) == 1
+    assert append_parquet([finished_job("a"), finished_job("b")], str(tmp_path)) == 0
+    assert sorted(row["job_id"] for row in read_table(tmp_path, "inspections")) == ["a", "b"]
+
+def test_ndjson_appends_each_job_once(tmp_path, finished_job):
+    path = str(tmp_path / "inspections.ndjson")
+    assert append_ndjson([finished_job("a")], path) == 1
+    assert append_ndjson([finished_job("a"), finished_job("b")], path) == 1
+    with open(path) as f:
+        records = [json.loads(line) for line in f]
+    assert [(r["record"], r["job_id"]) for r in records if r["record"] == "inspection"] == \
+        [("inspection", "a"), ("inspection", "b")]
+    assert sum(r["record"] == "defect" for r in records) == 2
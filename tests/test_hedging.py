@@ -0,0 +1,107 @@
+"""Deadlines, hedged requests and the circuit breaker of vision calls (see qc_inspector/hedging.py)"""
+import itertools
+import threading
+import time
+
+import pytest
+
+from qc_inspector import hedging
+from qc_inspector.hedging import BackendUnavailable, CallDeadlineExceeded, CircuitBreaker, guarded_call
+
+_backends = itertools.count()
+
+@pytest.fixture
+def base_url():
+    """A backend of its own, so breaker and latency state do not carry over between tests"""
+    return f"http://backend-{next(_backends)}"
+
+@pytest.fixture
+def release():
+    """Event that lets requests a test left running finish"""
+    event = threading.Event()
+    yield event
+    event.set()
+
+class BadRequest(Exception):
+    status_code = 400
+
+def test_result_and_usage_of_a_plain_call(base_url):
+    seen = []
+    assert guarded_call(base_url, "m", lambda timeout: "reply", on_attempt=seen.append) == "reply"
+    assert seen == ["reply"]
+
+def test_deadline_bounds_the_request_and_charges_it(base_url, release):
+    timeouts, abandoned = [], []
+
+    def slow(timeout):
+        timeouts.append(timeout)
+        release.wait()
+
+    started = time.monotonic()
+    with pytest.raises(CallDeadlineExceeded):
+        guarded_call(base_url, "m", slow, deadline=0.2, hedge_percentile=0, on_abandon=abandoned.append)
+    assert time.monotonic() - started < 1.0
+    assert 0 < timeouts[0] <= 0.2
+    assert abandoned == [None]
+
+def test_slow_call_is_hedged_and_the_loser_charged(base_url, release, monkeypatch):
+    monkeypatch.setattr(hedging, "HEDGE_MIN_DELAY", 0.05)
+    tracker, _, _ = hedging._guard_state(base_url, "m")
+    for _ in range(hedging.HEDGE_MIN_SAMPLES):
+        tracker.record(0.01)
+    calls = itertools.count()
+
+    def first_one_hangs(timeout):
+        if next(calls) == 0:
+            release.wait()
+            return "primary"
+        return "hedge"
+
+    abandoned = []
+    assert guarded_call(base_url, "m", first_one_hangs, on_abandon=abandoned.append) == "hedge"
+    assert abandoned == ["hedge"]
+    stats = hedging.guard_status()[base_url]["models"]["m"]
+    assert (stats["calls"], stats["hedged"], stats["hedge_wins"]) == (1, 1, 1)
+
+def test_rejected_request_does_not_trip_the_breaker(base_url):
+    def bad(timeout):
+        raise BadRequest("bad image")
+
+    for _ in range(hedging.BREAKER_FAILURES + 1):
+        with pytest.raises(BadRequest):
+            guarded_call(base_url, "m", bad)
+    assert hedging.guard_status()[base_url]["state"] == "closed"
+
+def test_failures_open_the_circuit_and_fail_fast(base_url):
+    calls = []
+
+    def down(timeout):
+        calls.append(timeout)
+        raise ConnectionError("refused")
+
+    for _ in range(hedging.BREAKER_FAILURES - 1):
+        with pytest.raises(ConnectionError):
+            guarded_call(base_url, "m", down)
+    with pytest.raises(BackendUnavailable):
+        guarded_call(base_url, "m", down)
+    with pytest.raises(BackendUnavailable):
+        guarded_call(base_url, "m", down)
+    assert len(calls) == hedging.BREAKER_FAILURES
+
+def test_breaker_probes_after_the_cooldown():
+    breaker = CircuitBreaker("http://probe", failures=2, cooldown=0.05)
+    assert not breaker.record_failure()
+    assert breaker.record_failure()
+    with pytest.raises(BackendUnavailable):
+        breaker.before_call()
+
+    time.sleep(0.06)
+    breaker.before_call()
+    assert breaker.state == "half_open"
+    # A failed probe opens the circuit again at once
+    assert breaker.record_failure()
+
+    time.sleep(0.06)
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.snapshot() == {"state": "closed", "failures": 0, "retry_in": 0.0}
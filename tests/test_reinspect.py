@@ -0,0 +1,75 @@
+"""Differential re-inspection decisions (see qc_inspector/reinspect.py)"""
+import io
+
+from PIL import Image, ImageDraw
+
+from qc_inspector.reinspect import carried_analysis, find_previous_inspection, plan_reinspection, view_hash
+
+ANGLES = ["Front View", "Back View", "Left Side View", "Right Side View"]
+CLEAN = {"critical_defects": [], "major_defects": [], "minor_defects": [], "inspection_notes": "ok"}
+DEFECTIVE = dict(CLEAN, major_defects=["Heel: Overflowing glue"])
+
+def photo(shape, shade=0):
+    """JPEG bytes of a simple scene; shape picks the layout, shade a small brightness change"""
+    image = Image.new("RGB", (640, 480), (200 + shade, 200 + shade, 200 + shade))
+    draw = ImageDraw.Draw(image)
+    if shape == "left":
+        draw.rectangle((40, 120, 320, 400), fill=(30, 30, 30))
+    else:
+        draw.ellipse((300, 40, 620, 300), fill=(30, 30, 30))
+    output = io.BytesIO()
+    image.save(output, format="JPEG")
+    return output.getvalue()
+
+def previous_job(analyses, photos):
+    return {"job_id": "prev1", "finished_at": "2026-10-18T10:00:00", "angle_names": ANGLES[:len(analyses)],
+            "analyses": analyses, "view_hashes": [view_hash(data) for data in photos]}
+
+def test_only_unchanged_clean_views_are_carried():
+    previous = previous_job([CLEAN, CLEAN, DEFECTIVE, None], [photo("left")] * 4)
+    hashes = [view_hash(photo("left", shade=3)), view_hash(photo("right")), view_hash(photo("left")),
+              view_hash(photo("left"))]
+    decisions = plan_reinspection(previous, hashes, ANGLES)
+    assert [(d["carry"], d["reason"]) for d in decisions] == [
+        (True, "unchanged"), (False, "changed"), (False, "had defects"), (False, "previous analysis failed")]
+    assert decisions[0]["previous_index"] == 0 and decisions[0]["distance"] is not None
+
+def test_new_views_and_views_without_hashes_are_analysed():
+    previous = previous_job([CLEAN], [photo("left")])
+    previous["view_hashes"] = None
+    decisions = plan_reinspection(previous, [view_hash(photo("left"))] * 2, ["Front View", "Top View"])
+    assert [d["reason"] for d in decisions] == ["no previous image to compare", "new view"]
+
+def test_hashes_of_older_jobs_come_from_the_archive():
+    class Archive:
+        def get(self, digest):
+            return {"d0": photo("left")}.get(digest)
+
+    previous = previous_job([CLEAN], [photo("left")])
+    previous.update(view_hashes=None, image_digests=["d0"])
+    decision, = plan_reinspection(previous, [view_hash(photo("left"))], ["Front View"], Archive())
+    assert decision["carry"]
+
+def test_carried_analysis_points_at_the_inspection_that_analysed_it():
+    previous = previous_job([CLEAN], [photo("left")])
+    decision = {"carry": True, "reason": "unchanged", "previous_index": 0, "distance": 2}
+    carried = carried_analysis(previous, decision)
+    assert carried["provenance"] == {"source": "carried_forward", "job_id": "prev1",
+                                     "inspected_at": "2026-10-18T10:00:00", "hash_distance": 2}
+    assert "provenance" not in previous["analyses"][0]
+
+    again = dict(previous, job_id="prev2", finished_at="2026-10-19T10:00:00", analyses=[carried])
+    assert carried_analysis(again, decision)["provenance"]["job_id"] == "prev1"
+
+def test_previous_inspection_is_the_latest_of_the_same_pair():
+    def job(job_id, po, finished_at):
+        return {"job_id": job_id, "finished_at": finished_at,
+                "order_info": {"po_number": po, "style_number": "S", "color": "C"}}
+
+    class Store:
+        def iter_jobs(self, status):
+            return iter([job("a", "1", "2026-10-17T09:00:00"), job("b", "1", "2026-10-18T09:00:00"),
+                         job("c", "2", "2026-10-19T09:00:00")])
+
+    assert find_previous_inspection(Store(), {"po_number": "1", "style_number": "S", "color": "C"})["job_id"] == "b"
+    assert find_previous_inspection(Store(), {"po_number": "3", "style_number": "S", "color": "C"}) is None
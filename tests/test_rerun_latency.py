@@ -0,0 +1,25 @@
+"""Rerun latency of the Streamlit app: typing into the order form must stay cheap (see qc_inspector/perf.py)"""
+import statistics
+
+import pytest
+
+pytest.importorskip("streamlit.testing.v1")
+
+from qc_inspector.perf import RERUN_BUDGET_MS, measure_reruns, sample_queue
+
+RUNS = 20
+# Shared CI machines run well behind a workstation; the strict budget is `python -m qc_inspector.perf`
+SLACK = 4
+
+@pytest.fixture(scope="module")
+def sample(tmp_path_factory):
+    return sample_queue(str(tmp_path_factory.mktemp("qc-data")))
+
+@pytest.mark.perf
+@pytest.mark.parametrize("scenario", ["order form", "finished report"])
+def test_rerun_latency(sample, scenario):
+    queue, job = sample
+    timings = measure_reruns(runs=RUNS, job_id=job["job_id"] if scenario == "finished report" else None, queue=queue)
+    median = statistics.median(timings)
+    assert median <= SLACK * RERUN_BUDGET_MS, \
+        f"{scenario} rerun median {median:.1f} ms over {SLACK}x the {RERUN_BUDGET_MS:.0f} ms budget"
@@ -0,0 +1,59 @@
+"""Full-text search over defects and inspector notes (see qc_inspector/search.py)"""
+import pytest
+
+from qc_inspector import search
+from qc_inspector.jobs import JobStore
+from qc_inspector.search import InvalidQuery, SearchIndex
+
+@pytest.fixture
+def index(tmp_path, finished_job):
+    index = SearchIndex(str(tmp_path / "search.sqlite"))
+    index.index_job(finished_job("a", po_number="1", customer="MIA", inspection_date="2026-10-01",
+                                 defects={"Back View": {"major_defects": ["Heel: heel kick on the counter"]}}))
+    index.index_job(finished_job("b", po_number="1", customer="MIA", inspection_date="2026-10-05",
+                                 defects={"Front View": {"minor_defects": ["Toe cap: toe-cap scuff"]},
+                                          "Back View": {"major_defects": ["Heel: heels kicked inward"]}}))
+    index.index_job(finished_job("c", po_number="2", customer="ZEN", inspection_date="2026-10-09",
+                                 defects={"Back View": {"critical_defects": ["Outsole: sole separation"]}}))
+    return index
+
+def test_stemmed_matches_come_with_snippets(index):
+    hits = index.search("kick")
+    assert {hit["job_id"] for hit in hits} == {"a", "b"}
+    assert all(hit["severity"] == "major" and hit["kind"] == "defect" for hit in hits)
+    assert "[kick]" in next(hit["snippet"] for hit in hits if hit["job_id"] == "a")
+
+def test_filters_and_dates_narrow_the_matches(index):
+    assert [hit["job_id"] for hit in index.search("heel", since="2026-10-02")] == ["b"]
+    assert [hit["job_id"] for hit in index.search("heel", until="2026-10-01")] == ["a"]
+    assert index.search("heel", customer="ZEN") == []
+    assert [hit["kind"] for hit in index.search("construction", customer="ZEN")] == ["note", "note"]
+    assert len(index.search("construction", limit=3)) == 3
+
+def test_results_grouped_by_po(index):
+    groups = index.search_pos("heel OR sole")
+    assert [(g["po_number"], g["hits"], g["inspections"]) for g in groups] == [("1", 2, 2), ("2", 1, 1)]
+    assert (groups[0]["first_date"], groups[0]["last_date"]) == ("2026-10-01", "2026-10-05")
+
+def test_invalid_syntax_falls_back_to_words(index):
+    assert [hit["job_id"] for hit in index.search("toe-cap")] == ["b"]
+    assert index.search('"') == index.search_pos('"') == index.search("   ") == []
+
+def test_query_that_cannot_run_at_all(index, monkeypatch):
+    monkeypatch.setattr(search, "fts_query", lambda text: "NEAR(")
+    with pytest.raises(InvalidQuery):
+        index.search("a:b")
+
+def test_reindexing_replaces_a_jobs_rows(index, finished_job):
+    index.index_job(finished_job("a", po_number="1", defects={"Back View": {"minor_defects": ["Lace: frayed"]}}))
+    assert [hit["job_id"] for hit in index.search("kick")] == ["b"]
+    assert [hit["job_id"] for hit in index.search("frayed")] == ["a"]
+
+def test_sync_indexes_what_the_store_holds(tmp_path, finished_job):
+    store = JobStore(str(tmp_path / "jobs"))
+    for job_id in ("a", "b"):
+        store.save(finished_job(job_id))
+    index = SearchIndex(str(tmp_path / "search.sqlite"))
+    assert index.sync(store) == 2
+    assert index.sync(store) == 0
+    assert index.indexed_jobs() == {"a", "b"}
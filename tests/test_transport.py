@@ -0,0 +1,52 @@
+"""Record/replay cassette transport (see qc_inspector/transport.py)"""
+import json
+
+import httpx
+import pytest
+
+from qc_inspector.transport import CassetteTransport
+
+URL = "https://api.openai.com/v1/chat/completions"
+
+@pytest.fixture
+def cassette(tmp_path):
+    """Path of a cassette recorded from two identical requests and one different one"""
+    path = str(tmp_path / "cassette.jsonl")
+    replies = iter(["first", "second", "other"])
+
+    def backend(request):
+        return httpx.Response(200, json={"reply": next(replies)}, headers={"x-request-id": "req-1", "set-cookie": "x"})
+
+    with httpx.Client(transport=CassetteTransport("record", path, inner=httpx.MockTransport(backend))) as client:
+        for body in ({"model": "gpt-4o", "prompt": "a"}, {"model": "gpt-4o", "prompt": "a"}, {"prompt": "b"}):
+            assert client.post(URL, json=body, headers={"Authorization": "Bearer sk-record"}).status_code == 200
+    return path
+
+def replay_client(path):
+    return httpx.Client(transport=CassetteTransport("replay", path, replay_speed=0))
+
+def test_recording_keeps_bodies_but_no_secrets(cassette):
+    with open(cassette) as f:
+        entries = [json.loads(line) for line in f]
+    assert [json.loads(entry["body"])["reply"] for entry in entries] == ["first", "second", "other"]
+    assert entries[0]["fingerprint"] == entries[1]["fingerprint"] != entries[2]["fingerprint"]
+    assert entries[0]["headers"] == {"x-request-id": "req-1", "content-type": "application/json"}
+    assert "sk-record" not in open(cassette).read()
+
+def test_replay_serves_recorded_responses_in_order(cassette):
+    with replay_client(cassette) as client:
+        # Key order and headers do not change the fingerprint
+        replies = [client.post(URL, content=json.dumps({"prompt": "a", "model": "gpt-4o"}),
+                               headers={"Authorization": "Bearer sk-other"}).json()["reply"] for _ in range(3)]
+        assert replies == ["first", "second", "second"]
+        assert client.post(URL, json={"prompt": "b"}).json()["reply"] == "other"
+
+def test_replay_miss_is_a_404(cassette):
+    with replay_client(cassette) as client:
+        response = client.post(URL, json={"prompt": "never recorded"})
+    assert response.status_code == 404
+    assert response.json()["error"]["type"] == "cassette_miss"
+
+def test_unknown_mode_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        CassetteTransport("live", str(tmp_path / "cassette.jsonl"))
@@ -0,0 +1,49 @@
+"""Segmentation of multi-shoe tray photos (see qc_inspector/tray.py)"""
+import io
+
+from PIL import Image, ImageDraw
+
+from qc_inspector.tray import segment_tray, split_trays
+
+BACKDROP = (225, 228, 230)
+# Two rows of two shoes, given out of reading order
+SHOES = [(900, 600, 1400, 900), (100, 80, 600, 380), (100, 600, 600, 900), (900, 80, 1400, 380)]
+
+def tray_photo(shoes=SHOES):
+    image = Image.new("RGB", (1600, 1000), BACKDROP)
+    draw = ImageDraw.Draw(image)
+    for box in shoes:
+        draw.ellipse(box, fill=(60, 35, 25))
+    return image
+
+def jpeg(image):
+    output = io.BytesIO()
+    image.save(output, format="JPEG")
+    return output.getvalue()
+
+def contains(outer, inner):
+    return outer[0] <= inner[0] and outer[1] <= inner[1] and outer[2] >= inner[2] and outer[3] >= inner[3]
+
+def test_shoes_are_found_and_paired_in_reading_order():
+    shoes = segment_tray(tray_photo())
+    assert [(shoe["pair"], shoe["side"]) for shoe in shoes] == [(1, "Left"), (1, "Right"), (2, "Left"), (2, "Right")]
+    for shoe, expected in zip(shoes, [SHOES[1], SHOES[3], SHOES[2], SHOES[0]]):
+        assert contains(shoe["box"], expected)
+        assert shoe["box"][2] - shoe["box"][0] < 1.2 * (expected[2] - expected[0])
+        assert 0.05 < shoe["area"] < 0.15
+
+def test_specks_and_extra_regions_are_dropped():
+    photo = tray_photo(SHOES + [(1500, 950, 1510, 960)])
+    assert len(segment_tray(photo)) == 4
+    assert len(segment_tray(photo, max_shoes=3)) == 3
+
+def test_empty_tray_is_kept_as_one_view():
+    data = jpeg(Image.new("RGB", (1600, 1000), BACKDROP))
+    assert segment_tray(Image.open(io.BytesIO(data))) == []
+    assert split_trays([data], ["Top View"]) == ([data], ["Top View"])
+
+def test_split_trays_names_each_crop():
+    images, names = split_trays([jpeg(tray_photo())], ["Top View"])
+    assert names == ["Top View - Pair 1 Left", "Top View - Pair 1 Right",
+                     "Top View - Pair 2 Left", "Top View - Pair 2 Right"]
+    assert all(Image.open(io.BytesIO(data)).size[0] < 800 for data in images)
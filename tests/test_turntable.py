@@ -0,0 +1,66 @@
+"""Keyframe selection from turntable videos (see qc_inspector/turntable.py)"""
+import io
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from qc_inspector.turntable import extract_keyframes, pick_keyframes, revolution_length
+
+def test_revolution_ends_where_the_clip_looks_like_its_start():
+    rng = np.random.default_rng(0)
+    cycle = rng.random((20, 24, 24))
+    thumbs = np.stack([cycle[n % 20] for n in range(50)])
+    assert revolution_length(thumbs) == 20
+    # A clip that never comes back is one revolution
+    assert revolution_length(rng.random((30, 24, 24))) == 30
+
+def test_the_best_frame_near_each_position_wins():
+    scores = [(1.0, 1.0)] * 48
+    scores[13] = (5.0, 1.0)     # Sharper, within the window of the quarter turn (frame 12)
+    scores[24] = (9.0, 0.0)     # Sharpest but unusable exposure
+    picks = pick_keyframes(scores, 48, {"Front View": 0.0, "Right Side View": 0.25, "Back View": 0.5})
+    assert picks["Right Side View"] == 13
+    assert picks["Back View"] != 24 and abs(picks["Back View"] - 24) <= 2
+
+def test_counterclockwise_clips_mirror_the_positions():
+    picks = pick_keyframes([(1.0, 1.0)] * 48, 48, {"Front View": 0.0, "Right Side View": 0.25}, clockwise=False)
+    assert picks["Front View"] == 0
+    assert abs(picks["Right Side View"] - 36) <= 2
+
+@pytest.mark.parametrize("frames", [1, 3])
+def test_clips_too_short_for_every_view_are_refused(frames):
+    with pytest.raises(ValueError):
+        pick_keyframes([(1.0, 1.0)] * frames, frames, {"A": 0.0, "B": 0.25, "C": 0.5, "D": 0.75})
+
+def test_too_few_distinct_frames_are_refused():
+    # Five frames cannot give four views a frame of their own within the window
+    with pytest.raises(ValueError):
+        pick_keyframes([(1.0, 1.0)] * 5, 5, {"A": 0.0, "B": 0.1, "C": 0.2, "D": 0.3})
+
+def turntable_gif(frames):
+    """Animated GIF of a textured block sliding once across the frame"""
+    rng = np.random.default_rng(1)
+    texture = Image.fromarray((rng.random((120, 80)) * 255).astype(np.uint8)).convert("RGB")
+    images = []
+    for n in range(frames):
+        image = Image.new("RGB", (320, 200), (128, 128, 128))
+        image.paste(texture, (10 + n * 200 // frames, 40))
+        ImageDraw.Draw(image).text((5, 5), str(n), fill=(255, 255, 255))
+        images.append(image)
+    output = io.BytesIO()
+    images[0].save(output, format="GIF", save_all=True, append_images=images[1:], duration=40)
+    return output.getvalue()
+
+def test_keyframes_of_a_clip():
+    keyframes = extract_keyframes(turntable_gif(40))
+    assert [k["angle"] for k in keyframes] == ["Front View", "Right Side View", "Back View", "Left Side View"]
+    for keyframe, position in zip(keyframes, (0, 10, 20, 30)):
+        offset = abs(keyframe["frame"] - position)
+        assert min(offset, 40 - offset) <= 1   # The front may come from the end of the revolution
+        assert Image.open(io.BytesIO(keyframe["image"])).size == (320, 200)
+    assert len({k["frame"] for k in keyframes}) == 4
+
+def test_single_frame_clip_is_refused():
+    with pytest.raises(ValueError):
+        extract_keyframes(turntable_gif(1))